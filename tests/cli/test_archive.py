@@ -0,0 +1,96 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from click.testing import CliRunner
+
+from uhu.cli.archive import extract_command, inspect_command, verify_command
+from uhu.core.archive import ArchiveWriter, PackageArchive
+from uhu.core.objects import ObjectsManager
+
+from utils import FileFixtureMixin, UHUTestCase
+
+
+class ArchiveCommandsTestCase(FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.runner = CliRunner()
+        self.content = b'spam'
+        self.sha256sum = hashlib.sha256(self.content).hexdigest()
+        objects = ObjectsManager(1)
+        objects.create({
+            'filename': self.create_file(self.content),
+            'mode': 'raw',
+            'target-type': 'device',
+            'target': '/dev/sda',
+        })
+        metadata = {'product': '1234', 'version': '2.0'}
+        metadata.update(objects.to_metadata())
+        self.archive = self.create_file()
+        with ArchiveWriter(self.archive) as writer:
+            writer.add_objects(objects)
+            writer.add_metadata(json.dumps(metadata), None)
+        self.output = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output)
+
+    def corrupt_archive(self):
+        with PackageArchive(self.archive) as archive:
+            offset = archive.data_offset(archive.member(self.sha256sum))
+        with open(self.archive, 'r+b') as fp:
+            fp.seek(offset)
+            fp.write(b'S')
+
+    def test_inspect_command(self):
+        result = self.runner.invoke(inspect_command, [self.archive])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('Version: 2.0', result.output)
+        self.assertIn('Signed: no', result.output)
+        self.assertIn(self.sha256sum, result.output)
+
+    def test_inspect_command_returns_2_if_invalid_archive(self):
+        result = self.runner.invoke(
+            inspect_command, [self.create_file(b'spam')])
+        self.assertEqual(result.exit_code, 2)
+
+    def test_verify_command(self):
+        result = self.runner.invoke(verify_command, [self.archive])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output, 'Valid archive.\n')
+
+    def test_verify_command_returns_1_if_archive_is_corrupted(self):
+        self.corrupt_archive()
+        result = self.runner.invoke(verify_command, [self.archive])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('corrupted', result.output)
+
+    def test_extract_command_extracts_all_objects(self):
+        result = self.runner.invoke(
+            extract_command, [self.archive, '--output', self.output])
+        self.assertEqual(result.exit_code, 0)
+        fn = os.path.join(self.output, self.sha256sum)
+        self.assertEqual(self.read_file(fn), 'spam')
+
+    def test_extract_command_returns_3_if_object_is_unknown(self):
+        result = self.runner.invoke(
+            extract_command, [self.archive, '1' * 64, '--output', self.output])
+        self.assertEqual(result.exit_code, 3)
+
+    def test_extract_command_does_not_write_outside_output(self):
+        output = os.path.join(self.output, 'output')
+        result = self.runner.invoke(
+            extract_command, [self.archive, '../spam', '--output', output])
+        self.assertEqual(result.exit_code, 3)
+        self.assertEqual(sorted(os.listdir(self.output)), ['output'])
+        self.assertEqual(os.listdir(output), [])
+
+    def test_extract_command_returns_2_if_object_is_corrupted(self):
+        self.corrupt_archive()
+        result = self.runner.invoke(
+            extract_command, [self.archive, '--output', self.output])
+        self.assertEqual(result.exit_code, 2)
+        self.assertEqual(os.listdir(self.output), [])
@@ -11,7 +11,8 @@ from click.testing import CliRunner
 from uhu.cli.package import (
     add_object_command, edit_object_command, remove_object_command,
     archive_command, export_command, show_command, set_version_command,
-    status_command, metadata_command, push_command)
+    status_command, metadata_command, push_command, sign_many_command,
+    verify_many_command)
 from uhu.cli.utils import open_package
 from uhu.core.package import Package
 from uhu.core.utils import dump_package, load_package
@@ -247,6 +248,28 @@ class ArchiveCommand(PackageTestCase):
         self.assertEqual(output, 'spam')
         self.assertTrue(force)
 
+    @patch('uhu.cli.package.dump_package_archive')
+    def test_can_archive_with_compression_options(self, mock):
+        result = self.runner.invoke(archive_command, [
+            '--compression', 'deflate', '--level', '9', '--workers', '2'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(mock.call_args[1], {
+            'compression': 'deflate', 'level': 9, 'workers': 2,
+            'incremental': False})
+
+    @patch('uhu.cli.package.dump_package_archive')
+    def test_can_archive_incrementally(self, mock):
+        result = self.runner.invoke(archive_command, ['--incremental'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertTrue(mock.call_args[1]['incremental'])
+
+    @patch('uhu.cli.package.dump_package_archive')
+    def test_can_archive_into_standard_output(self, mock):
+        result = self.runner.invoke(archive_command, ['--output', '-'])
+        self.assertEqual(result.exit_code, 0)
+        _, output, _ = mock.call_args[0]
+        self.assertTrue(hasattr(output, 'write'))
+
     @patch('uhu.cli.package.dump_package_archive', side_effect=FileExistsError)
     def test_archive_command_returns_1_if_archive_exists(self, mock):
         result = self.runner.invoke(archive_command)
@@ -410,14 +433,14 @@ class PackageStatusCommandTestCase(unittest.TestCase):
         self.runner = CliRunner()
 
     @patch('uhu.cli.package.open_package')
-    @patch('uhu.cli.package.get_package_status', return_value='Done')
+    @patch('uhu.updatehub.api.get_package_status', return_value='Done')
     def test_returns_0_if_successful(self, mock, open_package):
         open_package.return_value.__enter__.return_value = Mock()
         result = self.runner.invoke(status_command, args=['pkg_uid'])
         self.assertEqual(result.exit_code, 0)
 
     @patch('uhu.cli.package.open_package')
-    @patch('uhu.cli.package.get_package_status', side_effect=UpdateHubError)
+    @patch('uhu.updatehub.api.get_package_status', side_effect=UpdateHubError)
     def test_returns_2_if_fail(self, mock, open_package):
         result = self.runner.invoke(status_command, args=['pkg_uid'])
         self.assertEqual(result.exit_code, 2)
@@ -477,6 +500,22 @@ class PushCommandTestCase(unittest.TestCase):
         result = self.runner.invoke(push_command)
         self.assertEqual(result.exit_code, 2)
 
+    @patch('uhu.cli.package.open_package')
+    @patch('uhu.cli.package.push_package_archive')
+    def test_can_push_package_archive(self, push, open_package):
+        with NamedTemporaryFile() as fp:
+            result = self.runner.invoke(push_command, ['--archive', fp.name])
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(push.call_args[0][0], fp.name)
+        self.assertFalse(open_package.called)
+
+    @patch('uhu.cli.package.push_package_archive')
+    def test_push_archive_returns_3_when_invalid_archive(self, push):
+        push.side_effect = ValueError
+        with NamedTemporaryFile() as fp:
+            result = self.runner.invoke(push_command, ['--archive', fp.name])
+        self.assertEqual(result.exit_code, 3)
+
     @patch('uhu.cli.utils.show_cursor')
     def test_always_display_cursor_after_all(self, show_cursor):
         effects = [None, UpdateHubError, Exception]
@@ -485,3 +524,41 @@ class PushCommandTestCase(unittest.TestCase):
         for effect in effects:
             result = self.runner.invoke(push_command)
         self.assertEqual(show_cursor.call_count, len(effects))
+
+
+class BatchCommandsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.runner = CliRunner()
+        self.fp = NamedTemporaryFile()
+        self.addCleanup(self.fp.close)
+
+    @patch('uhu.core.batch.sign_many')
+    def test_sign_many_writes_json_report(self, sign_many):
+        entries = [{'file': self.fp.name, 'ok': True, 'errors': []}]
+        sign_many.return_value = entries
+        result = self.runner.invoke(sign_many_command, [
+            self.fp.name, '--key', self.fp.name, '--workers', '2'])
+        self.assertEqual(result.exit_code, 0)
+        sign_many.assert_called_once_with([self.fp.name], self.fp.name, 2)
+        report = json.loads(result.output)
+        self.assertEqual(report, {'files': entries, 'ok': 1, 'failed': 0})
+
+    @patch('uhu.core.batch.verify_many')
+    def test_verify_many_returns_1_when_some_file_fails(self, verify_many):
+        verify_many.return_value = [
+            {'file': self.fp.name, 'ok': True, 'errors': []},
+            {'file': self.fp.name, 'ok': False, 'errors': ['error']},
+        ]
+        result = self.runner.invoke(
+            verify_many_command, [self.fp.name, '--key', self.fp.name])
+        self.assertEqual(result.exit_code, 1)
+        report = json.loads(result.output)
+        self.assertEqual(report['ok'], 1)
+        self.assertEqual(report['failed'], 1)
+
+    @patch('uhu.core.batch.verify_many')
+    def test_batch_commands_return_2_without_key(self, verify_many):
+        verify_many.side_effect = ValueError
+        result = self.runner.invoke(verify_many_command, [self.fp.name])
+        self.assertEqual(result.exit_code, 2)
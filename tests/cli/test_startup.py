@@ -0,0 +1,69 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import os
+import subprocess
+import sys
+
+import uhu
+from uhu.core.package import Package
+from uhu.core.utils import dump_package
+from uhu.utils import LOCAL_CONFIG_VAR
+
+from utils import FileFixtureMixin, UHUTestCase
+
+
+# Dependencies that must be imported only by the commands using them
+HEAVY_MODULES = [
+    'Cryptodome',
+    'humanize',
+    'jsonschema',
+    'libarchive',
+    'pkgschema',
+    'prompt_toolkit',
+    'requests',
+]
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(uhu.__file__)))
+
+
+def import_times(code, env=None):
+    """Runs code with -X importtime. Returns {module: cumulative us}."""
+    env = dict(os.environ if env is None else env)
+    env['PYTHONPATH'] = ROOT_DIR
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code], env=env,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=False)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, module = line.split('|')
+        try:
+            times[module.strip()] = int(cumulative)
+        except ValueError:
+            pass  # table header
+    return times
+
+
+class StartupTestCase(FileFixtureMixin, UHUTestCase):
+
+    def assertNotImported(self, times):
+        imported = {module.split('.')[0] for module in times}
+        self.assertEqual(imported.intersection(HEAVY_MODULES), set())
+
+    def test_importing_cli_does_not_import_heavy_dependencies(self):
+        times = import_times('import uhu.cli')
+        self.assertIn('uhu.cli', times)
+        self.assertNotImported(times)
+
+    def test_package_commands_do_not_import_heavy_dependencies(self):
+        env = dict(os.environ)
+        env[LOCAL_CONFIG_VAR] = self.create_file()
+        dump_package(Package().to_template(), env[LOCAL_CONFIG_VAR])
+        for command in [['package', 'show'], ['hardware', 'add', 'foo']]:
+            code = 'from uhu.cli import cli; cli({})'.format(command)
+            times = import_times(code, env)
+            self.assertIn('uhu.cli', times)
+            self.assertNotImported(times)
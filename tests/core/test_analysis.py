@@ -0,0 +1,137 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import gzip
+import hashlib
+import unittest
+from unittest.mock import Mock
+
+from uhu.core.analysis import (
+    analyze, HashConsumer, HeaderConsumer, HeaderStreamConsumer, Result)
+from uhu.core.compression import CompressionConsumer
+from uhu.core.delta import ArchiverConsumer
+from uhu.core.install_condition import VersionConsumer
+
+from utils import FileFixtureMixin, UHUTestCase
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class AnalyzeTestCase(unittest.TestCase):
+
+    def test_feeds_all_consumers_with_each_chunk(self):
+        consumers = [Mock(), Mock()]
+        callback = Mock()
+        analyze([b'sp', b'am'], consumers, callback)
+        for consumer in consumers:
+            self.assertEqual(
+                [args[0] for args, _ in consumer.feed.call_args_list],
+                [b'sp', b'am'])
+        self.assertEqual(callback.object_progress.call_count, 2)
+
+    def test_hash_consumer(self):
+        for name in ['sha256', 'md5']:
+            consumer = HashConsumer(name)
+            analyze([b'sp', b'am'], [consumer])
+            expected = hashlib.new(name, b'spam').hexdigest()
+            self.assertEqual(consumer.result(), expected)
+
+    def test_header_consumer_keeps_only_header(self):
+        consumer = HeaderConsumer()
+        consumer.header_size = 3
+        analyze([b's', b'pam'], [consumer])
+        self.assertEqual(consumer.header, b'spa')
+
+    def test_header_stream_consumer_holds_chunks_back_until_header(self):
+        events = []
+        consumer = HeaderStreamConsumer()
+        consumer.header_size = 3
+        consumer.start = lambda: events.append('start')
+        consumer.consume = events.append
+        analyze([b's', b'p', b'am', b'!'], [consumer])
+        consumer.flush()
+        self.assertEqual(consumer.header, b'spa')
+        self.assertEqual(events, ['start', b'spam', b'!'])
+
+    def test_header_stream_consumer_flushes_objects_smaller_than_header(self):
+        consumer = HeaderStreamConsumer()
+        consumer.header_size = 3
+        consumer.start = Mock()
+        consumer.consume = Mock()
+        analyze([b's'], [consumer])
+        self.assertFalse(consumer.start.called)
+        consumer.flush()
+        consumer.flush()
+        consumer.start.assert_called_once_with()
+        consumer.consume.assert_called_once_with(b's')
+
+    def test_result(self):
+        self.assertEqual(Result(42).result(), 42)
+
+
+class CompressionConsumerTestCase(FileFixtureMixin, UHUTestCase):
+
+    def analyze(self, data, size=1, check=True):
+        consumer = CompressionConsumer(self.create_file(data), check)
+        analyze(split(data, size), [consumer])
+        return consumer
+
+    def test_can_get_compression_metadata(self):
+        data = gzip.compress(b'spam' * 100)
+        for size in [1, 5, 1024]:
+            consumer = self.analyze(data, size)
+            self.assertEqual(consumer.format, 'gzip')
+            self.assertEqual(consumer.result(), {
+                'compressed': True,
+                'required-uncompressed-size': 400,
+            })
+
+    def test_returns_empty_metadata_if_not_compressed(self):
+        for data in [b'', b'sp', b'spam' * 100]:
+            self.assertEqual(self.analyze(data).result(), {})
+
+    def test_raises_error_if_corrupted(self):
+        consumer = self.analyze(gzip.compress(b'spam' * 100)[:-5])
+        with self.assertRaises(ValueError):
+            consumer.result()
+
+    def test_uses_trailer_when_check_is_disabled(self):
+        consumer = self.analyze(gzip.compress(b'spam'), check=False)
+        self.assertEqual(consumer.result()['required-uncompressed-size'], 4)
+
+
+class ArchiverConsumerTestCase(unittest.TestCase):
+
+    def test_can_validate_delta(self):
+        consumer = ArchiverConsumer('fn')
+        analyze(split(b'BITA1\0spam', 1), [consumer])
+        self.assertEqual(consumer.result(), {})
+
+    def test_raises_error_if_unknown_format(self):
+        consumer = ArchiverConsumer('fn')
+        analyze([b'spam'], [consumer])
+        with self.assertRaises(ValueError):
+            consumer.result()
+
+
+class VersionConsumerTestCase(unittest.TestCase):
+
+    def test_can_get_uboot_version(self):
+        data = b'\x01U-Boot 13.08.1988 (13/08/1988)\x02'
+        consumer = VersionConsumer('u-boot')
+        analyze(split(data, 3), [consumer])
+        self.assertEqual(consumer.result(), '13.08.1988')
+
+    def test_can_get_custom_version_after_seek(self):
+        data = b'1.0_2.0___'
+        consumer = VersionConsumer('regexp', br'\d\.\d', seek=3)
+        analyze(split(data, 2), [consumer])
+        self.assertEqual(consumer.result(), '2.0')
+
+    def test_raises_error_if_version_is_not_found(self):
+        consumer = VersionConsumer('regexp', br'\d\.\d')
+        analyze([b'spam'], [consumer])
+        with self.assertRaises(ValueError):
+            consumer.result()
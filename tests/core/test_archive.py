@@ -0,0 +1,477 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+import zlib
+from unittest.mock import Mock
+
+from uhu.core.analysis import analyze
+from uhu.core.archive import ArchiveWriter, MemberConsumer, PackageArchive
+from uhu.core.objects import ObjectsManager
+from uhu.utils import CHUNK_SIZE_VAR
+
+from utils import (
+    CacheFixtureMixin, EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase)
+
+
+class UnseekableBuffer(io.BytesIO):
+
+    def seekable(self):
+        return False
+
+    def seek(self, *args):
+        raise OSError('not seekable')
+
+    def tell(self):
+        raise OSError('not seekable')
+
+
+class MemberConsumerTestCase(unittest.TestCase):
+
+    def test_stores_data_by_default(self):
+        fp = io.BytesIO()
+        member = MemberConsumer(fp)
+        analyze([b's', b'pam'], [member])
+        member.result()
+        self.assertEqual(fp.getvalue(), b'spam')
+        self.assertEqual(member.crc, zlib.crc32(b'spam'))
+        self.assertEqual(member.file_size, 4)
+        self.assertEqual(member.compress_size, 4)
+        self.assertEqual(member.compress_type, zipfile.ZIP_STORED)
+
+    def test_can_deflate_data(self):
+        fp = io.BytesIO()
+        data = b'spam' * 100
+        member = MemberConsumer(fp, zipfile.ZIP_DEFLATED, 9)
+        analyze([data[i:i + 3] for i in range(0, len(data), 3)], [member])
+        member.result()
+        self.assertEqual(member.compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(member.file_size, len(data))
+        self.assertEqual(member.compress_size, len(fp.getvalue()))
+        self.assertLess(member.compress_size, len(data))
+        self.assertEqual(zlib.decompress(fp.getvalue(), -15), data)
+
+    def test_can_deflate_objects_smaller_than_header(self):
+        fp = io.BytesIO()
+        member = MemberConsumer(fp, zipfile.ZIP_DEFLATED)
+        analyze([b'sp'], [member])
+        member.result()
+        self.assertEqual(zlib.decompress(fp.getvalue(), -15), b'sp')
+
+    def test_does_not_deflate_compressed_data(self):
+        fp = io.BytesIO()
+        data = gzip.compress(b'spam')
+        member = MemberConsumer(fp, zipfile.ZIP_DEFLATED)
+        analyze([data[:1], data[1:]], [member])
+        member.result()
+        self.assertEqual(member.compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(fp.getvalue(), data)
+
+    def test_result_raises_write_errors(self):
+        fp = Mock()
+        fp.write.side_effect = OSError
+        member = MemberConsumer(fp)
+        analyze([b'spam' * 10], [member])
+        with self.assertRaises(OSError):
+            member.result()
+
+
+class ArchiveWriterTestCase(
+        CacheFixtureMixin, FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 3)
+        self.contents = [b'spam' * 10, b'eggs' * 10, gzip.compress(b'ham')]
+        self.objects = ObjectsManager(1)
+        for content in self.contents:
+            self.objects.create({
+                'filename': self.create_file(content),
+                'mode': 'raw',
+                'target-type': 'device',
+                'target': '/dev/sda',
+            })
+
+    def write_archive(self, fp, **options):
+        callback = Mock()
+        workers = options.pop('workers', None)
+        with ArchiveWriter(fp, **options) as writer:
+            writer.add_objects(self.objects, callback, workers)
+            writer.add_metadata('{}', None)
+        return callback
+
+    def verify_archive(self, fp):
+        with zipfile.ZipFile(fp) as archive:
+            self.assertIsNone(archive.testzip())
+            names = archive.namelist()
+            self.assertEqual(len(names), len(self.contents) + 2)
+            self.assertEqual(archive.read('metadata'), b'{}')
+            self.assertEqual(archive.read('signature'), b'')
+            for content in self.contents:
+                sha256sum = hashlib.sha256(content).hexdigest()
+                self.assertEqual(archive.read(sha256sum), content)
+            return {info.filename: info.compress_type
+                    for info in archive.infolist()}
+
+    def test_reads_each_object_once(self):
+        fp = io.BytesIO()
+        callback = self.write_archive(fp)
+        n_chunks = sum(len(obj) for obj in self.objects.all())
+        self.assertEqual(callback.object_progress.call_count, n_chunks)
+        self.verify_archive(fp)
+        observed = sorted(obj['sha256sum'] for obj in self.objects.all())
+        expected = sorted(
+            hashlib.sha256(content).hexdigest() for content in self.contents)
+        self.assertEqual(observed, expected)
+
+    def test_archives_same_content_once(self):
+        self.objects.create({
+            'filename': self.create_file(self.contents[0]),
+            'mode': 'raw',
+            'target-type': 'device',
+            'target': '/dev/sdb',
+        })
+        fp = io.BytesIO()
+        self.write_archive(fp)
+        self.verify_archive(fp)
+
+    def test_deflates_only_uncompressed_objects(self):
+        fp = io.BytesIO()
+        self.write_archive(fp, compression='deflate', level=9, workers=2)
+        compress_types = self.verify_archive(fp)
+        for content in self.contents:
+            sha256sum = hashlib.sha256(content).hexdigest()
+            expected = zipfile.ZIP_DEFLATED
+            if content.startswith(b'\x1f\x8b'):
+                expected = zipfile.ZIP_STORED
+            self.assertEqual(compress_types[sha256sum], expected)
+
+    def test_can_write_into_unseekable_stream(self):
+        for compression in ['stored', 'deflate']:
+            fp = UnseekableBuffer()
+            self.write_archive(fp, compression=compression)
+            self.verify_archive(io.BytesIO(fp.getvalue()))
+
+    def write_previous_archive(self, **options):
+        """Writes an archive, caching the hashes of current objects."""
+        self.enable_cache()
+        for obj in self.objects.all():
+            # not modified recently (racy), so hashes are cached
+            os.utime(obj.filename, (946684800, 946684800))
+        previous = self.create_file()
+        self.write_archive(previous, **options)
+        return previous
+
+    def test_reuses_objects_of_previous_archive(self):
+        previous = self.write_previous_archive(compression='deflate')
+        content = b'ham' * 10
+        self.contents.append(content)
+        self.objects.create({
+            'filename': self.create_file(content),
+            'mode': 'raw',
+            'target-type': 'device',
+            'target': '/dev/sdb',
+        })
+        fp = io.BytesIO()
+        callback = Mock()
+        with PackageArchive(previous) as archive, \
+                ArchiveWriter(fp, 'deflate') as writer:
+            writer.add_objects(self.objects, callback, previous=archive)
+            writer.add_metadata('{}', None)
+            reused = {info.filename: info for info in archive.members()}
+        compress_types = self.verify_archive(fp)
+        # only the new object is read
+        self.assertEqual(callback.object_progress.call_count, 10)
+        with zipfile.ZipFile(fp) as archive:
+            for name, info in reused.items():
+                self.assertEqual(archive.getinfo(name).CRC, info.CRC)
+                self.assertEqual(archive.getinfo(name).comment, info.comment)
+        sha256sum = hashlib.sha256(content).hexdigest()
+        self.assertEqual(compress_types[sha256sum], zipfile.ZIP_DEFLATED)
+
+    def test_does_not_reuse_objects_with_other_compression(self):
+        previous = self.write_previous_archive()
+        fp = io.BytesIO()
+        callback = Mock()
+        with PackageArchive(previous) as archive, \
+                ArchiveWriter(fp, 'deflate') as writer:
+            writer.add_objects(self.objects, callback, previous=archive)
+            writer.add_metadata('{}', None)
+        compress_types = self.verify_archive(fp)
+        for content in self.contents:
+            sha256sum = hashlib.sha256(content).hexdigest()
+            expected = zipfile.ZIP_DEFLATED
+            if content.startswith(b'\x1f\x8b'):
+                expected = zipfile.ZIP_STORED
+            self.assertEqual(compress_types[sha256sum], expected)
+        # only the gzip object is reused, the others are read once
+        self.assertEqual(callback.object_progress.call_count, 28)
+
+    def test_does_not_reuse_objects_without_cached_hashes(self):
+        previous = self.create_file()
+        self.write_archive(previous, compression='deflate')
+        fp = io.BytesIO()
+        callback = Mock()
+        with PackageArchive(previous) as archive, \
+                ArchiveWriter(fp, 'deflate') as writer:
+            writer.add_objects(self.objects, callback, previous=archive)
+            writer.add_metadata('{}', None)
+        self.verify_archive(fp)
+        # each object is read once, to be hashed and written
+        n_chunks = sum(len(obj) for obj in self.objects.all())
+        self.assertEqual(callback.object_progress.call_count, n_chunks)
+
+    def test_cannot_use_unknown_compression(self):
+        with self.assertRaises(ValueError):
+            ArchiveWriter(io.BytesIO(), compression='spam')
+
+    def test_can_write_raw_members(self):
+        data = zlib.compressobj(9, zlib.DEFLATED, -15)
+        data = data.compress(b'spam') + data.flush()
+        zinfo = zipfile.ZipInfo('spam')
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        zinfo.CRC = zlib.crc32(b'spam')
+        zinfo.file_size = 4
+        zinfo.compress_size = len(data)
+        fp = io.BytesIO()
+        with ArchiveWriter(fp) as writer:
+            writer.write_raw(zinfo, io.BytesIO(data + b'eggs'))
+            writer.write_raw(zinfo, io.BytesIO(data))  # skipped
+        with zipfile.ZipFile(fp) as archive:
+            self.assertEqual(archive.namelist(), ['spam'])
+            self.assertEqual(archive.read('spam'), b'spam')
+
+
+class PackageArchiveTestCase(
+        EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 3)
+        self.contents = [b'spam' * 10, gzip.compress(b'ham')]
+        self.objects = ObjectsManager(1)
+        for content in self.contents:
+            self.objects.create({
+                'filename': self.create_file(content),
+                'mode': 'raw',
+                'target-type': 'device',
+                'target': '/dev/sda',
+            })
+        self.metadata = self.objects.to_metadata()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_archive(self, compression='stored', metadata=None):
+        fn = self.create_file()
+        with ArchiveWriter(fn, compression) as writer:
+            writer.add_objects(self.objects)
+            if metadata is None:
+                metadata = self.metadata
+            writer.add_metadata(json.dumps(metadata), 'signature')
+        return fn
+
+    def verify_upload(self, objects):
+        self.assertEqual(len(objects), len(self.contents))
+        expected = {obj['sha256sum']: obj for obj in self.objects.to_upload()}
+        for obj in objects:
+            local = expected[obj['sha256sum']]
+            self.assertEqual(obj['md5'], local['md5'])
+            self.assertEqual(obj['size'], local['size'])
+            self.assertEqual(obj['name'], local['name'])
+            with open(obj['filename'], 'rb') as fp:
+                fp.seek(obj.get('offset', 0))
+                data = fp.read(obj['size'])
+            with open(local['filename'], 'rb') as fp:
+                self.assertEqual(data, fp.read())
+
+    def test_can_read_metadata_and_signature(self):
+        with PackageArchive(self.write_archive()) as archive:
+            self.assertEqual(archive.metadata, self.metadata)
+            self.assertEqual(archive.payload, json.dumps(self.metadata))
+            self.assertEqual(archive.signature, 'signature')
+            self.assertEqual(len(archive.members()), len(self.contents))
+
+    def test_uploads_stored_members_from_archive(self):
+        fn = self.write_archive()
+        callback = Mock()
+        with PackageArchive(fn) as archive:
+            objects = archive.to_upload(self.directory, callback)
+        for obj in objects:
+            self.assertEqual(obj['filename'], os.path.realpath(fn))
+        self.verify_upload(objects)
+        self.assertFalse(callback.object_progress.called)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_extracts_compressed_members_to_upload(self):
+        fn = self.write_archive('deflate')
+        with PackageArchive(fn) as archive:
+            objects = archive.to_upload(self.directory)
+        self.verify_upload(objects)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_computes_md5_when_not_kept_in_archive(self):
+        fn = self.write_archive()
+        callback = Mock()
+        with PackageArchive(fn) as archive:
+            for info in archive.members():
+                info.comment = b''
+            objects = archive.to_upload(self.directory, callback)
+        self.verify_upload(objects)
+        self.assertTrue(callback.object_progress.called)
+
+    def test_raises_error_if_archive_misses_objects(self):
+        metadata = {'objects': [[{'sha256sum': '1' * 64}]]}
+        fn = self.write_archive(metadata=metadata)
+        with PackageArchive(fn) as archive:
+            with self.assertRaises(ValueError):
+                archive.to_upload(self.directory)
+
+    def test_opens_archive_only_when_needed(self):
+        archive = PackageArchive(self.create_file(b'spam'))
+        self.assertIsNone(archive._archive)
+        with self.assertRaises(ValueError):
+            archive.metadata
+
+    def test_raises_error_if_archive_misses_metadata(self):
+        fn = self.create_file()
+        with zipfile.ZipFile(fn, 'w') as archive:
+            archive.writestr('signature', '')
+        with PackageArchive(fn) as archive:
+            with self.assertRaises(ValueError):
+                archive.metadata
+
+    def test_can_look_up_objects_by_sha256sum(self):
+        sha256sums = sorted(
+            hashlib.sha256(content).hexdigest() for content in self.contents)
+        with PackageArchive(self.write_archive()) as archive:
+            self.assertEqual(len(archive), 2)
+            self.assertEqual(sorted(archive), sha256sums)
+            for sha256sum in sha256sums:
+                self.assertIn(sha256sum, archive)
+                self.assertEqual(
+                    archive.member(sha256sum).filename, sha256sum)
+            self.assertNotIn('metadata', archive)
+            self.assertNotIn('1' * 64, archive)
+            with self.assertRaises(KeyError):
+                archive.member('signature')
+
+    def test_can_read_objects(self):
+        for compression in ['stored', 'deflate']:
+            fn = self.write_archive(compression)
+            with PackageArchive(fn) as archive:
+                for content in self.contents:
+                    sha256sum = hashlib.sha256(content).hexdigest()
+                    callback = Mock()
+                    chunks = list(archive.read(sha256sum, True, callback))
+                    self.assertEqual(b''.join(chunks), content)
+                    self.assertEqual(
+                        callback.object_progress.call_count, len(chunks))
+
+    def corrupt_archive(self, fn):
+        content = self.contents[0]
+        sha256sum = hashlib.sha256(content).hexdigest()
+        with PackageArchive(fn) as archive:
+            offset = archive.data_offset(archive.member(sha256sum))
+        with open(fn, 'r+b') as fp:
+            fp.seek(offset)
+            fp.write(b'S')
+        return sha256sum
+
+    def test_read_raises_error_if_verified_object_is_corrupted(self):
+        fn = self.write_archive()
+        sha256sum = self.corrupt_archive(fn)
+        with PackageArchive(fn) as archive:
+            data = b''.join(archive.read(sha256sum))
+            self.assertEqual(data, b'S' + self.contents[0][1:])
+            with self.assertRaises(ValueError):
+                list(archive.read(sha256sum, verify=True))
+
+    def test_can_verify_archive(self):
+        with PackageArchive(self.write_archive('deflate')) as archive:
+            self.assertEqual(archive.verify(), [])
+
+    def test_verify_returns_archive_errors(self):
+        obj = {'sha256sum': '1' * 64, 'size': 4}
+        self.metadata['objects'][0].append(obj)
+        sha256sum = hashlib.sha256(self.contents[1]).hexdigest()
+        for objs in self.metadata['objects']:
+            for obj in objs:
+                if obj['sha256sum'] == sha256sum:
+                    obj['size'] = 1
+        fn = self.write_archive()
+        corrupted = self.corrupt_archive(fn)
+        with PackageArchive(fn) as archive:
+            errors = archive.verify()
+        self.assertEqual(len(errors), 3)
+        self.assertIn('Object "{}" is missing.'.format('1' * 64), errors)
+        self.assertIn(
+            'Object "{}" size does not match.'.format(sha256sum), errors)
+        self.assertIn('Object "{}" is corrupted.'.format(corrupted), errors)
+
+    def test_can_extract_objects(self):
+        content = self.contents[0]
+        sha256sum = hashlib.sha256(content).hexdigest()
+        with PackageArchive(self.write_archive()) as archive:
+            fn = archive.extract(sha256sum, self.directory)
+        self.assertEqual(fn, os.path.join(self.directory, sha256sum))
+        with open(fn, 'rb') as fp:
+            self.assertEqual(fp.read(), content)
+
+    def test_does_not_extract_corrupted_objects(self):
+        fn = self.write_archive()
+        sha256sum = self.corrupt_archive(fn)
+        with PackageArchive(fn) as archive:
+            with self.assertRaises(ValueError):
+                archive.extract(sha256sum, self.directory)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_does_not_replace_files_with_corrupted_objects(self):
+        fn = self.write_archive()
+        sha256sum = self.corrupt_archive(fn)
+        filename = os.path.join(self.directory, sha256sum)
+        with open(filename, 'wb') as fp:
+            fp.write(b'previous')
+        with PackageArchive(fn) as archive:
+            with self.assertRaises(ValueError):
+                archive.extract(sha256sum, self.directory)
+        self.assertEqual(os.listdir(self.directory), [sha256sum])
+        with open(filename, 'rb') as fp:
+            self.assertEqual(fp.read(), b'previous')
+
+    def test_does_not_extract_members_not_named_by_sha256sum(self):
+        fn = self.write_archive()
+        with zipfile.ZipFile(fn, 'a') as archive:
+            archive.writestr('../victim.txt', b'spam')
+        directory = os.path.join(self.directory, 'output')
+        os.mkdir(directory)
+        victim = os.path.join(self.directory, 'victim.txt')
+        with open(victim, 'wb') as fp:
+            fp.write(b'victim')
+        with PackageArchive(fn) as archive:
+            with self.assertRaises(ValueError):
+                archive.extract('../victim.txt', directory)
+        self.assertEqual(os.listdir(directory), [])
+        with open(victim, 'rb') as fp:
+            self.assertEqual(fp.read(), b'victim')
+
+    def test_does_not_extract_unknown_objects(self):
+        with PackageArchive(self.write_archive()) as archive:
+            with self.assertRaises(KeyError):
+                archive.extract('1' * 64, self.directory)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_archive_as_string(self):
+        self.metadata.update({'product': 'a' * 64, 'version': '2.0'})
+        with PackageArchive(self.write_archive()) as archive:
+            observed = str(archive)
+        self.assertIn('Product: {}'.format('a' * 64), observed)
+        self.assertIn('Version: 2.0', observed)
+        self.assertIn('Signed: yes', observed)
+        for content in self.contents:
+            self.assertIn(hashlib.sha256(content).hexdigest(), observed)
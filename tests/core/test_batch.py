@@ -0,0 +1,108 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import base64
+import zipfile
+
+from Cryptodome.Hash import SHA256
+from Cryptodome.PublicKey import RSA
+from Cryptodome.Signature import PKCS1_v1_5
+
+from uhu.core.batch import sign_many, verify_many
+from uhu.core.package import Package
+from uhu.core.utils import dump_package, dump_package_archive
+
+from utils import FileFixtureMixin, UHUTestCase
+
+
+class BatchTestCase(FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.key = RSA.generate(1024)
+        self.private_key = self.create_file(self.key.exportKey())
+        self.public_key = self.create_file(self.key.publickey().exportKey())
+        self.package = Package(version='2.0', product='a' * 64)
+        self.package.objects.create({
+            'filename': self.create_file(b'spam'),
+            'mode': 'raw',
+            'target-type': 'device',
+            'target': '/dev/sda',
+        })
+        self.package_fn = self.create_file()
+        dump_package(self.package.to_template(), self.package_fn)
+        self.archive_fn = self.create_file()
+        dump_package_archive(self.package, self.archive_fn, force=True)
+
+    def read_archive(self):
+        with zipfile.ZipFile(self.archive_fn) as archive:
+            return (archive.read('metadata'),
+                    archive.read('signature').decode())
+
+    def verify_signature(self, payload, signature):
+        verifier = PKCS1_v1_5.new(self.key)
+        return verifier.verify(
+            SHA256.new(payload), base64.b64decode(signature))
+
+    def test_can_sign_many_archives(self):
+        archive_fn = self.create_file()
+        dump_package_archive(self.package, archive_fn, force=True)
+        for workers in [1, 2]:
+            report = sign_many(
+                [self.archive_fn, archive_fn], self.private_key,
+                workers=workers)
+            self.assertEqual([entry['file'] for entry in report],
+                             [self.archive_fn, archive_fn])
+            self.assertEqual([entry['type'] for entry in report],
+                             ['archive', 'archive'])
+            for entry in report:
+                self.assertTrue(entry['ok'])
+                self.assertEqual(entry['errors'], [])
+            payload, signature = self.read_archive()
+            self.assertEqual(report[0]['signature'], signature)
+            self.assertTrue(self.verify_signature(payload, signature))
+
+    def test_sign_many_rejects_package_files(self):
+        report = sign_many([self.package_fn], self.private_key)
+        self.assertEqual(report[0]['type'], 'package')
+        self.assertFalse(report[0]['ok'])
+        self.assertIsNone(report[0]['signature'])
+        self.assertIn('Only package archives', report[0]['errors'][0])
+
+    def test_sign_many_reports_errors_without_stopping(self):
+        invalid = self.create_file('spam')
+        report = sign_many([invalid, self.archive_fn], self.private_key)
+        self.assertFalse(report[0]['ok'])
+        self.assertEqual(len(report[0]['errors']), 1)
+        self.assertTrue(report[1]['ok'])
+
+    def test_cannot_sign_many_without_private_key(self):
+        with self.assertRaises(ValueError):
+            sign_many([self.archive_fn], None)
+
+    def test_can_verify_many_files(self):
+        sign_many([self.archive_fn], self.private_key)
+        for key in [self.private_key, self.public_key]:
+            report = verify_many(
+                [self.archive_fn, self.package_fn], key, workers=2)
+            for entry in report:
+                self.assertTrue(entry['ok'])
+                self.assertEqual(entry['errors'], [])
+
+    def test_verify_many_reports_unsigned_archives(self):
+        report = verify_many([self.archive_fn], self.public_key)
+        self.assertFalse(report[0]['ok'])
+        self.assertEqual(report[0]['errors'], ['Archive is not signed.'])
+
+    def test_verify_many_reports_archives_signed_by_other_key(self):
+        other_key = self.create_file(RSA.generate(1024).exportKey())
+        sign_many([self.archive_fn], other_key)
+        report = verify_many([self.archive_fn], self.public_key)
+        self.assertFalse(report[0]['ok'])
+        self.assertEqual(report[0]['errors'],
+                         ['Archive signature does not match its metadata.'])
+
+    def test_verify_many_reports_invalid_package_files(self):
+        package_fn = self.create_file()
+        dump_package(Package().to_template(), package_fn)
+        report = verify_many([package_fn], self.public_key)
+        self.assertFalse(report[0]['ok'])
@@ -1,12 +1,15 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import gzip
+import lzma
 import os
 import unittest
 from unittest.mock import patch
 
 from uhu.core.object import Object
 import uhu.core.compression as utils
+from uhu.utils import NO_COMPRESSION_CHECK_VAR
 
 from utils import UHUTestCase, FileFixtureMixin
 
@@ -56,11 +59,76 @@ class CompressionUtilitiesTestCase(FileFixtureMixin, UHUTestCase):
         with self.assertRaises(SystemError):
             utils.get_uncompressed_size(fn, 'lzop')
 
-    @patch('uhu.core.compression.subprocess.check_call', return_value=1)
-    def test_uncompressed_size_raises_error_if_corrupted_file(self, _):
-        fn = os.path.join(self.fixtures_dir, 'base.txt.lzo')
+    def test_uncompressed_size_raises_error_if_corrupted_file(self):
+        with open(os.path.join(self.fixtures_dir, 'base.txt.gz'), 'rb') as fp:
+            fn = self.create_file(fp.read()[:-100])
         with self.assertRaises(ValueError):
-            utils.get_uncompressed_size(fn, 'lzop')
+            utils.get_uncompressed_size(fn, 'gzip')
+
+    def test_uncompressed_size_raises_error_if_trailing_garbage(self):
+        fn = self.create_file(gzip.compress(b'spam') + b'eggs')
+        with self.assertRaises(ValueError):
+            utils.get_uncompressed_size(fn, 'gzip')
+
+    def test_uncompressed_size_ignores_zero_padding(self):
+        fn = self.create_file(gzip.compress(b'a' * 1000) + bytes(512))
+        self.assertEqual(utils.get_uncompressed_size(fn, 'gzip'), 1000)
+
+    def test_uncompressed_size_raises_error_if_data_after_padding(self):
+        data = gzip.compress(b'spam') + bytes(8) + gzip.compress(b'egg')
+        fn = self.create_file(data)
+        with self.assertRaises(ValueError):
+            utils.get_uncompressed_size(fn, 'gzip')
+
+    def test_can_get_gzip_multiple_members_uncompressed_size(self):
+        fn = self.create_file(gzip.compress(b'spam') + gzip.compress(b'egg'))
+        self.assertEqual(utils.get_uncompressed_size(fn, 'gzip'), 7)
+
+    def test_can_get_xz_multiple_streams_uncompressed_size(self):
+        data = lzma.compress(b'spam') + bytes(8) + lzma.compress(b'egg')
+        fn = self.create_file(data)
+        self.assertEqual(utils.get_uncompressed_size(fn, 'xz'), 7)
+        observed = utils.get_uncompressed_size(fn, 'xz', check=False)
+        self.assertEqual(observed, 7)
+
+    def test_can_get_lzma_uncompressed_size(self):
+        fn = self.create_file(lzma.compress(b'spam', lzma.FORMAT_ALONE))
+        self.assertEqual(utils.get_uncompressed_size(fn, 'lzma'), 4)
+
+    def test_can_get_uncompressed_size_without_check(self):
+        for fmt, ext in [('gzip', 'gz'), ('xz', 'xz'), ('lzop', 'lzo')]:
+            fn = os.path.join(self.fixtures_dir, 'base.txt.' + ext)
+            with patch('uhu.core.compression.decode') as decode:
+                observed = utils.get_uncompressed_size(fn, fmt, check=False)
+            self.assertEqual(observed, self.size)
+            self.assertFalse(decode.called)
+
+    def test_check_can_be_disabled_by_environment(self):
+        fn = os.path.join(self.fixtures_dir, 'base.txt.lzo')
+        with patch.dict(os.environ, {NO_COMPRESSION_CHECK_VAR: '1'}):
+            observed = utils.get_uncompressed_size(fn, 'lzop')
+        self.assertEqual(observed, self.size)
+
+    def test_trailer_is_not_used_if_gzip_size_may_wrap_around(self):
+        fn = os.path.join(self.fixtures_dir, 'base.txt.gz')
+        with patch('uhu.core.compression.GZIP_MAX_RATIO', 2 ** 32):
+            self.assertIsNone(utils.gzip_trailer_size(fn))
+            observed = utils.get_uncompressed_size(fn, 'gzip', check=False)
+        self.assertEqual(observed, self.size)
+
+    @patch('uhu.core.compression.MAX_OUTPUT_SIZE', 10)
+    def test_decoders_count_output_in_bounded_steps(self):
+        for decoder, compress in [(utils.GzipDecoder(), gzip.compress),
+                                  (utils.XZDecoder(), lzma.compress)]:
+            decoder.feed(compress(bytes(1001)))
+            self.assertEqual(decoder.close(), 1001)
+
+    def test_decoder_raises_error_if_data_is_truncated(self):
+        for decoder, compress in [(utils.GzipDecoder(), gzip.compress),
+                                  (utils.XZDecoder(), lzma.compress)]:
+            decoder.feed(compress(b'spam' * 100)[:-10])
+            with self.assertRaises(ValueError):
+                decoder.close()
 
     def test_can_get_gzip_compressor_format_from_file(self):
         fn = os.path.join(self.fixtures_dir, 'base.txt.gz')
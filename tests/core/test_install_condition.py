@@ -2,7 +2,11 @@
 # SPDX-License-Identifier: GPL-2.0
 
 import hashlib
+import io
+import lzma
 import os
+import random
+import re
 import tempfile
 import unittest
 
@@ -30,6 +34,65 @@ def create_u_boot_spl_file():
     return fp.name
 
 
+def find_per_char(pattern, iterable):
+    """Reference implementation: checks each character at a time."""
+    regexp = re.compile(pattern)
+    phrase = b''
+    for chunk in iterable:
+        for char in chunk:
+            if char in ic.PRINTABLE:
+                phrase += bytes([char])
+            else:
+                result = ic.check(phrase, regexp)
+                if result:
+                    return result
+                phrase = b''
+    return ic.check(phrase, regexp)
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class FindTestCase(unittest.TestCase):
+
+    def test_can_find_pattern_in_printable_runs(self):
+        data = b'\x00\x01foo 1.2\xffbar 3.4\x00'
+        self.assertEqual(ic.find(br'\d\.\d', [data]), '1.2')
+        self.assertEqual(ic.find(br'bar (\S+)', [data]), '3.4')
+
+    def test_pattern_is_not_matched_across_non_printable_chars(self):
+        data = b'foo 1\x00.2'
+        self.assertIsNone(ic.find(br'\d\.\d', [data]))
+
+    def test_can_find_pattern_spanning_chunks(self):
+        data = b'\x00U-Boot 2017.05 (May 01 2017)\x00'
+        pattern = br'U-Boot(?: SPL)? (\S+) \(.*\)'
+        for size in range(1, len(data) + 1):
+            self.assertEqual(ic.find(pattern, split(data, size)), '2017.05')
+
+    def test_can_find_pattern_in_last_run(self):
+        self.assertEqual(ic.find(br'\d\.\d', [b'\x00', b'1.', b'0']), '1.0')
+
+    def test_min_width(self):
+        self.assertEqual(ic.min_width(re.compile(br'U-Boot (\S+)')), 8)
+        self.assertEqual(ic.min_width(re.compile(br'\d*')), 0)
+        self.assertEqual(ic.min_width(re.compile(br'a{1000}')), 256)
+
+    def test_results_are_the_same_as_checking_each_char(self):
+        rand = random.Random(0)
+        alphabet = b'abcxy 0123456789.\n\t' + bytes([0, 1, 127, 255])
+        patterns = [
+            br'(\d+\.\d+)', br'\d*', br'ab', br'^\w{3}$', br'(?i)x.{3}y']
+        for _ in range(300):
+            data = bytes(rand.choice(alphabet) for _ in range(100))
+            size = rand.randint(1, 40)
+            for pattern in patterns:
+                expected = find_per_char(pattern, split(data, size))
+                observed = ic.find(pattern, split(data, size))
+                self.assertEqual(observed, expected)
+
+
 class KernelVersionTestCase(unittest.TestCase):
 
     def get_kernel_fixture(self, fixture):
@@ -99,6 +162,31 @@ class KernelVersionTestCase(unittest.TestCase):
             observed = ic.get_arm_z_image_version(fp)
             self.assertEqual(expected, observed)
 
+    def test_arm_zImage_version_skips_invalid_headers(self):
+        kernel = lzma.compress(b'\x00Linux version 4.9.11 (gcc)\x00')
+        image = bytes(36) + b'\x18\x28\x6f\x01' + b'\x1f\x8b\x08!' + kernel
+        with tempfile.TemporaryFile() as fp:
+            fp.write(image)
+            fp.flush()
+            self.assertEqual(ic.get_arm_z_image_version(fp), '4.9.11')
+
+    def test_find_signatures_yields_first_offsets_in_file_order(self):
+        with tempfile.TemporaryFile() as fp:
+            fp.write(b'..CZh..\x1f\x8b\x08..CZh..\x5d\x00\x00')
+            fp.flush()
+            offsets = list(ic.find_signatures(fp, ic.ARM_Z_IMAGE_HEADERS))
+        self.assertEqual(offsets, [2, 7, 17])
+
+    def test_find_signatures_reads_streams_without_file(self):
+        fp = io.BytesIO(b'..CZh..\x1f\x8b\x08..CZh..\x5d\x00\x00')
+        offsets = list(ic.find_signatures(fp, ic.ARM_Z_IMAGE_HEADERS))
+        self.assertEqual(offsets, [2, 7, 17])
+
+    def test_find_signatures_returns_nothing_for_empty_files(self):
+        with tempfile.TemporaryFile() as fp:
+            offsets = list(ic.find_signatures(fp, ic.ARM_Z_IMAGE_HEADERS))
+        self.assertEqual(offsets, [])
+
     def test_can_get_arm_uImage_version(self):
         expected = '4.1.15-1.2.0+g274a055'
         with open(self.get_kernel_fixture('arm-uImage'), 'br') as fp:
@@ -1,16 +1,19 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import gzip
 import hashlib
 import os
+from unittest.mock import Mock, patch
 
+from uhu.core._object import HASHES
 from uhu.core.object import Object
 from uhu.utils import CHUNK_SIZE_VAR
 
-from utils import EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase
+from utils import CacheFixtureMixin, FileFixtureMixin, UHUTestCase
 
 
-class ObjectTestCase(EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
+class ObjectTestCase(CacheFixtureMixin, FileFixtureMixin, UHUTestCase):
 
     def setUp(self):
         super().setUp()
@@ -67,6 +70,79 @@ class ObjectTestCase(EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
         self.assertEqual(obj.md5, md5)
         self.assertEqual(obj['sha256sum'], sha256sum)
 
+    def test_load_uses_cached_hashes_of_unchanged_files(self):
+        self.enable_cache()
+        content = b'spam'
+        self.options['filename'] = self.create_file(content)
+        os.utime(self.options['filename'], (0, 0))
+        Object(self.options).load()
+        HASHES.save()
+
+        callback = Mock()
+        obj = Object(self.options)
+        obj.load(callback)
+        self.assertFalse(callback.object_progress.called)
+        self.assertEqual(obj['sha256sum'], hashlib.sha256(content).hexdigest())
+        self.assertEqual(obj.md5, hashlib.md5(content).hexdigest())
+        self.assertEqual(obj['size'], len(content))
+
+    def test_load_does_not_use_cache_if_file_changes(self):
+        self.enable_cache()
+        self.options['filename'] = self.create_file(b'spam')
+        os.utime(self.options['filename'], (0, 0))
+        Object(self.options).load()
+
+        with open(self.options['filename'], 'wb') as fp:
+            fp.write(b'eggs')
+        os.utime(self.options['filename'], (1, 1))
+        obj = Object(self.options)
+        obj.load()
+        self.assertEqual(obj['sha256sum'], hashlib.sha256(b'eggs').hexdigest())
+
+    def test_load_does_not_cache_recently_modified_files(self):
+        self.enable_cache()
+        self.options['filename'] = self.create_file(b'spam')
+        Object(self.options).load()
+        self.assertEqual(len(HASHES), 0)
+
+    def test_metadata_is_built_from_a_single_read(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 8)
+        content = b'\x00U-Boot 2017.05 (May 01 2017)\x00' * 10
+        self.options.update({
+            'filename': self.create_file(content),
+            'install-condition': 'version-diverges',
+            'install-condition-pattern-type': 'regexp',
+            'install-condition-pattern': r'U-Boot (\S+)',
+        })
+        obj = Object(self.options)
+        with patch('uhu.core.compression.get_compressor_format') as fmt, \
+                patch('uhu.core.install_condition.get_version') as version:
+            metadata = obj.to_metadata()
+        self.assertFalse(fmt.called)
+        self.assertFalse(version.called)
+        self.assertIsNone(metadata.get('compressed'))
+        self.assertEqual(
+            metadata['install-if-different']['version'], '2017.05')
+
+    def test_load_caches_compression_analysis(self):
+        self.enable_cache()
+        self.options['filename'] = self.create_file(gzip.compress(b'spam'))
+        os.utime(self.options['filename'], (0, 0))
+        Object(self.options).load()
+
+        obj = Object(self.options)
+        with patch('uhu.core.compression.get_compressor_format') as fmt:
+            metadata = obj.to_metadata()
+        self.assertFalse(fmt.called)
+        self.assertEqual(metadata['required-uncompressed-size'], 4)
+
+    def test_updating_object_discards_analysis(self):
+        self.options['filename'] = self.create_file(gzip.compress(b'spam'))
+        obj = Object(self.options)
+        obj.load()
+        obj.update('filename', self.create_file(b'spam'))
+        self.assertIsNone(obj.to_metadata(load=False).get('compressed'))
+
     def test_can_generate_metadata(self):
         content = b'spam'
         fn = self.create_file(content)
@@ -139,7 +215,7 @@ class ObjectTestCase(EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
             'size': os.path.getsize(__file__),
             'sha256sum': sha,
             'md5': md5,
-            'chunks': 1,
+            'name': os.path.basename(__file__),
         }
         self.assertEqual(obj.to_upload(), expected)
 
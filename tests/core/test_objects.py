@@ -1,12 +1,16 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import hashlib
 import os
 import unittest
 from unittest.mock import Mock, patch
 
 from uhu.core.object import Object
 from uhu.core.objects import ObjectsManager
+from uhu.utils import CHUNK_SIZE_VAR
+
+from utils import EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase
 
 
 def verify_all_modes(fn):
@@ -244,3 +248,91 @@ class ObjectsManagerTestCase(unittest.TestCase):
         observed = [objs[0].filename for objs in manager.objects]
         expected = [str(n) for n in range(1, 10)]
         self.assertEqual(observed, expected)
+
+
+class ObjectsManagerLoadTestCase(
+        EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 1)
+        self.content = b'spam'
+        self.sha256sum = hashlib.sha256(self.content).hexdigest()
+        self.options = {
+            'filename': self.create_file(self.content),
+            'mode': 'raw',
+            'target-type': 'device',
+            'target': '/dev/sda',
+        }
+
+    def test_load_reads_file_once_for_all_installation_sets(self):
+        manager = ObjectsManager(2)
+        manager.create(self.options)
+        callback = Mock()
+        manager.load(callback)
+        self.assertEqual(
+            callback.object_progress.call_count, len(self.content))
+        for obj in manager.all():
+            self.assertEqual(obj['sha256sum'], self.sha256sum)
+            self.assertEqual(obj['size'], len(self.content))
+            self.assertEqual(obj.md5, hashlib.md5(self.content).hexdigest())
+
+    def test_load_reads_linked_files_once(self):
+        link = self.options['filename'] + '-link'
+        os.link(self.options['filename'], link)
+        self.addCleanup(self.remove_file, link)
+        manager = ObjectsManager(1)
+        manager.create(self.options)
+        self.options['filename'] = link
+        manager.create(self.options)
+        callback = Mock()
+        manager.load(callback)
+        self.assertEqual(
+            callback.object_progress.call_count, len(self.content))
+        self.assertEqual(len(manager.all()), 2)
+        for obj in manager.all():
+            self.assertEqual(obj['sha256sum'], self.sha256sum)
+
+    def test_load_reads_each_distinct_file(self):
+        manager = ObjectsManager(2)
+        manager.create(self.options)
+        self.options['filename'] = self.create_file(b'eggs')
+        manager.create(self.options)
+        callback = Mock()
+        manager.load(callback)
+        self.assertEqual(callback.object_progress.call_count, 8)
+
+    def test_metadata_reads_file_once_for_all_installation_sets(self):
+        manager = ObjectsManager(2)
+        manager.create(self.options)
+        callback = Mock()
+        metadata = manager.to_metadata(callback)[manager.metadata]
+        self.assertEqual(
+            callback.object_progress.call_count, len(self.content))
+        self.assertEqual(metadata[0], metadata[1])
+        self.assertEqual(metadata[0][0]['sha256sum'], self.sha256sum)
+
+    def test_can_load_objects_in_parallel(self):
+        manager = ObjectsManager(2)
+        contents = [b'spam', b'eggs', b'ham']
+        for content in contents:
+            self.options['filename'] = self.create_file(content)
+            manager.create(self.options)
+        callback = Mock()
+        manager.load(callback, workers=3)
+        self.assertEqual(callback.object_progress.call_count, 11)
+        expected = sorted(
+            hashlib.sha256(content).hexdigest() for content in contents)
+        for set_index in range(2):
+            observed = sorted(obj['sha256sum'] for obj in manager[set_index])
+            self.assertEqual(observed, expected)
+
+    def test_parallel_load_raises_object_errors(self):
+        manager = ObjectsManager(1)
+        manager.create(self.options)
+        self.options['filename'] = self.create_file(b'eggs')
+        manager.create(self.options)
+        os.chmod(self.options['filename'], 0)
+        if os.access(self.options['filename'], os.R_OK):
+            self.skipTest('file permissions are not enforced')
+        with self.assertRaises(PermissionError):
+            manager.load(workers=2)
@@ -6,7 +6,7 @@ import hashlib
 import os
 import zipfile
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from Cryptodome.PublicKey import RSA
 from Cryptodome.Hash import SHA256
@@ -16,7 +16,8 @@ from pkgschema import ValidationError
 from uhu.core.hardware import SupportedHardwareManager
 from uhu.core.objects import ObjectsManager
 from uhu.core.package import Package
-from uhu.core.utils import dump_package, load_package, dump_package_archive
+from uhu.core.utils import (
+    dump_package, load_package, dump_package_archive, push_package_archive)
 from uhu.utils import CHUNK_SIZE_VAR, PRIVATE_KEY_FN
 
 from utils import FileFixtureMixin, EnvironmentFixtureMixin, UHUTestCase
@@ -245,18 +246,86 @@ class PackageSerializationTestCase(PackageTestCase):
             with self.assertRaises(ValueError):
                 dump_package_archive(pkg, output)
 
-    @patch('uhu.core.utils.pkgschema.validate_metadata',
+    def test_can_rebuild_archive_incrementally(self):
+        pkg = self.create_package()[0]
+        output = self.create_file()
+        os.remove(output)
+        dump_package_archive(pkg, output, incremental=True)
+        with zipfile.ZipFile(output) as archive:
+            info = archive.getinfo(self.obj_sha256)
+            offset = info.header_offset
+        # objects already in output are not read again to be archived
+        callback = Mock()
+        dump_package_archive(pkg, output, incremental=True, callback=callback)
+        self.verify_archive(output)
+        self.assertEqual(callback.object_progress.call_count, 2)
+        with zipfile.ZipFile(output) as archive:
+            self.assertEqual(
+                archive.getinfo(self.obj_sha256).header_offset, offset)
+
+    def test_cannot_rebuild_archive_into_file_object(self):
+        pkg = self.create_package()[0]
+        with open(self.create_file(), 'wb') as fp:
+            with self.assertRaises(ValueError):
+                dump_package_archive(pkg, fp, incremental=True)
+
+    @patch('uhu.updatehub.api.push_package', return_value='42')
+    def test_can_push_package_archive(self, mock):
+        pkg = self.create_package()[0]
+        output = self.create_file()
+        dump_package_archive(pkg, output, force=True)
+        self.assertEqual(push_package_archive(output), '42')
+        metadata, objects, _, signed = mock.call_args[0]
+        self.assertEqual(metadata, pkg.to_metadata())
+        with zipfile.ZipFile(output) as archive:
+            payload = archive.read('metadata').decode()
+            signature = archive.read('signature').decode()
+        self.assertEqual(signed, (payload, signature))
+        self.assertEqual(len(objects), 1)
+        self.assertEqual(objects[0]['sha256sum'], self.obj_sha256)
+        self.assertEqual(objects[0]['md5'], pkg.objects.all()[0].md5)
+        self.assertEqual(objects[0]['filename'], os.path.realpath(output))
+
+    @patch('pkgschema.validate_metadata',
            side_effect=ValidationError(None))
     def test_cannot_archive_package_when_metadata_is_invalid(self, mock):
         pkg = self.create_package()[0]
         output = self.create_file()
         with self.assertRaises(ValueError):
             dump_package_archive(pkg, output, force=True)
+        self.assertEqual(self.read_file(output), '')
+        self.assertFalse(os.path.exists('{}.part'.format(output)))
+
+    def test_can_archive_package_into_file_object(self):
+        pkg = self.create_package()[0]
+        output = self.create_file()
+        with open(output, 'wb') as fp:
+            observed = dump_package_archive(pkg, fp)
+        self.assertIs(observed, fp)
+        self.verify_archive(output)
+
+    def test_can_archive_package_with_deflated_objects(self):
+        pkg = self.create_package()[0]
+        output = self.create_file()
+        dump_package_archive(
+            pkg, output, force=True, compression='deflate', level=9)
+        self.verify_archive(output)
+        with zipfile.ZipFile(output) as archive:
+            info = archive.getinfo(self.obj_sha256)
+        self.assertEqual(info.compress_type, zipfile.ZIP_DEFLATED)
+
+    def test_cannot_archive_package_with_unknown_compression(self):
+        pkg = self.create_package()[0]
+        output = self.create_file()
+        os.remove(output)
+        with self.assertRaises(ValueError):
+            dump_package_archive(pkg, output, compression='spam')
+        self.assertFalse(os.path.exists(output))
 
 
 class PackagePushTestCase(unittest.TestCase):
 
-    @patch('uhu.core.package.push_package', return_value='42')
+    @patch('uhu.updatehub.api.push_package', return_value='42')
     def test_push_sets_package_uid_when_successful(self, mock):
         pkg = Package()
         uid = pkg.push()
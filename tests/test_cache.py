@@ -0,0 +1,95 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import os
+
+from uhu.cache import Cache
+from uhu.utils import CACHE_DIR_VAR, NO_CACHE_VAR
+
+from utils import CacheFixtureMixin, UHUTestCase
+
+
+class CacheTestCase(CacheFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.cache_dir = self.enable_cache()
+
+    def test_can_get_and_set_values(self):
+        cache = Cache('test')
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', {'value': 1})
+        self.assertEqual(cache.get('key'), {'value': 1})
+        self.assertIn('key', cache)
+
+    def test_can_remove_values(self):
+        cache = Cache('test')
+        cache.set('key', 1)
+        cache.remove('key')
+        self.assertIsNone(cache.get('key'))
+
+    def test_values_are_persisted_only_when_saved(self):
+        cache = Cache('test')
+        cache.set('key', 'value')
+        self.assertIsNone(Cache('test').get('key'))
+        cache.save()
+        self.assertTrue(
+            os.path.exists(os.path.join(self.cache_dir, 'test.json')))
+        self.assertEqual(Cache('test').get('key'), 'value')
+
+    def test_evicts_least_recently_used_entries(self):
+        cache = Cache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_recently_used_order_is_persisted(self):
+        cache = Cache('test', max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.save()
+        cache = Cache('test', max_entries=2)
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_reads_do_not_rewrite_cache_file(self):
+        cache = Cache('test')
+        cache.set('key', 1)
+        cache.save()
+        fn = os.path.join(self.cache_dir, 'test.json')
+        os.utime(fn, (0, 0))
+        cache = Cache('test')
+        self.assertEqual(cache.get('key'), 1)
+        cache.save()
+        self.assertEqual(os.stat(fn).st_mtime, 0)
+
+    def test_corrupted_cache_file_is_ignored(self):
+        with open(os.path.join(self.cache_dir, 'test.json'), 'w') as fp:
+            fp.write('not json')
+        cache = Cache('test')
+        self.assertIsNone(cache.get('key'))
+        cache.set('key', 1)
+        cache.save()
+        self.assertEqual(Cache('test').get('key'), 1)
+
+    def test_can_create_cache_directory(self):
+        cache_dir = os.path.join(self.cache_dir, 'nested')
+        self.set_env_var(CACHE_DIR_VAR, cache_dir)
+        cache = Cache('test')
+        cache.set('key', 1)
+        cache.save()
+        self.assertEqual(os.listdir(cache_dir), ['test.json'])
+
+    def test_does_nothing_when_disabled(self):
+        self.set_env_var(NO_CACHE_VAR, 1)
+        cache = Cache('test')
+        cache.set('key', 1)
+        cache.save()
+        self.assertIsNone(cache.get('key'))
+        self.assertEqual(os.listdir(self.cache_dir), [])
@@ -1,10 +1,14 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import configparser
 import os
+from unittest.mock import patch
 
 from uhu.config import Config, AUTH_SECTION
-from uhu.utils import GLOBAL_CONFIG_VAR, PRIVATE_KEY_FN
+from uhu.utils import (
+    GLOBAL_CONFIG_VAR, PRIVATE_KEY_FN, CONNECT_TIMEOUT_VAR, READ_TIMEOUT_VAR,
+    MIN_UPLOAD_RATE_VAR, UPLOAD_RATE_VAR, UPLOAD_BURST_VAR)
 
 from utils import UHUTestCase, EnvironmentFixtureMixin, FileFixtureMixin
 
@@ -114,3 +118,81 @@ class ConfigTestCase(FileFixtureMixin, EnvironmentFixtureMixin, UHUTestCase):
     def test_get_credentials_raises_error_if_no_credentials_are_set(self):
         with self.assertRaises(ValueError):
             self.config.get_credentials()
+
+    def test_get_timeouts_returns_defaults(self):
+        timeouts = self.config.get_timeouts()
+        self.assertEqual(timeouts.connect, 10)
+        self.assertEqual(timeouts.read, 30)
+        self.assertIsNone(timeouts.total)
+        self.assertEqual(self.config.get_min_upload_rate(), 1024)
+
+    def test_can_get_timeouts_from_configuration_file(self):
+        self.config.set('connect_timeout', '3')
+        self.config.set('total_timeout', '120')
+        self.config.set('min_upload_rate', '512')
+        timeouts = self.config.get_timeouts()
+        self.assertEqual(timeouts.connect, 3)
+        self.assertEqual(timeouts.read, 30)
+        self.assertEqual(timeouts.total, 120)
+        self.assertEqual(self.config.get_min_upload_rate(), 512)
+
+    def test_environment_timeouts_take_precedence(self):
+        self.config.set('read_timeout', '3')
+        self.set_env_var(READ_TIMEOUT_VAR, '4.5')
+        self.set_env_var(MIN_UPLOAD_RATE_VAR, '0')
+        self.assertEqual(self.config.get_timeouts().read, 4.5)
+        self.assertEqual(self.config.get_min_upload_rate(), 0)
+
+    def test_upload_rate_limits_are_unlimited_by_default(self):
+        limits = self.config.get_upload_rate_limits()
+        self.assertEqual(limits, (None, None, None))
+
+    def test_can_get_upload_rate_limits(self):
+        self.config.set('upload_rate', '1000')
+        self.config.set('object_upload_rate', '500')
+        self.set_env_var(UPLOAD_BURST_VAR, '100')
+        limits = self.config.get_upload_rate_limits()
+        self.assertEqual(limits.total, 1000)
+        self.assertEqual(limits.per_object, 500)
+        self.assertEqual(limits.burst, 100)
+        self.set_env_var(UPLOAD_RATE_VAR, '2000')
+        self.assertEqual(self.config.get_upload_rate_limits().total, 2000)
+
+    def test_get_timeouts_raises_error_if_not_a_number(self):
+        self.set_env_var(CONNECT_TIMEOUT_VAR, 'ten')
+        with self.assertRaises(ValueError):
+            self.config.get_timeouts()
+
+    def test_file_is_parsed_only_when_changed(self):
+        self.config.set('foo', 'bar')
+        read = configparser.ConfigParser.read
+        with patch.object(configparser.ConfigParser, 'read',
+                          autospec=True, side_effect=read) as mock:
+            for _ in range(10):
+                self.assertEqual(self.config.get('foo'), 'bar')
+            self.assertEqual(mock.call_count, 0)
+
+            with open(self.config_filename, 'w') as fp:
+                fp.write('[settings]\nbar = foo\n')
+            os.utime(self.config_filename, ns=(1, 1))
+            self.assertIsNone(self.config.get('foo'))
+            self.assertEqual(self.config.get('bar'), 'foo')
+            self.assertEqual(mock.call_count, 1)
+
+    def test_get_does_not_create_configuration_file(self):
+        os.remove(self.config_filename)
+        self.assertIsNone(self.config.get('foo'))
+        self.assertFalse(os.path.exists(self.config_filename))
+
+    def test_set_does_not_leave_partial_file_on_errors(self):
+        self.config.set('foo', 'bar')
+        with patch.object(configparser.ConfigParser, 'write',
+                          side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.config.set('foo', 'foo bar')
+        self.assertEqual(self.read_file(self.config_filename),
+                         '[settings]\nfoo = bar')
+        self.assertEqual(self.config.get('foo'), 'bar')
+        directory = os.path.dirname(self.config_filename)
+        self.assertFalse([fn for fn in os.listdir(directory)
+                          if fn.startswith('.uhu-')])
@@ -0,0 +1,117 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import io
+from contextlib import redirect_stdout
+from unittest.mock import patch
+
+from uhu import ui
+
+from utils import UHUTestCase
+
+
+class DrawCounterCallback(ui.BaseCallback):
+
+    def __init__(self):
+        super().__init__()
+        self.frames = 0
+
+    def draw(self):
+        self.frames += 1
+
+
+class BaseCallbackTestCase(UHUTestCase):
+
+    def test_accumulates_bytes_of_objects(self):
+        callback = DrawCounterCallback()
+        callback.start_package_upload([{'size': 10}, {'size': 20}, {}])
+        self.assertEqual(callback.max, 30)
+        callback.object_progress(4)
+        callback.object_progress(6)
+        self.assertEqual(callback.current, 10)
+
+    def test_draws_at_most_once_per_frame(self):
+        callback = DrawCounterCallback()
+        callback.start_package_upload([{'size': 10000}])
+        with patch('uhu.ui.time.monotonic', return_value=1000):
+            for _ in range(10000):
+                callback.object_progress(1)
+        self.assertEqual(callback.frames, 1)
+        self.assertEqual(callback.current, 10000)
+
+    def test_draws_again_after_frame_interval(self):
+        callback = DrawCounterCallback()
+        callback.start_package_upload([{'size': 10}])
+        with patch('uhu.ui.time.monotonic') as monotonic:
+            monotonic.return_value = 1000
+            callback.object_progress(1)
+            callback.object_progress(1)
+            monotonic.return_value = 1000 + ui.FRAME_INTERVAL
+            callback.object_progress(1)
+        self.assertEqual(callback.frames, 2)
+
+    def test_tracks_progress_of_each_object(self):
+        callback = DrawCounterCallback()
+        callback.start_package_upload([{'size': 10}, {'size': 20}])
+        callback.start_object_upload('a', 10)
+        callback.start_object_upload('b', 20)
+        callback.object_progress(5, 'a')
+        callback.object_progress(7, 'b')
+        self.assertEqual(callback.objects['a'], [5, 10, 'a'])
+        self.assertEqual(callback.objects['b'], [7, 20, 'b'])
+        callback.finish_object_upload('a')
+        self.assertNotIn('a', callback.objects)
+        self.assertEqual(callback.current, 12)
+
+
+class TTYCallbackTestCase(UHUTestCase):
+
+    def test_draws_a_bar_for_each_concurrent_upload(self):
+        stream = io.StringIO()
+        callback = ui.TTYCallback(stream)
+        callback.start_package_upload([{'size': 10}, {'size': 10}])
+        callback.start_object_upload('a', 10)
+        callback.start_object_upload('b', 10)
+        callback.object_progress(10, 'a')
+        callback.draw()
+        frame = stream.getvalue().split('\r')[-1]
+        self.assertIn('50%', frame)
+        self.assertIn('100% a', frame)
+        self.assertIn('0% b', frame)
+
+    def test_draws_objects_with_same_name_apart(self):
+        stream = io.StringIO()
+        callback = ui.TTYCallback(stream)
+        callback.start_package_upload([{'size': 10}, {'size': 10}])
+        callback.start_object_upload('1234', 10, 'rootfs.ext4')
+        callback.start_object_upload('5678', 10, 'rootfs.ext4')
+        callback.object_progress(10, '1234')
+        callback.draw()
+        frame = stream.getvalue().split('\r')[-1]
+        self.assertIn('100% rootfs.ext4', frame)
+        self.assertIn('0% rootfs.ext4', frame)
+        callback.finish_object_upload('1234')
+        self.assertEqual(list(callback.objects), ['5678'])
+
+    def test_reports_throughput_when_finished(self):
+        stream = io.StringIO()
+        callback = ui.TTYCallback(stream)
+        callback.start_package_upload([{'size': 10}])
+        callback.object_progress(10)
+        callback.finish_package_upload()
+        self.assertIn('Uploading objects: ok (10 Bytes at', stream.getvalue())
+
+
+class NoTTYCallbackTestCase(UHUTestCase):
+
+    def test_prints_progress_in_steps(self):
+        stdout = io.StringIO()
+        callback = ui.NoTTYCallback()
+        with redirect_stdout(stdout):
+            callback.start_package_upload([{'size': 100}])
+            for _ in range(100):
+                callback.object_progress(1)
+                callback.draw()
+            callback.finish_package_upload()
+        steps = stdout.getvalue().split()[2:-2]
+        self.assertEqual(steps, ['{}%'.format(i) for i in range(0, 101, 5)])
@@ -6,8 +6,9 @@ import hashlib
 import json
 import os
 import tempfile
+import threading
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from Cryptodome.Hash import SHA256
 from Cryptodome.PublicKey import RSA
@@ -26,6 +27,9 @@ class UtilsTestCase(EnvironmentFixtureMixin, UHUTestCase):
         self.addCleanup(self.remove_env_var, utils.LOCAL_CONFIG_VAR)
         self.addCleanup(self.remove_env_var, utils.SERVER_URL_VAR)
         self.addCleanup(self.remove_env_var, utils.CUSTOM_CA_CERTS_VAR)
+        self.addCleanup(self.remove_env_var, utils.LOAD_WORKERS_VAR)
+        self.addCleanup(self.remove_env_var, utils.UPLOAD_WORKERS_VAR)
+        self.addCleanup(self.remove_env_var, utils.HTTP_POOL_SIZE_VAR)
 
     def test_get_chunk_size_by_environment_variable(self):
         os.environ[utils.CHUNK_SIZE_VAR] = '1'
@@ -36,6 +40,43 @@ class UtilsTestCase(EnvironmentFixtureMixin, UHUTestCase):
         observed = utils.get_chunk_size()
         self.assertEqual(observed, utils.DEFAULT_CHUNK_SIZE)
 
+    def test_get_load_workers_by_environment_variable(self):
+        os.environ[utils.LOAD_WORKERS_VAR] = '3'
+        self.assertEqual(utils.get_load_workers(), 3)
+
+    def test_get_default_load_workers(self):
+        self.assertEqual(utils.get_load_workers(), os.cpu_count() or 1)
+
+    def test_load_workers_is_at_least_one(self):
+        os.environ[utils.LOAD_WORKERS_VAR] = '0'
+        self.assertEqual(utils.get_load_workers(), 1)
+
+    def test_get_upload_workers_by_environment_variable(self):
+        os.environ[utils.UPLOAD_WORKERS_VAR] = '8'
+        self.assertEqual(utils.get_upload_workers(), 8)
+
+    def test_get_default_upload_workers(self):
+        self.assertEqual(
+            utils.get_upload_workers(), utils.DEFAULT_UPLOAD_WORKERS)
+
+    def test_get_known_objects_ttl_by_environment_variable(self):
+        self.set_env_var(utils.KNOWN_OBJECTS_TTL_VAR, '60')
+        self.assertEqual(utils.get_known_objects_ttl(), 60)
+        self.set_env_var(utils.KNOWN_OBJECTS_TTL_VAR, '-1')
+        self.assertEqual(utils.get_known_objects_ttl(), 0)
+
+    def test_get_default_known_objects_ttl(self):
+        self.assertEqual(
+            utils.get_known_objects_ttl(), utils.DEFAULT_KNOWN_OBJECTS_TTL)
+
+    def test_get_http_pool_size_by_environment_variable(self):
+        os.environ[utils.HTTP_POOL_SIZE_VAR] = '2'
+        self.assertEqual(utils.get_http_pool_size(), 2)
+
+    def test_get_default_http_pool_size(self):
+        self.assertEqual(
+            utils.get_http_pool_size(), utils.DEFAULT_HTTP_POOL_SIZE)
+
     def test_get_server_url_by_environment_variable(self):
         os.environ[utils.SERVER_URL_VAR] = 'http://ossystems.com.br'
         observed = utils.get_server_url()
@@ -74,6 +115,37 @@ class UtilsTestCase(EnvironmentFixtureMixin, UHUTestCase):
         self.assertEqual(observed, None)
 
 
+class SynchronizedCallbackTestCase(unittest.TestCase):
+
+    def test_forwards_calls_to_callback(self):
+        callback = Mock()
+        utils.call(utils.SynchronizedCallback(callback), 'object_read', 2)
+        callback.object_read.assert_called_once_with(2)
+
+    def test_ignores_missing_callback_methods(self):
+        utils.call(utils.SynchronizedCallback(None), 'object_read')
+        utils.call(utils.SynchronizedCallback(object()), 'object_read')
+
+    def test_calls_are_serialized(self):
+        state = {'running': 0, 'max': 0}
+
+        class Callback:
+            def object_read(self):
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+                threading.Event().wait(0.001)
+                state['running'] -= 1
+
+        callback = utils.SynchronizedCallback(Callback())
+        threads = [threading.Thread(target=callback.object_read)
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(state['max'], 1)
+
+
 class StringUtilsTestCase(unittest.TestCase):
 
     def test_can_indent_text(self):
@@ -136,6 +208,62 @@ class SignDictTestCase(unittest.TestCase):
         is_valid = verifier.verify(message, signature)
         self.assertTrue(is_valid)
 
+    def test_sign_metadata_returns_signed_payload(self):
+        _, fn = tempfile.mkstemp()
+        self.addCleanup(os.remove, fn)
+        key = RSA.generate(1024)
+        with open(fn, 'wb') as fp:
+            fp.write(key.exportKey())
+
+        payload, signature = utils.sign_metadata({'b': 1, 'a': 2}, fn)
+        self.assertEqual(payload, '{"a": 2, "b": 1}')
+        verifier = PKCS1_v1_5.new(key)
+        self.assertTrue(verifier.verify(
+            SHA256.new(payload.encode()), base64.b64decode(signature)))
+
+    def test_sign_metadata_without_private_key(self):
+        self.assertEqual(utils.sign_metadata({}, None), ('{}', None))
+
+    def test_private_key_is_parsed_only_once(self):
+        _, fn = tempfile.mkstemp()
+        self.addCleanup(os.remove, fn)
+        with open(fn, 'wb') as fp:
+            fp.write(RSA.generate(1024).exportKey())
+
+        with patch('Cryptodome.PublicKey.RSA.importKey',
+                   wraps=RSA.importKey) as mock:
+            key = utils.load_private_key(fn)
+            self.assertIs(utils.load_private_key(fn), key)
+            utils.sign_dict({}, fn)
+            self.assertEqual(mock.call_count, 1)
+
+            # a changed key is parsed again
+            with open(fn, 'wb') as fp:
+                fp.write(RSA.generate(1024).exportKey())
+            os.utime(fn, ns=(1, 1))
+            self.assertIsNot(utils.load_private_key(fn), key)
+            self.assertEqual(mock.call_count, 2)
+
+    def test_can_verify_payload(self):
+        key = RSA.generate(1024)
+        _, private_key = tempfile.mkstemp()
+        self.addCleanup(os.remove, private_key)
+        with open(private_key, 'wb') as fp:
+            fp.write(key.exportKey())
+        _, fn = tempfile.mkstemp()
+        self.addCleanup(os.remove, fn)
+        with open(fn, 'wb') as fp:
+            fp.write(key.publickey().exportKey())
+
+        payload, signature = '{}', utils.sign_payload('{}', private_key)
+        self.assertTrue(utils.verify_payload(payload, signature, fn))
+        self.assertFalse(utils.verify_payload('[]', signature, fn))
+        self.assertFalse(utils.verify_payload(payload, 'spam!', fn))
+
+    def test_cannot_verify_payload_without_key(self):
+        with self.assertRaises(ValueError):
+            utils.verify_payload('{}', 'signature', None)
+
     def test_raises_error_if_invalid_file(self):
         with self.assertRaises(ValueError):
             utils.sign_dict({}, __file__)
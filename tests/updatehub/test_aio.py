@@ -0,0 +1,129 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import asyncio
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from uhu.updatehub import aio
+from uhu.updatehub.api import ObjectUploadResult, UpdateHubError
+from uhu.updatehub.http import HTTPError
+from uhu.utils import UPLOAD_WORKERS_VAR
+
+from utils import EnvironmentFixtureMixin, UHUTestCase
+
+
+class AsyncTestCase(EnvironmentFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+
+    def run_until_complete(self, coro):
+        return self.loop.run_until_complete(coro)
+
+
+class PushPackageTestCase(AsyncTestCase):
+
+    @patch('uhu.updatehub.api.upload_metadata', return_value='1')
+    @patch('uhu.updatehub.api.upload_object',
+           return_value=ObjectUploadResult.SUCCESS)
+    @patch('uhu.updatehub.api.finish_package')
+    def test_returns_uid_when_successful(self, finish, upload, metadata):
+        objects = [{'sha256sum': '1'}, {'sha256sum': '2'}]
+        uid = self.run_until_complete(aio.push_package({}, objects))
+        self.assertEqual(uid, '1')
+        metadata.assert_called_once_with({}, None)
+        self.assertEqual(upload.call_count, 2)
+        finish.assert_called_once_with('1', None)
+
+    @patch('uhu.updatehub.api.upload_metadata', return_value='1')
+    @patch('uhu.updatehub.api.upload_object',
+           return_value=ObjectUploadResult.FAIL)
+    @patch('uhu.updatehub.api.finish_package')
+    def test_raises_error_when_some_upload_fails(self, finish, *_):
+        with self.assertRaises(UpdateHubError):
+            self.run_until_complete(aio.push_package({}, [{}]))
+        self.assertFalse(finish.called)
+
+
+class UploadObjectsTestCase(AsyncTestCase):
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_bounds_concurrent_uploads(self, upload):
+        self.set_env_var(UPLOAD_WORKERS_VAR, 2)
+        lock = threading.Lock()
+        running = []
+        observed = []
+
+        def upload_object(*args):
+            with lock:
+                running.append(args)
+                observed.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(args)
+            return ObjectUploadResult.SUCCESS
+
+        upload.side_effect = upload_object
+        objects = [{'sha256sum': str(i)} for i in range(6)]
+        self.run_until_complete(aio.upload_objects('1234', objects))
+        self.assertEqual(upload.call_count, 6)
+        self.assertEqual(max(observed), 2)
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_does_not_block_event_loop(self, upload):
+        started = threading.Event()
+        ticks = []
+
+        def upload_object(*args):
+            started.set()
+            time.sleep(0.2)
+            return ObjectUploadResult.SUCCESS
+
+        async def tick():
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(aio.upload_objects('1234', [{}]), tick())
+
+        upload.side_effect = upload_object
+        self.run_until_complete(main())
+        self.assertEqual(len(ticks), 5)
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_notifies_callback(self, upload):
+        upload.return_value = ObjectUploadResult.SUCCESS
+        callback = Mock()
+        objects = [{'size': 1}, {'size': 2}]
+        self.run_until_complete(
+            aio.upload_objects('1234', objects, callback))
+        callback.start_package_upload.assert_called_once_with(
+            [{'size': 1}, {'size': 2}])
+        callback.finish_package_upload.assert_called_once_with()
+
+
+class RequestsTestCase(AsyncTestCase):
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_upload_object_returns_EXISTS(self, post):
+        post.return_value.status_code = 200
+        obj = {'sha256sum': '1', 'md5': '2', 'size': 1}
+        result = self.run_until_complete(aio.upload_object(obj, '1234'))
+        self.assertEqual(result, ObjectUploadResult.EXISTS)
+
+    @patch('uhu.updatehub.api.http.put', side_effect=HTTPError)
+    def test_finish_package_raises_error_when_fail(self, put):
+        with self.assertRaises(UpdateHubError):
+            self.run_until_complete(aio.finish_package('1234'))
+
+    @patch('uhu.updatehub.api.http.get')
+    def test_can_get_package_status(self, get):
+        get.return_value.json.return_value = {'status': 'done'}
+        status = self.run_until_complete(aio.get_package_status('1234'))
+        self.assertEqual(status, 'done')
@@ -8,11 +8,16 @@ from datetime import datetime, timezone
 from unittest.mock import patch, Mock
 
 import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
 from uhu import utils
 from uhu.updatehub._request import Request
+from uhu.updatehub._retry import parse_retry_after, RetryPolicy
+from uhu.updatehub._session import close_session, get_session, new_session
 from uhu.updatehub.http import (
-    format_server_error, HTTPError, request, UNKNOWN_ERROR, get, post, put)
+    format_server_error, HTTPError, request, UNKNOWN_ERROR, get, post, put,
+    TransientHTTPError, StalledTransferError, ThroughputWatchdog,
+    TokenBucket)
 from uhu.updatehub.auth import UHV1Signature
 
 
@@ -38,7 +43,7 @@ class RequestTestCase(unittest.TestCase):
         put(url)
         mock.assert_called_with('PUT', url)
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     @patch('uhu.updatehub.http.get_custom_ca_certs_file',
            return_value=FAKE_CA_CERTS)
     def test_can_use_custom_ca_certs_in_requests(self, ca_cert_mock, mock):
@@ -111,14 +116,47 @@ class RequestTestCase(unittest.TestCase):
         for header in headers:
             self.assertEqual(str(headers[header]), prepared_headers[header])
 
-    @patch('uhu.updatehub._request.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_send_request(self, request):
         Request('localhost', 'GET').send()
         args, kwargs = request.call_args
         self.assertEqual(args, ('GET', 'localhost'))
-        self.assertEqual(kwargs.get('timeout'), 30)
-
-    @patch('uhu.updatehub._request.requests.request')
+        self.assertEqual(kwargs.get('timeout'), (10, 30))
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_send_request_uses_configured_timeouts(self, request):
+        os.environ[utils.CONNECT_TIMEOUT_VAR] = '2'
+        os.environ[utils.READ_TIMEOUT_VAR] = '5'
+        self.addCleanup(os.environ.pop, utils.CONNECT_TIMEOUT_VAR)
+        self.addCleanup(os.environ.pop, utils.READ_TIMEOUT_VAR)
+        Request('localhost', 'GET').send()
+        _, kwargs = request.call_args
+        self.assertEqual(kwargs.get('timeout'), (2, 5))
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_unsigned_request_uses_configured_timeouts(self, request):
+        os.environ[utils.CONNECT_TIMEOUT_VAR] = '2'
+        self.addCleanup(os.environ.pop, utils.CONNECT_TIMEOUT_VAR)
+        request.return_value = Mock(ok=True, status_code=200)
+        put('localhost', sign=False)
+        _, kwargs = request.call_args
+        self.assertEqual(kwargs.get('timeout'), (2, 30))
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_timeouts_do_not_go_beyond_total_timeout(self, request):
+        os.environ[utils.CONNECT_TIMEOUT_VAR] = '2'
+        os.environ[utils.TOTAL_TIMEOUT_VAR] = '5'
+        self.addCleanup(os.environ.pop, utils.CONNECT_TIMEOUT_VAR)
+        self.addCleanup(os.environ.pop, utils.TOTAL_TIMEOUT_VAR)
+        request.return_value = Mock(ok=True, status_code=200)
+        put('localhost', sign=False)
+        _, kwargs = request.call_args
+        connect, read = kwargs.get('timeout')
+        self.assertEqual(connect, 2)
+        self.assertLessEqual(read, 5)
+        self.assertGreater(read, 4)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_request_is_signed(self, request):
         Request('/signed', 'GET').send()
         headers = request.call_args[1]['headers']
@@ -136,13 +174,43 @@ class RequestTestCase(unittest.TestCase):
         observed = req.headers.get('Host')
         self.assertEqual(observed, expected)
 
-    @patch('uhu.updatehub._request.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_can_pass_extra_kwargs_to_requests(self, mock):
         Request('http://localhost', 'GET', stream=True).send()
         observed = list(mock.call_args)[1].get('stream')
         self.assertTrue(observed)
 
 
+class SessionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        set_credentials()
+        self.addCleanup(close_session)
+
+    def test_session_is_shared(self):
+        self.assertIs(get_session(), get_session())
+
+    def test_can_close_shared_session(self):
+        session = get_session()
+        close_session()
+        self.assertIsNot(get_session(), session)
+
+    def test_session_pools_connections_by_host(self):
+        session = new_session(pool_size=7)
+        for prefix in ['http://', 'https://']:
+            adapter = session.get_adapter(prefix + 'localhost')
+            self.assertEqual(adapter._pool_connections, 7)
+            self.assertEqual(adapter._pool_maxsize, 7)
+
+    @patch('uhu.updatehub.http.get_session')
+    def test_signed_and_unsigned_requests_use_shared_session(self, mock):
+        mock.return_value.request.return_value.status_code = 200
+        with patch('uhu.updatehub._request.get_session', mock):
+            request('GET', 'http://localhost')
+            request('PUT', 'http://localhost', sign=False)
+        self.assertEqual(mock.return_value.request.call_count, 2)
+
+
 class CanonicalRequestTestCase(unittest.TestCase):
 
     @patch('uhu.updatehub._request.datetime')
@@ -225,7 +293,7 @@ class SignedRequestTestCase(unittest.TestCase):
         header = request.headers.get('Authorization', None)
         self.assertIsNotNone(header)
 
-    @patch('uhu.updatehub._request.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_signatured_is_calculated_with_right_headers(self, mock):
         request = Request('localhost', 'POST')
         self.assertIsNone(request.headers.get('Authorization', None))
@@ -300,8 +368,10 @@ class RequestErrorsTestCase(unittest.TestCase):
 
     def setUp(self):
         set_credentials()
+        os.environ[utils.RETRY_ATTEMPTS_VAR] = '1'
+        self.addCleanup(os.environ.pop, utils.RETRY_ATTEMPTS_VAR)
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_returns_response_if_no_error_is_present(self, mock):
         mock.return_value.ok = True
         mock.return_value.status_code = 200
@@ -309,7 +379,7 @@ class RequestErrorsTestCase(unittest.TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(response.ok)
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_raises_error_when_invalid_url(self, mock):
         exceptions = [
             requests.exceptions.MissingSchema,
@@ -322,7 +392,7 @@ class RequestErrorsTestCase(unittest.TestCase):
             with self.assertRaises(HTTPError):
                 request('GET', 'foo')
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_raises_error_when_server_is_unavailable(self, mock):
         exceptions = [requests.ConnectionError, requests.ConnectTimeout]
         mock.side_effect = exceptions
@@ -330,7 +400,7 @@ class RequestErrorsTestCase(unittest.TestCase):
             with self.assertRaises(HTTPError):
                 request('GET', 'foo')
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_raises_error_with_any_other_requests_exception(self, mock):
         exceptions = [
             requests.exceptions.HTTPError,
@@ -357,13 +427,13 @@ class RequestErrorsTestCase(unittest.TestCase):
             with self.assertRaises(HTTPError):
                 request('GET', 'foo')
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_raises_error_when_unathorized(self, mock):
         mock.return_value.status_code = 401
         with self.assertRaises(HTTPError):
             request('GET', 'foo')
 
-    @patch('uhu.updatehub.http.requests.request')
+    @patch('uhu.updatehub._session.requests.Session.request')
     def test_raises_error_if_response_is_not_ok(self, mock):
         mock.return_value.ok = False
         with self.assertRaises(HTTPError):
@@ -374,3 +444,282 @@ class RequestErrorsTestCase(unittest.TestCase):
         del os.environ[utils.ACCESS_SECRET_VAR]
         with self.assertRaises(HTTPError):
             request('GET', 'foo')
+
+
+def response(status_code, headers=None):
+    mock = Mock()
+    mock.status_code = status_code
+    mock.ok = status_code < 400
+    mock.headers = headers or {}
+    return mock
+
+
+class RetryPolicyTestCase(unittest.TestCase):
+
+    def test_can_retry_until_max_attempts(self):
+        policy = RetryPolicy(attempts=3)
+        self.assertTrue(policy.can_retry(1))
+        self.assertTrue(policy.can_retry(2))
+        self.assertFalse(policy.can_retry(3))
+
+    def test_can_retry_non_idempotent_requests_only_if_refused(self):
+        policy = RetryPolicy(attempts=3)
+        retry_after = {'Retry-After': '1'}
+        for status in [429, 503]:
+            self.assertTrue(policy.can_retry(
+                1, response(status, retry_after), idempotent=False))
+            self.assertFalse(policy.can_retry(
+                1, response(status), idempotent=False))
+        for status in [502, 504]:
+            self.assertFalse(policy.can_retry(
+                1, response(status, retry_after), idempotent=False))
+
+    def test_can_retry_only_transient_statuses(self):
+        policy = RetryPolicy(attempts=3)
+        for status in [429, 502, 503, 504]:
+            self.assertTrue(policy.can_retry(1, response(status)))
+        for status in [200, 201, 400, 401, 404, 500]:
+            self.assertFalse(policy.can_retry(1, response(status)))
+
+    def test_delay_grows_exponentially_with_jitter(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        with patch('uhu.updatehub._retry.random.uniform') as uniform:
+            uniform.side_effect = lambda low, high: high
+            delays = [policy.delay(attempt) for attempt in range(1, 6)]
+        self.assertEqual(delays, [1, 2, 4, 5, 5])
+        for attempt in range(1, 6):
+            delay = policy.delay(attempt)
+            self.assertGreaterEqual(delay, 0)
+            self.assertLessEqual(delay, 5)
+
+    def test_delay_honours_retry_after(self):
+        policy = RetryPolicy(backoff=1)
+        delay = policy.delay(1, response(503, {'Retry-After': '7'}))
+        self.assertEqual(delay, 7)
+
+    def test_can_parse_retry_after_date(self):
+        resp = response(503, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(parse_retry_after(resp), 0)
+        resp = response(503, {'Retry-After': 'Wed, 21 Oct 2999 07:28:00 GMT'})
+        self.assertGreater(parse_retry_after(resp), 0)
+
+    def test_invalid_retry_after_is_ignored(self):
+        self.assertIsNone(parse_retry_after(response(503)))
+        resp = response(503, {'Retry-After': 'soon'})
+        self.assertIsNone(parse_retry_after(resp))
+
+    def test_uses_environment_configuration(self):
+        os.environ[utils.RETRY_ATTEMPTS_VAR] = '7'
+        os.environ[utils.RETRY_BACKOFF_VAR] = '0.5'
+        self.addCleanup(os.environ.pop, utils.RETRY_ATTEMPTS_VAR)
+        self.addCleanup(os.environ.pop, utils.RETRY_BACKOFF_VAR)
+        policy = RetryPolicy()
+        self.assertEqual(policy.attempts, 7)
+        self.assertEqual(policy.backoff, 0.5)
+
+
+class ThroughputWatchdogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('uhu.updatehub.http.time.monotonic')
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock.return_value = 0
+
+    def test_does_nothing_before_window_ends(self):
+        watchdog = ThroughputWatchdog(min_rate=100, window=10)
+        self.clock.return_value = 9
+        watchdog.update(1)
+
+    def test_raises_error_if_transfer_is_too_slow(self):
+        watchdog = ThroughputWatchdog(min_rate=100, window=10)
+        self.clock.return_value = 10
+        with self.assertRaises(StalledTransferError):
+            watchdog.update(999)
+
+    def test_measures_each_window_independently(self):
+        watchdog = ThroughputWatchdog(min_rate=100, window=10)
+        self.clock.return_value = 10
+        watchdog.update(1000)
+        self.clock.return_value = 15
+        watchdog.update(1)
+        self.clock.return_value = 20
+        with self.assertRaises(StalledTransferError):
+            watchdog.update(1)
+
+    def test_is_disabled_without_min_rate(self):
+        watchdog = ThroughputWatchdog(min_rate=0, window=10)
+        self.clock.return_value = 100
+        watchdog.update(1)
+
+    def test_skipped_time_is_not_measured(self):
+        watchdog = ThroughputWatchdog(min_rate=100, window=10)
+        self.clock.return_value = 15
+        watchdog.skip(5)
+        watchdog.update(1000)
+
+
+@patch('uhu.updatehub.http.time.sleep')
+class TokenBucketTestCase(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch('uhu.updatehub.http.time.monotonic')
+        self.clock = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.clock.return_value = 0
+
+    def test_sends_burst_without_waiting(self, sleep):
+        bucket = TokenBucket(rate=100, burst=50)
+        self.assertEqual(bucket.consume(50), 0)
+        self.assertFalse(sleep.called)
+        self.assertEqual(bucket.consume(50), 0.5)
+        sleep.assert_called_once_with(0.5)
+
+    def test_default_burst_is_one_second_of_transfer(self, sleep):
+        bucket = TokenBucket(rate=100)
+        self.assertEqual(bucket.consume(100), 0)
+        self.assertEqual(bucket.consume(100), 1)
+
+    def test_bucket_refills_over_time(self, sleep):
+        bucket = TokenBucket(rate=100, burst=100)
+        bucket.consume(100)
+        self.clock.return_value = 0.5
+        self.assertEqual(bucket.consume(50), 0)
+        self.clock.return_value = 10
+        self.assertEqual(bucket.consume(100), 0)
+        self.assertEqual(bucket.consume(100), 1)
+
+    def test_concurrent_transfers_share_rate(self, sleep):
+        bucket = TokenBucket(rate=100, burst=100)
+        delays = [bucket.consume(100) for _ in range(4)]
+        self.assertEqual(delays, [0, 1, 2, 3])
+
+
+@patch('uhu.updatehub._retry.time.sleep')
+class RequestRetryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        set_credentials()
+        self.policy = RetryPolicy(attempts=3, backoff=0)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_transient_statuses(self, mock, sleep):
+        mock.side_effect = [response(503), response(429), response(200)]
+        observed = request('GET', 'foo', retry=self.policy)
+        self.assertEqual(observed.status_code, 200)
+        self.assertEqual(mock.call_count, 3)
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_raises_error_when_attempts_are_exhausted(self, mock, sleep):
+        mock.return_value = response(503)
+        with self.assertRaises(HTTPError):
+            request('GET', 'foo', retry=self.policy)
+        self.assertEqual(mock.call_count, 3)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_does_not_retry_other_errors(self, mock, sleep):
+        mock.return_value = response(400)
+        with self.assertRaises(HTTPError):
+            request('GET', 'foo', retry=self.policy)
+        self.assertEqual(mock.call_count, 1)
+        self.assertFalse(sleep.called)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_connection_errors(self, mock, sleep):
+        mock.side_effect = [
+            requests.ConnectionError, requests.ConnectTimeout, response(200)]
+        observed = request('GET', 'foo', retry=self.policy)
+        self.assertEqual(observed.status_code, 200)
+        self.assertEqual(mock.call_count, 3)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_non_idempotent_requests_not_sent(self, mock, sleep):
+        refused = NewConnectionError(None, 'Connection refused')
+        mock.side_effect = [
+            requests.ConnectionError(MaxRetryError(None, 'foo', refused)),
+            requests.ConnectTimeout, response(200)]
+        observed = request('POST', 'foo', retry=self.policy)
+        self.assertEqual(observed.status_code, 200)
+        self.assertEqual(mock.call_count, 3)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_does_not_retry_non_idempotent_requests_already_sent(
+            self, mock, sleep):
+        mock.side_effect = requests.ConnectionError(
+            'Connection aborted.', 'RemoteDisconnected')
+        with self.assertRaises(HTTPError) as error:
+            request('POST', 'foo', retry=self.policy)
+        self.assertNotIsInstance(error.exception, TransientHTTPError)
+        self.assertEqual(mock.call_count, 1)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_non_idempotent_requests_only_if_refused(
+            self, mock, sleep):
+        mock.side_effect = [response(502), response(200)]
+        with self.assertRaises(HTTPError):
+            request('POST', 'foo', retry=self.policy)
+        self.assertEqual(mock.call_count, 1)
+        mock.side_effect = [
+            response(503, {'Retry-After': '1'}), response(200)]
+        observed = request('POST', 'foo', retry=self.policy)
+        self.assertEqual(observed.status_code, 200)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_raises_transient_error_when_attempts_are_exhausted(
+            self, mock, sleep):
+        mock.side_effect = requests.ConnectionError
+        with self.assertRaises(TransientHTTPError):
+            request('GET', 'foo', retry=self.policy)
+        self.assertEqual(mock.call_count, 3)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_read_timeout_only_for_idempotent_methods(
+            self, mock, sleep):
+        mock.side_effect = [requests.ReadTimeout, response(200)]
+        self.assertEqual(
+            request('PUT', 'foo', retry=self.policy).status_code, 200)
+        mock.side_effect = [requests.ReadTimeout, response(200)]
+        with self.assertRaises(HTTPError):
+            request('POST', 'foo', retry=self.policy)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_honours_retry_after(self, mock, sleep):
+        mock.side_effect = [
+            response(503, {'Retry-After': '3'}), response(200)]
+        request('GET', 'foo', retry=self.policy)
+        sleep.assert_called_once_with(3)
+
+    @patch('uhu.updatehub.http.Request', wraps=Request)
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_signs_request_again_for_each_attempt(self, mock, req, sleep):
+        mock.side_effect = [response(503), response(200)]
+        request('GET', 'http://localhost', retry=self.policy)
+        self.assertEqual(req.call_count, 2)
+        first = mock.call_args_list[0][1]['headers']
+        second = mock.call_args_list[1][1]['headers']
+        self.assertNotEqual(first['Timestamp'], second['Timestamp'])
+        self.assertNotEqual(first['Authorization'], second['Authorization'])
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_unsigned_requests(self, mock, sleep):
+        mock.side_effect = [response(502), response(200)]
+        request('PUT', 'foo', sign=False, retry=self.policy)
+        self.assertEqual(mock.call_count, 2)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_stops_retrying_when_total_timeout_is_reached(self, mock, sleep):
+        os.environ[utils.TOTAL_TIMEOUT_VAR] = '5'
+        self.addCleanup(os.environ.pop, utils.TOTAL_TIMEOUT_VAR)
+        mock.return_value = response(503, {'Retry-After': '10'})
+        with self.assertRaises(HTTPError):
+            request('GET', 'foo', retry=self.policy)
+        self.assertEqual(mock.call_count, 1)
+        self.assertFalse(sleep.called)
+
+    @patch('uhu.updatehub._session.requests.Session.request')
+    def test_retries_stalled_transfers(self, mock, sleep):
+        mock.side_effect = [StalledTransferError('slow'), response(200)]
+        observed = request('PUT', 'foo', sign=False, retry=self.policy)
+        self.assertEqual(observed.status_code, 200)
+        self.assertEqual(mock.call_count, 2)
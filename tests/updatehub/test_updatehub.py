@@ -1,13 +1,27 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import json
+import os
+import threading
+import time
 import unittest
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 from uhu.updatehub.api import (
-    finish_package, ObjectUploadResult, push_package, get_package_status,
-    upload_metadata, upload_object, upload_objects, UpdateHubError)
-from uhu.updatehub.http import HTTPError
+    add_known_object, dummy_object_upload, finish_package,
+    get_upload_limiters, is_known_object, KNOWN_OBJECTS, ObjectReader,
+    ObjectUploadResult, plan_upload, push_package, get_package_status,
+    swift_object_upload, upload_metadata, upload_object, upload_objects,
+    UpdateHubError, STORAGES, UPLOADS)
+from uhu.updatehub.http import HTTPError, StalledTransferError
+from uhu.utils import (
+    CHUNK_SIZE_VAR, KNOWN_OBJECTS_TTL_VAR, OBJECT_UPLOAD_RATE_VAR,
+    SERVER_URL_VAR, UPLOAD_BURST_VAR, UPLOAD_RATE_VAR, UPLOAD_SEGMENT_SIZE_VAR)
+
+from utils import (
+    CacheFixtureMixin, EnvironmentFixtureMixin, FileFixtureMixin,
+    StorageServerFixtureMixin, UHUTestCase)
 
 
 class PushPackageTestCase(unittest.TestCase):
@@ -23,7 +37,8 @@ class PushPackageTestCase(unittest.TestCase):
 class UploadMetadataTestCase(unittest.TestCase):
 
     @patch('uhu.updatehub.api.config.get_private_key_path', return_value='fn')
-    @patch('uhu.updatehub.api.sign_dict', return_value='signature')
+    @patch('uhu.updatehub.api.sign_metadata',
+           return_value=('{}', 'signature'))
     @patch('uhu.updatehub.api.validate_metadata')
     @patch('uhu.updatehub.api.http.post')
     def test_returns_package_uid_when_successful(self, http, mock, sign, conf):
@@ -33,7 +48,8 @@ class UploadMetadataTestCase(unittest.TestCase):
         self.assertEqual(uid, '1234')
 
     @patch('uhu.updatehub.api.config.get_private_key_path', return_value='fn')
-    @patch('uhu.updatehub.api.sign_dict', return_value='signature')
+    @patch('uhu.updatehub.api.sign_metadata',
+           return_value=('{}', 'signature'))
     @patch('uhu.updatehub.api.validate_metadata')
     @patch('uhu.updatehub.api.http.post')
     def test_sends_header_with_package_signature(self, http, mock, sign, conf):
@@ -43,12 +59,34 @@ class UploadMetadataTestCase(unittest.TestCase):
         _, kwargs = http.call_args
         self.assertEqual(kwargs.get('headers'), headers)
 
+    @patch('uhu.updatehub.api.sign_metadata')
+    @patch('uhu.updatehub.api.validate_metadata')
+    @patch('uhu.updatehub.api.http.post')
+    def test_sends_already_signed_metadata_as_is(self, http, mock, sign):
+        upload_metadata({}, signed=('{ }', 'signature'))
+        self.assertFalse(sign.called)
+        _, kwargs = http.call_args
+        self.assertEqual(kwargs.get('payload'), '{ }')
+        self.assertEqual(kwargs.get('headers'), {'UH-SIGNATURE': 'signature'})
+
+    @patch('uhu.updatehub.api.config.get_private_key_path', return_value='fn')
+    @patch('uhu.updatehub.api.sign_metadata',
+           return_value=('{"spam": 1}', 'signature'))
+    @patch('uhu.updatehub.api.validate_metadata')
+    @patch('uhu.updatehub.api.http.post')
+    def test_sends_exactly_the_signed_payload(self, http, mock, sign, conf):
+        upload_metadata({'spam': 1})
+        sign.assert_called_once_with({'spam': 1}, 'fn')
+        _, kwargs = http.call_args
+        self.assertEqual(kwargs.get('payload'), '{"spam": 1}')
+
     def test_raises_error_when_invalid_metadata(self):
         with self.assertRaises(UpdateHubError):
             upload_metadata({})
 
     @patch('uhu.updatehub.api.config.get_private_key_path', return_value='fn')
-    @patch('uhu.updatehub.api.sign_dict', return_value='signature')
+    @patch('uhu.updatehub.api.sign_metadata',
+           return_value=('{}', 'signature'))
     @patch('uhu.updatehub.api.validate_metadata')
     @patch('uhu.updatehub.api.http.post', side_effect=HTTPError)
     def test_raises_error_if_invalid_request(self, http, mock, sign, conf):
@@ -56,14 +94,13 @@ class UploadMetadataTestCase(unittest.TestCase):
             upload_metadata({})
 
 
-class UploadObjectTestCase(unittest.TestCase):
+class UploadObjectTestCase(EnvironmentFixtureMixin, UHUTestCase):
 
     def setUp(self):
         self.obj = {
             'filename': __file__,
             'sha256sum': 'sha1234',
             'md5': 'md51234',
-            'chunks': 10,
         }
         self.package_uid = '1234'
 
@@ -79,6 +116,24 @@ class UploadObjectTestCase(unittest.TestCase):
         result = upload_object(self.obj, self.package_uid)
         self.assertEqual(result, ObjectUploadResult.SUCCESS)
 
+    @patch('uhu.updatehub.api.http.post')
+    def test_asks_for_segment_urls_of_large_objects(self, post):
+        self.set_env_var(UPLOAD_SEGMENT_SIZE_VAR, 4)
+        self.obj['size'] = 10
+        segments = {'urls': ['1', '2', '3'], 'manifest': '4'}
+        post.return_value.status_code = 201
+        post.return_value.json.return_value = {
+            'storage': 'swift',
+            'url': 'http://someplace',
+            'segments': segments,
+        }
+        upload = Mock(return_value=ObjectUploadResult.SUCCESS)
+        with patch.dict(STORAGES, swift=upload):
+            upload_object(self.obj, self.package_uid)
+        body = json.loads(post.call_args[0][1])
+        self.assertEqual(body, {'etag': 'md51234', 'segments': 3})
+        self.assertEqual(upload.call_args[1], {'segments': segments})
+
     @patch('uhu.updatehub.api.http.post', side_effect=HTTPError)
     def test_returns_FAIL_when_cannot_get_upload_url(self, post):
         result = upload_object(self.obj, self.package_uid)
@@ -102,6 +157,228 @@ class UploadObjectTestCase(unittest.TestCase):
         self.assertEqual(result, ObjectUploadResult.FAIL)
 
 
+class ObjectReaderTestCase(
+        EnvironmentFixtureMixin, FileFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 2)
+        self.fn = self.create_file(b'0123456789')
+
+    def test_reads_whole_file_by_default(self):
+        reader = ObjectReader(self.fn)
+        self.assertEqual(len(reader), 10)
+        self.assertEqual(b''.join(reader), b'0123456789')
+
+    def test_can_read_file_range(self):
+        callback = Mock()
+        reader = ObjectReader(self.fn, callback, offset=3, length=5)
+        self.assertEqual(len(reader), 5)
+        self.assertEqual(list(reader), [b'34', b'56', b'7'])
+        self.assertEqual(callback.object_progress.call_count, 3)
+
+    def test_takes_back_progress_when_read_again(self):
+        callback = Mock()
+        reader = ObjectReader(self.fn, callback)
+        chunks = iter(reader)
+        next(chunks)
+        next(chunks)  # first chunk is reported once it was sent
+        self.assertEqual(b''.join(reader), b'0123456789')
+        n_bytes = [args[0]
+                   for args, _ in callback.object_progress.call_args_list]
+        self.assertEqual(n_bytes, [2, -2, 2, 2, 2, 2, 2])
+        self.assertEqual(sum(n_bytes), 10)
+
+    @patch('uhu.updatehub.http.time.monotonic')
+    def test_aborts_reading_when_upload_is_too_slow(self, clock):
+        clock.side_effect = [0, 60]
+        reader = ObjectReader(self.fn, min_rate=1)
+        with self.assertRaises(StalledTransferError):
+            list(reader)
+
+
+class UploadRateLimitTestCase(
+        StorageServerFixtureMixin, EnvironmentFixtureMixin, FileFixtureMixin,
+        UHUTestCase):
+
+    def setUp(self):
+        self.set_env_var(CHUNK_SIZE_VAR, 1000)
+        self.set_env_var(UPLOAD_BURST_VAR, 1000)
+        self.content = b'0' * 4000
+        self.fn = self.create_file(self.content)
+
+    def test_upload_limiters_are_disabled_by_default(self):
+        self.assertEqual(get_upload_limiters(), [])
+
+    def test_total_upload_rate_is_shared_by_all_uploads(self):
+        self.set_env_var(UPLOAD_RATE_VAR, 1000)
+        self.set_env_var(OBJECT_UPLOAD_RATE_VAR, 500)
+        limiters1, limiters2 = get_upload_limiters(), get_upload_limiters()
+        self.assertEqual([bucket.rate for bucket in limiters1], [1000, 500])
+        self.assertIs(limiters1[0], limiters2[0])
+        self.assertIsNot(limiters1[1], limiters2[1])
+
+    def test_reader_waits_for_limiters(self):
+        limiter = Mock()
+        limiter.consume.return_value = 0
+        reader = ObjectReader(self.fn, limiters=[limiter])
+        self.assertEqual(b''.join(reader), self.content)
+        self.assertEqual(limiter.consume.call_count, 4)
+
+    def test_uploads_are_shaped_to_upload_rate(self):
+        server = self.start_storage_server()
+        self.set_env_var(OBJECT_UPLOAD_RATE_VAR, 10000)
+        url = server.signed_url('/object')
+        start = time.monotonic()
+        result = dummy_object_upload(self.fn, url)
+        elapsed = time.monotonic() - start
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(server.objects['/object'], self.content)
+        # burst is sent at once, the remaining 3000 bytes at 10000 B/s
+        self.assertGreaterEqual(elapsed, 0.3)
+
+
+class SwiftObjectUploadTestCase(
+        StorageServerFixtureMixin, CacheFixtureMixin, FileFixtureMixin,
+        UHUTestCase):
+
+    def setUp(self):
+        self.enable_cache()
+        self.set_env_var(UPLOAD_SEGMENT_SIZE_VAR, 4)
+        self.set_env_var(CHUNK_SIZE_VAR, 2)
+        self.content = b'0123456789'
+        self.fn = self.create_file(self.content)
+        self.server = self.start_storage_server()
+        self.path = '/v1/AUTH_uhu/container/object'
+        self.url = self.server.signed_url(self.path)
+        self.segments = [
+            '/v1/AUTH_uhu/container/segments/object/{:08d}'.format(i)
+            for i in range(3)]
+        self.upload = {
+            'urls': [self.server.signed_url(path) for path in self.segments],
+            'manifest': self.server.signed_url(self.path, manifest=True),
+        }
+
+    def test_uploads_small_objects_in_a_single_request(self):
+        self.set_env_var(UPLOAD_SEGMENT_SIZE_VAR, 1024)
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, [self.path])
+        self.assertEqual(self.server.objects[self.path], self.content)
+
+    def test_uploads_in_a_single_request_without_segment_urls(self):
+        result = swift_object_upload(self.fn, self.url)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, [self.path])
+        self.assertEqual(self.server.objects[self.path], self.content)
+
+    def test_uploads_in_a_single_request_if_segments_do_not_match(self):
+        self.set_env_var(UPLOAD_SEGMENT_SIZE_VAR, 5)
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, [self.path])
+
+    def test_uploads_large_objects_as_segments(self):
+        callback = Mock()
+        result = swift_object_upload(
+            self.fn, self.url, callback, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, self.segments + [self.path])
+        data = b''.join(self.server.objects[path] for path in self.segments)
+        self.assertEqual(data, self.content)
+        self.assertEqual(self.server.objects[self.path], b'')
+        manifest = self.server.headers[self.path]['X-Object-Manifest']
+        self.assertEqual(manifest, 'container/segments/object/')
+        self.assertEqual(callback.object_progress.call_count, 5)
+        self.assertEqual(len(UPLOADS), 0)
+
+    def test_segments_cannot_be_sent_with_object_url(self):
+        self.upload['urls'] = [
+            self.server.url + path + '?' + self.url.split('?')[1]
+            for path in self.segments]
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.FAIL)
+        self.assertEqual(self.server.objects, {})
+
+    def test_manifest_cannot_be_written_with_object_url(self):
+        self.upload['manifest'] = self.url
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.FAIL)
+        self.assertNotIn(self.path, self.server.objects)
+
+    def test_uploads_range_of_file_as_segments(self):
+        fn = self.create_file(b'spam' + self.content + b'eggs')
+        result = swift_object_upload(
+            fn, self.url, offset=4, size=10, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, self.segments + [self.path])
+        data = b''.join(self.server.objects[path] for path in self.segments)
+        self.assertEqual(data, self.content)
+
+    def test_resumes_interrupted_upload(self):
+        self.server.fail = lambda path: path == self.segments[1]
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.FAIL)
+        self.assertEqual(self.server.requests, self.segments[:2])
+
+        self.server.requests.clear()
+        self.server.fail = None
+        callback = Mock()
+        result = swift_object_upload(
+            self.fn, self.url, callback, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, self.segments[1:] + [self.path])
+        data = b''.join(self.server.objects[path] for path in self.segments)
+        self.assertEqual(data, self.content)
+        # skipped segments are still reported as read
+        n_bytes = sum(args[0]
+                      for args, _ in callback.object_progress.call_args_list)
+        self.assertEqual(n_bytes, len(self.content))
+
+    def test_does_not_resume_upload_if_file_changes(self):
+        self.server.fail = lambda path: path == self.segments[1]
+        swift_object_upload(self.fn, self.url, segments=self.upload)
+        with open(self.fn, 'wb') as fp:
+            fp.write(b'9876543210')
+        os.utime(self.fn, (1, 1))
+
+        self.server.requests.clear()
+        self.server.fail = None
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, self.segments + [self.path])
+
+    def test_does_not_resume_upload_if_segment_paths_change(self):
+        self.server.fail = lambda path: path == self.segments[1]
+        swift_object_upload(self.fn, self.url, segments=self.upload)
+
+        self.server.requests.clear()
+        self.server.fail = None
+        segments = [
+            '/v1/AUTH_uhu/container/seg-b/object/{:08d}'.format(i)
+            for i in range(3)]
+        self.upload['urls'] = [
+            self.server.signed_url(path) for path in segments]
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.SUCCESS)
+        self.assertEqual(self.server.requests, segments + [self.path])
+        data = b''.join(self.server.objects[path] for path in segments)
+        self.assertEqual(data, self.content)
+
+    def test_returns_FAIL_when_manifest_upload_fails(self):
+        self.server.fail = lambda path: path == self.path
+        result = swift_object_upload(
+            self.fn, self.url, segments=self.upload)
+        self.assertEqual(result, ObjectUploadResult.FAIL)
+        self.assertEqual(len(UPLOADS), 1)
+
+
 class UploadObjectsTestCase(unittest.TestCase):
 
     @patch('uhu.updatehub.api.upload_object')
@@ -123,6 +400,182 @@ class UploadObjectsTestCase(unittest.TestCase):
         with self.assertRaises(UpdateHubError):
             upload_objects('1234', [{}, {}])
 
+    @patch('uhu.updatehub.api.upload_object')
+    def test_uploads_largest_objects_first(self, mock):
+        mock.return_value = ObjectUploadResult.SUCCESS
+        objects = [{'size': 1}, {'size': 3}, {'size': 2}]
+        upload_objects('1234', objects, workers=1)
+        observed = [args[0]['size'] for args, _ in mock.call_args_list]
+        self.assertEqual(observed, [3, 2, 1])
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_uploads_objects_concurrently(self, mock):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def upload(*args):
+            barrier.wait()
+            return ObjectUploadResult.SUCCESS
+
+        mock.side_effect = upload
+        objects = [{'size': 1}, {'size': 2}, {'size': 3}]
+        upload_objects('1234', objects, workers=3)
+        self.assertEqual(mock.call_count, 3)
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_concurrent_upload_raises_error_when_some_upload_fails(self, mock):
+        mock.side_effect = [
+            ObjectUploadResult.SUCCESS,
+            ObjectUploadResult.FAIL,
+            ObjectUploadResult.EXISTS,
+        ]
+        with self.assertRaises(UpdateHubError):
+            upload_objects('1234', [{}, {}, {}], workers=3)
+
+    def test_upload_plan_collapses_objects_with_same_content(self):
+        objects = [
+            {'sha256sum': '1', 'size': 10},
+            {'sha256sum': '2', 'size': 20},
+            {'sha256sum': '1', 'size': 10},
+            {'sha256sum': '1', 'size': 10},
+        ]
+        unique, saved = plan_upload(objects)
+        self.assertEqual(unique, objects[:2])
+        self.assertEqual(saved, 20)
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_uploads_duplicated_objects_once(self, mock):
+        mock.return_value = ObjectUploadResult.SUCCESS
+        callback = Mock()
+        objects = [
+            {'sha256sum': '1', 'size': 10},
+            {'sha256sum': '1', 'size': 10},
+            {'sha256sum': '2', 'size': 20},
+        ]
+        upload_objects('1234', objects, callback, workers=2)
+        observed = sorted(args[0]['sha256sum']
+                          for args, _ in mock.call_args_list)
+        self.assertEqual(observed, ['1', '2'])
+        callback.skip_duplicated_objects.assert_called_once_with(10)
+        callback.start_package_upload.assert_called_once_with(
+            [objects[0], objects[2]])
+
+    @patch('uhu.updatehub.api.upload_object')
+    def test_concurrent_upload_notifies_callback(self, mock):
+        mock.return_value = ObjectUploadResult.SUCCESS
+        callback = Mock()
+        objects = [{'size': 1}, {'size': 2}]
+        upload_objects('1234', objects, callback, workers=2)
+        callback.start_package_upload.assert_called_once_with(objects)
+        callback.finish_package_upload.assert_called_once_with()
+
+
+class KnownObjectsTestCase(CacheFixtureMixin, UHUTestCase):
+
+    def setUp(self):
+        self.enable_cache()
+        self.set_env_var(SERVER_URL_VAR, 'http://server')
+        self.obj = {
+            'filename': __file__,
+            'sha256sum': 'sha1234',
+            'md5': 'md51234',
+            'size': 10,
+        }
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_known_objects_are_not_checked_again(self, post):
+        post.return_value.status_code = 200
+        upload_objects('1234', [self.obj])
+        self.assertEqual(post.call_count, 1)
+        callback = Mock()
+        upload_objects('1234', [self.obj], callback)
+        self.assertEqual(post.call_count, 1)
+        callback.object_progress.assert_called_once_with(10)
+        self.assertEqual(len(KNOWN_OBJECTS), 1)
+
+    @patch('uhu.updatehub.api.http.post')
+    @patch('uhu.updatehub.api.http.put')
+    def test_uploaded_objects_are_known(self, put, post):
+        post.return_value.status_code = 201
+        post.return_value.json.return_value = {
+            'storage': 'dummy',
+            'url': 'http://someplace',
+        }
+        upload_objects('1234', [self.obj])
+        self.assertTrue(is_known_object(self.obj))
+
+    @patch('uhu.updatehub.api.http.post')
+    @patch('uhu.updatehub.api.http.put')
+    def test_object_progress_is_tracked_by_checksum(self, put, post):
+        post.return_value.status_code = 201
+        post.return_value.json.return_value = {
+            'storage': 'dummy',
+            'url': 'http://someplace',
+        }
+        self.obj['name'] = 'rootfs.ext4'
+        callback = Mock()
+        upload_objects('1234', [self.obj], callback)
+        callback.start_object_upload.assert_called_once_with(
+            'sha1234', 10, 'rootfs.ext4')
+        callback.finish_object_upload.assert_called_once_with('sha1234')
+
+    @patch('uhu.updatehub.api.http.post')
+    @patch('uhu.updatehub.api.http.put', side_effect=HTTPError)
+    def test_failed_uploads_are_not_known(self, put, post):
+        post.return_value.status_code = 201
+        post.return_value.json.return_value = {
+            'storage': 'dummy',
+            'url': 'http://someplace',
+        }
+        with self.assertRaises(UpdateHubError):
+            upload_objects('1234', [self.obj])
+        self.assertFalse(is_known_object(self.obj))
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_objects_failing_to_upload_are_forgotten(self, post):
+        add_known_object(self.obj)
+        post.side_effect = HTTPError('Not found.')
+        result = upload_object(self.obj, '1234')
+        self.assertEqual(result, ObjectUploadResult.FAIL)
+        self.assertFalse(is_known_object(self.obj))
+        self.assertEqual(len(KNOWN_OBJECTS), 0)
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_known_objects_are_scoped_by_server(self, post):
+        post.return_value.status_code = 200
+        upload_object(self.obj, '1234')
+        self.assertTrue(is_known_object(self.obj))
+        self.set_env_var(SERVER_URL_VAR, 'http://other-server')
+        self.assertFalse(is_known_object(self.obj))
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_known_objects_expire(self, post):
+        post.return_value.status_code = 200
+        self.set_env_var(KNOWN_OBJECTS_TTL_VAR, 60)
+        with patch('uhu.updatehub.api.time.time', return_value=1000):
+            upload_object(self.obj, '1234')
+        with patch('uhu.updatehub.api.time.time', return_value=1059):
+            self.assertTrue(is_known_object(self.obj))
+        with patch('uhu.updatehub.api.time.time', return_value=1060):
+            self.assertFalse(is_known_object(self.obj))
+        self.assertEqual(len(KNOWN_OBJECTS), 0)
+
+    @patch('uhu.updatehub.api.http.post')
+    def test_can_disable_known_objects(self, post):
+        post.return_value.status_code = 200
+        self.set_env_var(KNOWN_OBJECTS_TTL_VAR, 0)
+        upload_objects('1234', [self.obj])
+        upload_objects('1234', [self.obj])
+        self.assertEqual(post.call_count, 2)
+
+    @patch('uhu.updatehub.api.upload_metadata', return_value='1')
+    @patch('uhu.updatehub.api.finish_package', side_effect=UpdateHubError)
+    @patch('uhu.updatehub.api.http.post')
+    def test_objects_are_forgotten_when_push_fails(self, post, *_):
+        post.return_value.status_code = 200
+        with self.assertRaises(UpdateHubError):
+            push_package({}, [self.obj])
+        self.assertFalse(is_known_object(self.obj))
+
 
 class FinishPackageTestCase(unittest.TestCase):
 
@@ -2,10 +2,21 @@
 # SPDX-License-Identifier: GPL-2.0
 
 import hashlib
+import hmac
 import os
 import shutil
+import socketserver
 import tempfile
+import threading
 import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from uhu.utils import CACHE_DIR_VAR, NO_CACHE_VAR
+
+
+# Tests never read or write the user cache (see CacheFixtureMixin)
+os.environ[NO_CACHE_VAR] = '1'
 
 
 class UHUTestCase(unittest.TestCase):
@@ -72,10 +83,102 @@ class EnvironmentFixtureMixin:
             pass  # already deleted
 
     def set_env_var(self, var, value):
-        self._vars.append(var)
+        self._vars.append((var, os.environ.get(var)))
         os.environ[var] = str(value)
 
+    def unset_env_var(self, var):
+        self._vars.append((var, os.environ.get(var)))
+        self.remove_env_var(var)
+
     def clean(self):
         super().clean()
-        for var in self._vars:
-            self.remove_env_var(var)
+        while self._vars:
+            var, value = self._vars.pop()
+            if value is None:
+                self.remove_env_var(var)
+            else:
+                os.environ[var] = value
+
+
+class CacheFixtureMixin(EnvironmentFixtureMixin):
+    """Enables uhu cache within a temporary directory."""
+
+    def enable_cache(self):
+        cache_dir = tempfile.mkdtemp(prefix='updatehub_')
+        self.addCleanup(shutil.rmtree, cache_dir)
+        self.unset_env_var(NO_CACHE_VAR)
+        self.set_env_var(CACHE_DIR_VAR, cache_dir)
+        return cache_dir
+
+
+class StorageRequestHandler(BaseHTTPRequestHandler):
+    """Stores the body of PUT requests by path, like a storage would.
+
+    Like Swift TempURLs, requests must be signed for their path, and
+    for writing a manifest if they carry X-Object-Manifest.
+    """
+
+    def do_PUT(self):  # pylint: disable=invalid-name
+        server = self.server
+        url = urlparse(self.path)
+        path = url.path
+        signature = parse_qs(url.query).get('temp_url_sig', [None])[0]
+        manifest = 'X-Object-Manifest' in self.headers
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        with server.lock:
+            server.requests.append(path)
+            forbidden = signature != server.sign(path, manifest)
+            failed = server.fail is not None and server.fail(path)
+            if not (forbidden or failed):
+                server.objects[path] = body
+                server.headers[path] = dict(self.headers)
+        if forbidden:
+            self.send_response(401)
+        elif failed:
+            self.send_response(500)
+        else:
+            self.send_response(201)
+            self.send_header('Etag', hashlib.md5(body).hexdigest())
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        pass
+
+
+class StorageServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StorageRequestHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.objects = {}
+        self.headers = {}
+        self.fail = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    @staticmethod
+    def sign(path, manifest=False):
+        message = 'PUT\n{}\n{}'.format(path, manifest).encode()
+        return hmac.new(b'secret', message, hashlib.sha1).hexdigest()
+
+    def signed_url(self, path, manifest=False):
+        """Returns a URL allowing a single PUT to path."""
+        return '{}{}?temp_url_sig={}'.format(
+            self.url, path, self.sign(path, manifest))
+
+
+class StorageServerFixtureMixin:
+    """Runs a local stand-in for object storage servers."""
+
+    def start_storage_server(self):
+        server = StorageServer()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
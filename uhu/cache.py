@@ -0,0 +1,115 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .utils import get_cache_dir
+
+
+DEFAULT_MAX_ENTRIES = 4096
+
+
+class Cache:
+    """A persistent least recently used cache.
+
+    Entries are kept in a JSON file within uhu cache directory. When
+    there are more than max_entries entries, the least recently used
+    ones are evicted. Cache is best-effort: an unreadable or
+    unwritable cache file behaves as an empty cache.
+    """
+
+    def __init__(self, name, max_entries=DEFAULT_MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self._filename = None
+        self._entries = OrderedDict()
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _get_filename(name):
+        directory = get_cache_dir()
+        if directory is None:
+            return None
+        return os.path.join(directory, '{}.json'.format(name))
+
+    def _load(self):
+        """Reads cache file if cache location has changed."""
+        filename = self._get_filename(self.name)
+        if filename == self._filename:
+            return
+        self._filename = filename
+        self._entries = OrderedDict()
+        self._dirty = False
+        if filename is None:
+            return
+        try:
+            with open(filename) as fp:
+                entries = json.load(fp)
+            self._entries.update((key, value) for key, value in entries)
+        except (OSError, ValueError, TypeError):
+            pass  # missing or corrupted cache, start a new one
+
+    def get(self, key):
+        """Returns the value for key or None if it is not cached."""
+        with self._lock:
+            self._load()
+            value = self._entries.get(key)
+            if value is not None:
+                # Recency is only persisted along with other changes
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        """Caches value for key, evicting the least used entries."""
+        with self._lock:
+            self._load()
+            if self._filename is None:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def remove(self, key):
+        """Removes key from cache if present."""
+        with self._lock:
+            self._load()
+            if self._entries.pop(key, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """Atomically writes cache file if there are pending changes."""
+        with self._lock:
+            if not self._dirty or self._filename is None:
+                return
+            directory = os.path.dirname(self._filename)
+            try:
+                os.makedirs(directory, exist_ok=True)
+                handle, tmp_path = tempfile.mkstemp(
+                    dir=directory, prefix='.uhu-')
+            except OSError:
+                return  # cache is an optimization, never break on it
+            try:
+                with os.fdopen(handle, 'w') as fp:
+                    json.dump(list(self._entries.items()), fp)
+                os.replace(tmp_path, self._filename)
+            except OSError:
+                os.remove(tmp_path)
+                return
+            self._dirty = False
+
+    def __len__(self):
+        with self._lock:
+            self._load()
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._load()
+            return key in self._entries
@@ -4,8 +4,8 @@
 import click
 
 from .. import get_version
-from ..repl import repl
 
+from .archive import archive_cli
 from .config import config_cli, cleanup_command
 from .hardware import hardware_cli
 from .package import package_cli
@@ -24,6 +24,9 @@ def cli(ctx, package):
     UpdateHub API server address.
     """
     if ctx.invoked_subcommand is None:
+        # prompt_toolkit is slow to import, so REPL is imported only here
+        # pylint: disable=import-outside-toplevel
+        from ..repl import repl
         repl(package)
 
 
@@ -31,6 +34,7 @@ def cli(ctx, package):
 cli.add_command(cleanup_command)
 
 # Subcommands
+cli.add_command(archive_cli)
 cli.add_command(config_cli)
 cli.add_command(hardware_cli)
 cli.add_command(package_cli)
@@ -0,0 +1,64 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import os
+
+import click
+
+from ..core.archive import PackageArchive
+
+from .utils import error
+
+
+ARCHIVE_PATH = click.Path(exists=True, dir_okay=False)
+
+
+@click.group(name='archive')
+def archive_cli():
+    """Package archive (.uhupkg) related commands."""
+
+
+@archive_cli.command(name='inspect')
+@click.argument('archive', type=ARCHIVE_PATH)
+def inspect_command(archive):
+    """Prints package archive information."""
+    with PackageArchive(archive) as package_archive:
+        try:
+            print(package_archive)
+        except ValueError as err:
+            error(2, err)
+
+
+@archive_cli.command(name='verify')
+@click.argument('archive', type=ARCHIVE_PATH)
+def verify_command(archive):
+    """Verifies package archive objects against their hashes."""
+    with PackageArchive(archive) as package_archive:
+        try:
+            errors = package_archive.verify()
+        except ValueError as err:
+            error(2, err)
+    if errors:
+        error(1, '\n'.join(errors))
+    print('Valid archive.')
+
+
+@archive_cli.command(name='extract')
+@click.argument('archive', type=ARCHIVE_PATH)
+@click.argument('objects', nargs=-1)
+@click.option('--output', type=click.Path(file_okay=False), default='.',
+              help="Where to extract objects")
+def extract_command(archive, objects, output):
+    """Extracts package archive objects (all, if none is given).
+
+    Objects are given by their sha256sum and verified while extracted.
+    """
+    os.makedirs(output, exist_ok=True)
+    with PackageArchive(archive) as package_archive:
+        try:
+            for sha256sum in objects or list(package_archive):
+                print(package_archive.extract(sha256sum, output))
+        except KeyError:
+            error(3, 'Archive has no object "{}".'.format(sha256sum))
+        except ValueError as err:
+            error(2, err)
@@ -2,14 +2,16 @@
 # SPDX-License-Identifier: GPL-2.0
 
 import json
+import sys
 
 import click
 
-from pkgschema import validate_metadata, ValidationError
 from uhu.core.objects import DuplicateObjectEntryError
 from ..core.object import Modes
-from ..updatehub.api import get_package_status, UpdateHubError
-from ..core.utils import dump_package, dump_package_archive
+from ..config import config
+from ..core.archive import COMPRESSIONS
+from ..core.utils import (
+    dump_package, dump_package_archive, push_package_archive)
 from ..ui import get_callback, show_cursor
 
 from ._object import CLICK_ADD_OPTIONS
@@ -99,9 +101,23 @@ def remove_object_command(object_id):
 # Transaction commands
 
 @package_cli.command(name='push')
-def push_command():
+@click.option('--archive', type=click.Path(exists=True, dir_okay=False),
+              help="Pushes a package archive instead of package file")
+def push_command(archive):
     """Pushes a package file to server with the given version."""
+    # pylint: disable=import-outside-toplevel
+    from ..updatehub.api import UpdateHubError
     callback = get_callback()
+    if archive is not None:
+        try:
+            push_package_archive(archive, callback)
+        except UpdateHubError as err:
+            error(2, err)
+        except ValueError as err:
+            error(3, err)
+        finally:
+            show_cursor()
+        return
     with open_package(read_only=True) as package:
         try:
             package.push(callback)
@@ -115,6 +131,8 @@ def push_command():
 @click.argument('package-uid')
 def status_command(package_uid):
     """Prints the status of the given package."""
+    # pylint: disable=import-outside-toplevel
+    from ..updatehub.api import get_package_status, UpdateHubError
     try:
         print(get_package_status(package_uid))
     except UpdateHubError as err:
@@ -124,6 +142,8 @@ def status_command(package_uid):
 @package_cli.command(name='metadata')
 def metadata_command():
     """Loads package and prints its metadata."""
+    # pylint: disable=import-outside-toplevel
+    from pkgschema import validate_metadata, ValidationError
     with open_package(read_only=True) as package:
         metadata = package.to_metadata()
         print(json.dumps(metadata, indent=4, sort_keys=True))
@@ -134,17 +154,92 @@ def metadata_command():
         error(1, err)
 
 
+# pylint: disable=too-many-arguments
 @package_cli.command(name='archive')
-@click.option('--output', type=click.Path(dir_okay=False),
-              help="Where to write archive")
+@click.option('--output', type=click.Path(dir_okay=False, allow_dash=True),
+              help="Where to write archive (- for standard output)")
 @click.option('--force', is_flag=True,
               help="Overwrites output file if output exists")
-def archive_command(output, force):
+@click.option('--compression', type=click.Choice(list(COMPRESSIONS)),
+              default='stored', help="How uncompressed objects are stored")
+@click.option('--level', type=click.IntRange(0, 9),
+              help="Deflate compression level")
+@click.option('--workers', type=click.IntRange(min=1),
+              help="How many objects may be compressed at the same time")
+@click.option('--incremental', is_flag=True,
+              help="Rebuilds output reusing the objects it already has")
+def archive_command(output, force, compression, level, workers,
+                    incremental):
     """Saves package as archive."""
+    if output == '-':
+        output = click.get_binary_stream('stdout')
     with open_package(read_only=True) as package:
         try:
-            dump_package_archive(package, output, force)
+            dump_package_archive(
+                package, output, force, compression=compression,
+                level=level, workers=workers, incremental=incremental)
         except FileExistsError as err:
             error(1, err)
         except ValueError as err:
             error(2, err)
+
+
+# Batch commands
+
+def _batch_command(func, files, key, workers, report):
+    """Runs a batch function and writes its JSON report."""
+    if key is None:
+        key = config.get_private_key_path()
+    try:
+        entries = func(list(files), key, workers)
+    except ValueError as err:
+        error(2, err)
+    failed = sum(1 for entry in entries if not entry['ok'])
+    report.write(json.dumps({
+        'files': entries,
+        'ok': len(entries) - failed,
+        'failed': failed,
+    }, indent=4, sort_keys=True))
+    report.write('\n')
+    if failed:
+        sys.exit(1)
+
+
+@package_cli.command(name='sign-many')
+@click.argument('files', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('--key', type=click.Path(exists=True, dir_okay=False),
+              help="Private key (default: the configured one)")
+@click.option('--workers', type=click.IntRange(min=1),
+              help="How many files may be handled at the same time")
+@click.option('--report', type=click.File('w'), default='-',
+              help="Where to write the JSON report (default: stdout)")
+def sign_many_command(files, key, workers, report):
+    """Signs many package archives again, in place.
+
+    Package files can not keep a signature; they are reported as
+    errors and must be archived to be signed.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..core.batch import sign_many
+    _batch_command(sign_many, files, key, workers, report)
+
+
+@package_cli.command(name='verify-many')
+@click.argument('files', nargs=-1, required=True,
+                type=click.Path(exists=True, dir_okay=False))
+@click.option('--key', type=click.Path(exists=True, dir_okay=False),
+              help="Public or private key (default: the configured one)")
+@click.option('--workers', type=click.IntRange(min=1),
+              help="How many files may be handled at the same time")
+@click.option('--report', type=click.File('w'), default='-',
+              help="Where to write the JSON report (default: stdout)")
+def verify_many_command(files, key, workers, report):
+    """Verifies many package files or archives.
+
+    Archives must be signed by key and have all their objects intact.
+    Package files must have valid metadata.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..core.batch import verify_many
+    _batch_command(verify_many, files, key, workers, report)
@@ -4,16 +4,34 @@
 import configparser
 import os
 import logging
+import tempfile
+import threading
+from collections import namedtuple
 
-from .utils import get_global_config_file, get_credentials, PRIVATE_KEY_FN
+from .utils import (
+    get_global_config_file, get_credentials, PRIVATE_KEY_FN,
+    CONNECT_TIMEOUT_VAR, READ_TIMEOUT_VAR, TOTAL_TIMEOUT_VAR,
+    MIN_UPLOAD_RATE_VAR, UPLOAD_RATE_VAR, OBJECT_UPLOAD_RATE_VAR,
+    UPLOAD_BURST_VAR, DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT,
+    DEFAULT_TOTAL_TIMEOUT, DEFAULT_MIN_UPLOAD_RATE, DEFAULT_UPLOAD_RATE,
+    DEFAULT_OBJECT_UPLOAD_RATE, DEFAULT_UPLOAD_BURST)
 
 
 MAIN_SECTION = 'settings'
 AUTH_SECTION = 'auth'
 
 
+Timeouts = namedtuple('Timeouts', ['connect', 'read', 'total'])
+RateLimits = namedtuple('RateLimits', ['total', 'per_object', 'burst'])
+
+
 class Config:
-    """This is the wrapper to manage ~/.config/.uhu configuration file."""
+    """This is the wrapper to manage ~/.config/.uhu configuration file.
+
+    The file is parsed again only when it changes (its inode, size or
+    modification time differ). Otherwise, lookups are served from
+    memory. Changes are written through to the file atomically.
+    """
 
     def __new__(cls):
         if not hasattr(cls, 'instance'):
@@ -22,8 +40,20 @@ class Config:
 
     def __init__(self):
         self._filename = get_global_config_file()
-        self._config = configparser.ConfigParser(
-            default_section=MAIN_SECTION)
+        self._config = self._new_parser()
+        self._identity = None
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _new_parser():
+        return configparser.ConfigParser(default_section=MAIN_SECTION)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self._filename)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
 
     def get_credentials(self):
         env_credentials = get_credentials()
@@ -44,6 +74,58 @@ class Config:
             return
         return private_key
 
+    def get_timeouts(self):
+        """Returns connect, read and total HTTP timeouts in seconds.
+
+        Connect and read timeouts are applied to each request. After
+        total timeout, a request is not sent again, and the connect
+        and read timeouts of an attempt never go beyond it. A transfer
+        still making progress may outlast it: read timeout applies to
+        each read. Total may be None, meaning no deadline.
+        """
+        return Timeouts(
+            connect=self._get_number(
+                'connect_timeout', CONNECT_TIMEOUT_VAR,
+                DEFAULT_CONNECT_TIMEOUT),
+            read=self._get_number(
+                'read_timeout', READ_TIMEOUT_VAR, DEFAULT_READ_TIMEOUT),
+            total=self._get_number(
+                'total_timeout', TOTAL_TIMEOUT_VAR, DEFAULT_TOTAL_TIMEOUT),
+        )
+
+    def get_min_upload_rate(self):
+        """Returns the slowest upload rate (bytes/s) before aborting."""
+        return self._get_number(
+            'min_upload_rate', MIN_UPLOAD_RATE_VAR, DEFAULT_MIN_UPLOAD_RATE)
+
+    def get_upload_rate_limits(self):
+        """Returns upload rate limits in bytes per second.
+
+        Total limit is shared by all concurrent uploads, while per
+        object limit applies to each object. Burst is how many bytes
+        may be sent at once after a pause (one second of transfer by
+        default). Limits may be None, meaning unlimited.
+        """
+        return RateLimits(
+            total=self._get_number(
+                'upload_rate', UPLOAD_RATE_VAR, DEFAULT_UPLOAD_RATE),
+            per_object=self._get_number(
+                'object_upload_rate', OBJECT_UPLOAD_RATE_VAR,
+                DEFAULT_OBJECT_UPLOAD_RATE),
+            burst=self._get_number(
+                'upload_burst', UPLOAD_BURST_VAR, DEFAULT_UPLOAD_BURST),
+        )
+
+    def _get_number(self, key, env_var, default):
+        """Gets a number from environment, settings or default."""
+        value = os.environ.get(env_var) or self.get(key)
+        if not value:
+            return default
+        try:
+            return float(value)
+        except ValueError:
+            raise ValueError('{} must be a number.'.format(key))
+
     def set_credentials(self, access_id, access_secret):
         """Set server requried credentials."""
         self.set('access_id', access_id, section=AUTH_SECTION)
@@ -61,31 +143,47 @@ class Config:
         self.set('private_key_path', fn, section=AUTH_SECTION)
 
     def _read(self):
-        if os.path.exists(self._filename):
+        """Parses the configuration file if it has changed."""
+        identity = self._stat()
+        if identity is not None and identity == self._identity:
+            return
+        self._config = self._new_parser()
+        if identity is not None:
             self._config.read(self._filename)
-        open(self._filename, 'a').close()
+        self._identity = identity
+
+    def _write(self):
+        """Atomically replaces the configuration file."""
+        self._identity = None  # on errors, parse the file again
+        directory = os.path.dirname(os.path.abspath(self._filename))
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix='.uhu-')
+        try:
+            with os.fdopen(handle, 'w') as fp:
+                self._config.write(fp)
+            os.replace(tmp_path, self._filename)
+        except OSError:
+            os.remove(tmp_path)
+            raise
+        self._identity = self._stat()
 
     def set(self, key, value, section=None):
         """Adds a new entry on settings based on key and value."""
-        self._read()
-
-        if section is None:
-            section = MAIN_SECTION
-        elif not self._config.has_section(section):
-            self._config.add_section(section)
-
-        self._config.set(section, key, value)
-
-        with open(self._filename, 'w') as fp:
-            self._config.write(fp)
+        with self._lock:
+            self._read()
+            if section is None:
+                section = MAIN_SECTION
+            elif not self._config.has_section(section):
+                self._config.add_section(section)
+            self._config.set(section, key, value)
+            self._write()
 
     def get(self, key, section=None):
         """Gets the value for the given a key."""
-        self._read()
         if not section:
             section = MAIN_SECTION
-        value = self._config.get(section, key, fallback=None)
-        return value
+        with self._lock:
+            self._read()
+            return self._config.get(section, key, fallback=None)
 
 
 config = Config()  # pylint: disable=invalid-name
@@ -1,19 +1,33 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
-import hashlib
 import math
 import os
+import time
 
-from ..utils import call, get_chunk_size
+from ..cache import Cache
+from ..utils import get_chunk_size
 
 from ._options import Options
-from .compression import compression_to_metadata
-from .delta import validate_delta
-from .install_condition import InstallCondition
+from .analysis import analyze, HashConsumer, Result
+from .compression import compression_to_metadata, CompressionConsumer
+from .delta import validate_delta, ArchiverConsumer
+from .install_condition import InstallCondition, VersionConsumer
 from .validators import validate_options
 
 
+# Files modified less than this amount of seconds before being hashed
+# are not cached, since filesystem timestamps granularity could hide
+# a later modification.
+RACY_INTERVAL = 2
+
+HASHES = Cache('hashes')
+
+# Analysis results which only depend on object content, so they are
+# cached along with its hashes.
+CACHED_ANALYSES = ('compression', 'archiver')
+
+
 class Modes:
     registry = {}
 
@@ -81,6 +95,7 @@ class BaseObject(metaclass=ObjectType):
         self._values = validate_options(self, values)
         self.chunk_size = get_chunk_size()
         self.md5 = None
+        self._analysis = {}
 
     def to_template(self):
         template = {opt.metadata: value
@@ -89,8 +104,9 @@ class BaseObject(metaclass=ObjectType):
         template['mode'] = self.mode
         return template
 
-    def to_metadata(self, callback=None):
-        self.load(callback)
+    def to_metadata(self, callback=None, load=True):
+        if load:
+            self.load(callback)
         metadata = {opt.metadata: value for opt, value in self._values.items()}
         metadata['mode'] = self.mode
         metadata.update(self._metadata_install_condition(metadata))
@@ -101,16 +117,23 @@ class BaseObject(metaclass=ObjectType):
     def _metadata_install_condition(self, metadata):
         if not self.allow_install_condition:
             return {}
-        return InstallCondition(metadata).to_metadata()
+        version = self._analysis.get('version')
+        if version is not None:
+            version = version.result()
+        return InstallCondition(metadata, version).to_metadata()
 
     def _metadata_compression(self):
         if not self.allow_compression:
             return {}
+        if 'compression' in self._analysis:
+            return self._analysis['compression'].result()
         return compression_to_metadata(self.filename)
 
     def _metadata_delta(self):
         if not self.using_delta:
             return {}
+        if 'archiver' in self._analysis:
+            return self._analysis['archiver'].result()
         return validate_delta(self.filename)
 
     def to_upload(self):
@@ -119,7 +142,7 @@ class BaseObject(metaclass=ObjectType):
             'size': self['size'],
             'sha256sum': self['sha256sum'],
             'md5': self.md5,
-            'chunks': len(self)
+            'name': os.path.basename(self['filename']),
         }
 
     @property
@@ -132,6 +155,16 @@ class BaseObject(metaclass=ObjectType):
         """Returns the size of object file."""
         return os.path.getsize(self.filename)
 
+    @property
+    def fingerprint(self):
+        """Identifies the object file content by its stat information.
+
+        Objects pointing to the same file (even through links) share
+        the same fingerprint.
+        """
+        stat = os.stat(self.filename)
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
     @property
     def exists(self):
         """Checks if file exsits."""
@@ -141,17 +174,110 @@ class BaseObject(metaclass=ObjectType):
         """Updates a given option value."""
         self[option] = value
 
-    def load(self, callback=None):
-        """Reads object to set its size, sha256sum and MD5."""
-        sha256sum = hashlib.sha256()
-        md5 = hashlib.md5()
-        for chunk in self:
-            sha256sum.update(chunk)
-            md5.update(chunk)
-            call(callback, 'object_read')
-        self['sha256sum'] = sha256sum.hexdigest()
-        self['size'] = self.size
-        self.md5 = md5.hexdigest()
+    def cached_hashes(self):
+        """Returns the cached hashes of object file, or None.
+
+        Hashes are only cached for the current file fingerprint, so
+        they match the file content without reading it.
+        """
+        return HASHES.get(self._hashes_key(self.fingerprint))
+
+    @staticmethod
+    def _hashes_key(fingerprint):
+        return ':'.join(str(value) for value in fingerprint)
+
+    def load(self, callback=None, consumers=()):
+        """Reads object to set its size, sha256sum and MD5.
+
+        The object is read only once: while it is hashed, it is also
+        analyzed for compression, delta and version metadata. Hashes
+        (and content only analysis) are cached by file fingerprint, so
+        an unchanged file is not read again, even across uhu runs.
+
+        Extra consumers are given the object content in the same
+        read. If hashes are cached, object is read only for them.
+        """
+        fingerprint = self.fingerprint
+        key = self._hashes_key(fingerprint)
+        hashes = HASHES.get(key)
+        if hashes is None:
+            started = time.time()
+            analysis = self._consumers()
+            analyze(self, [*analysis.values(), *consumers], callback)
+            hashes = {name: analysis.pop(name).result()
+                      for name in ('sha256sum', 'md5')}
+            hashes.update(self._cacheable_results(analysis))
+            racy = fingerprint[3] > (started - RACY_INTERVAL) * 10**9
+            if not racy and fingerprint == self.fingerprint:
+                HASHES.set(key, hashes)
+        else:
+            analysis = {name: Result(hashes[name])
+                        for name in CACHED_ANALYSES if name in hashes}
+            if consumers:
+                analyze(self, consumers, callback)
+        self['sha256sum'] = hashes['sha256sum']
+        self['size'] = fingerprint[2]
+        self.md5 = hashes['md5']
+        self._analysis = analysis
+
+    def _consumers(self):
+        """Returns the consumers which analyze object while it is read."""
+        consumers = {
+            'sha256sum': HashConsumer('sha256'),
+            'md5': HashConsumer('md5'),
+        }
+        if self.allow_compression:
+            consumers['compression'] = CompressionConsumer(self.filename)
+        if self.using_delta:
+            consumers['archiver'] = ArchiverConsumer(self.filename)
+        version = self._version_options()
+        if version is not None:
+            consumers['version'] = VersionConsumer(*version)
+        return consumers
+
+    def _version_options(self):
+        """Returns how to scan object version, if it can be streamed."""
+        if not self.allow_install_condition:
+            return None
+        condition = self['install-condition']
+        if condition != InstallCondition.VERSION_DIVERGES:
+            return None
+        type_ = self['install-condition-pattern-type']
+        if type_ == 'u-boot':
+            return (type_, None, 0)
+        pattern = self['install-condition-pattern']
+        if type_ == 'regexp' and pattern is not None:
+            seek = self['install-condition-seek'] or 0
+            return (type_, pattern.encode(), seek)
+        return None
+
+    @staticmethod
+    def _cacheable_results(analysis):
+        """Returns (and memoizes) successful content only results."""
+        results = {}
+        for name in CACHED_ANALYSES:
+            consumer = analysis.get(name)
+            if consumer is None or not getattr(consumer, 'check', True):
+                continue
+            try:
+                results[name] = consumer.result()
+            except (ValueError, SystemError):
+                continue  # raised again when building metadata
+            analysis[name] = Result(results[name])
+        return results
+
+    def load_from(self, obj):
+        """Sets size, sha256sum and MD5 from an already loaded object."""
+        # pylint: disable=protected-access
+        self['sha256sum'] = obj['sha256sum']
+        self['size'] = obj['size']
+        self.md5 = obj.md5
+        analysis = {name: consumer for name, consumer in obj._analysis.items()
+                    if name in CACHED_ANALYSES}
+        if 'version' in obj._analysis and (
+                self._version_options() == obj._version_options()):
+            analysis['version'] = obj._analysis['version']
+        self._analysis = analysis
 
     def __setitem__(self, key, value):
         try:
@@ -166,6 +292,7 @@ class BaseObject(metaclass=ObjectType):
                   for option, value in self._values.items()}
         values[key] = value
         self._values = validate_options(self, values)
+        self._analysis = {}
 
     def __getitem__(self, key):
         if not isinstance(key, str):
@@ -0,0 +1,125 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+"""Object analysis pipeline.
+
+An object file is read only once and each chunk is given to a set of
+consumers (hashes, compression, archiver and version detection). Each
+consumer then produces its part of the object metadata from what it
+has seen.
+"""
+
+import hashlib
+
+from ..utils import call
+
+
+class Consumer:
+    """Receives the chunks of an object, in order, while it is read.
+
+    feed() must not raise errors, since this would stop the other
+    consumers too. Errors are raised by result() instead.
+    """
+
+    def feed(self, chunk):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+class Result(Consumer):
+    """A consumer whose result is already known (e.g. it was cached)."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def feed(self, chunk):
+        pass
+
+    def result(self):
+        return self.value
+
+
+class HashConsumer(Consumer):
+    """Returns the hexdigest of an object using a hashlib algorithm."""
+
+    def __init__(self, name):
+        self._hash = hashlib.new(name)
+
+    def feed(self, chunk):
+        self._hash.update(chunk)
+
+    def result(self):
+        return self._hash.hexdigest()
+
+
+class HeaderConsumer(Consumer):
+    """Keeps the first header_size bytes of an object."""
+
+    header_size = 0
+
+    def __init__(self):
+        self.header = b''
+
+    @property
+    def complete(self):
+        return len(self.header) >= self.header_size
+
+    def feed(self, chunk):
+        if not self.complete:
+            self.header += chunk[:self.header_size - len(self.header)]
+
+    def result(self):
+        raise NotImplementedError
+
+
+class HeaderStreamConsumer(HeaderConsumer):
+    """Passes an object on, chunk by chunk, once its header is known.
+
+    Chunks are held back until the header is complete. Then start() is
+    called and the held back chunks, and all the following ones, are
+    given to consume(). flush() must be called after the last chunk,
+    so objects smaller than the header are also consumed.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending = b''
+        self._started = False
+
+    def feed(self, chunk):
+        if not self._started:
+            super().feed(chunk)
+            self._pending += chunk
+            if not self.complete:
+                return
+            chunk = self._start()
+        self.consume(chunk)
+
+    def flush(self):
+        if not self._started:
+            self.consume(self._start())
+
+    def _start(self):
+        pending, self._pending = self._pending, b''
+        self._started = True
+        self.start()
+        return pending
+
+    def start(self):
+        raise NotImplementedError
+
+    def consume(self, chunk):
+        raise NotImplementedError
+
+    def result(self):
+        raise NotImplementedError
+
+
+def analyze(chunks, consumers, callback=None):
+    """Gives each chunk to all consumers."""
+    for chunk in chunks:
+        for consumer in consumers:
+            consumer.feed(chunk)
+        call(callback, 'object_progress', len(chunk))
@@ -0,0 +1,595 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+"""Package archive (.uhupkg) writer and reader.
+
+A package archive is a zip file with the package metadata, its
+signature and every distinct object file, named by its sha256sum.
+The MD5 of each object is kept as its member comment.
+
+Objects are written while they are loaded, so each object file is
+read only once to be hashed, analyzed and archived. Uncompressed
+objects may be deflated; already compressed ones are always stored.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+from functools import partial
+
+from ..utils import call, get_chunk_size
+
+from .analysis import HeaderStreamConsumer
+from .compression import (
+    detect_compressor_format, MAX_COMPRESSOR_SIGNATURE_SIZE)
+
+
+COMPRESSIONS = OrderedDict([
+    ('stored', zipfile.ZIP_STORED),
+    ('deflate', zipfile.ZIP_DEFLATED),
+])
+
+# Archive members which are not objects
+METADATA = 'metadata'
+SIGNATURE = 'signature'
+
+# Objects are named by their sha256sum, which is only known after
+# they are written. Until then, a name of the same size is used.
+PLACEHOLDER_NAME = '0' * 64
+
+# Member names come from the archive, so they must be checked before
+# being used as file names
+SHA256SUM_REGEXP = re.compile('[0-9a-f]{64}')
+
+
+class MemberConsumer(HeaderStreamConsumer):
+    """Writes an object, while it is read, as the data of a zip member.
+
+    Once the header shows the object is not compressed yet, data is
+    deflated (if asked to) before being written into fp.
+    """
+
+    header_size = MAX_COMPRESSOR_SIGNATURE_SIZE
+
+    def __init__(self, fp, compress_type=zipfile.ZIP_STORED, level=None):
+        super().__init__()
+        self.fp = fp
+        self.compress_type = compress_type
+        self.level = level
+        self.crc = 0
+        self.file_size = 0
+        self.compress_size = 0
+        self._compressor = None
+        self._error = None
+        self._finished = False
+
+    def feed(self, chunk):
+        if self._error is not None:
+            return
+        self.crc = zlib.crc32(chunk, self.crc)
+        self.file_size += len(chunk)
+        try:
+            super().feed(chunk)
+        except (OSError, zlib.error) as err:
+            self._error = err
+
+    def start(self):
+        if detect_compressor_format(self.header) is not None:
+            self.compress_type = zipfile.ZIP_STORED
+        if self.compress_type == zipfile.ZIP_DEFLATED:
+            level = self.level
+            if level is None:
+                level = zlib.Z_DEFAULT_COMPRESSION
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+
+    def consume(self, chunk):
+        if self._compressor is not None:
+            chunk = self._compressor.compress(chunk)
+        self._output(chunk)
+
+    def _output(self, data):
+        self.fp.write(data)
+        self.compress_size += len(data)
+
+    def _finish(self):
+        self.flush()
+        if self._compressor is not None:
+            self._output(self._compressor.flush())
+
+    def result(self):
+        """Flushes member data and returns its zip information."""
+        if self._error is None and not self._finished:
+            self._finished = True
+            try:
+                self._finish()
+            except (OSError, zlib.error) as err:
+                self._error = err
+        if self._error is not None:
+            raise self._error
+        return self
+
+    def update(self, zinfo):
+        """Sets CRC, sizes and compression of a member zip info."""
+        zinfo.CRC = self.crc
+        zinfo.file_size = self.file_size
+        zinfo.compress_size = self.compress_size
+        zinfo.compress_type = self.compress_type
+
+
+class ArchiveWriter:
+    """Writes objects and package metadata into a package archive.
+
+    file may be a filename or any writable file object, including
+    non seekable ones (like pipes). Members are deflated when
+    compression is "deflate", using the given (zlib) level.
+    """
+
+    def __init__(self, file, compression='stored', level=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                'Unknown archive compression "{}".'.format(compression))
+        self.compress_type = COMPRESSIONS[compression]
+        self.level = level
+        self.archive = zipfile.ZipFile(file, mode='w')
+        self._lock = threading.Lock()
+
+    @property
+    def seekable(self):
+        # pylint: disable=protected-access
+        return self.archive._seekable
+
+    def add_objects(self, objects, callback=None, workers=None,
+                    previous=None):
+        """Loads and writes all objects of an ObjectsManager.
+
+        When archive is seekable and members are stored, objects are
+        written straight into it, one at a time. Otherwise, up to
+        workers objects are read and deflated at the same time into
+        temporary files, which are then copied into archive.
+
+        If previous (a PackageArchive) is given, unchanged objects
+        (whose hashes are cached) it already has, with the same
+        compression, are copied from it as they are. Only the other
+        objects are read, once, and written from their files.
+        """
+        if self.seekable and self.compress_type == zipfile.ZIP_STORED:
+            workers, loader = 1, self._write_object
+        else:
+            loader = self._spool_object
+        if previous is not None:
+            loader = partial(self._reuse_object, previous, loader)
+        objects.load(callback, workers, loader=loader)
+
+    def add_metadata(self, metadata, signature):
+        """Writes package metadata and its signature."""
+        self.archive.writestr(METADATA, metadata)
+        self.archive.writestr(SIGNATURE, signature or '')
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _zipinfo(self, obj):
+        zinfo = zipfile.ZipInfo.from_file(
+            os.path.realpath(obj.filename), PLACEHOLDER_NAME)
+        zinfo.compress_type = self.compress_type
+        zinfo.CRC = zinfo.compress_size = 0
+        return zinfo
+
+    def _write_object(self, obj, callback):
+        """Writes an object into archive while it is loaded.
+
+        Member header is written with a placeholder name and rewritten
+        once object is hashed.
+        """
+        # pylint: disable=protected-access
+        archive = self.archive
+        zinfo = self._zipinfo(obj)
+        zip64 = zinfo.file_size * 1.05 > zipfile.ZIP64_LIMIT
+        with self._lock:
+            archive.fp.seek(archive.start_dir)
+            zinfo.header_offset = archive.start_dir
+            archive.fp.write(zinfo.FileHeader(zip64))
+            member = MemberConsumer(archive.fp, self.compress_type, self.level)
+            obj.load(callback, consumers=[member])
+            member.result().update(zinfo)
+            self._rename(zinfo, obj)
+            if zinfo.filename in archive.NameToInfo:
+                archive.fp.seek(zinfo.header_offset)
+                archive.fp.truncate()
+                return
+            end = archive.fp.tell()
+            archive.fp.seek(zinfo.header_offset)
+            archive.fp.write(zinfo.FileHeader(zip64))
+            archive.fp.seek(end)
+            self._register(zinfo)
+
+    def _spool_object(self, obj, callback):
+        """Writes an object into a temporary file, then into archive."""
+        zinfo = self._zipinfo(obj)
+        with tempfile.TemporaryFile() as spool:
+            member = MemberConsumer(spool, self.compress_type, self.level)
+            obj.load(callback, consumers=[member])
+            member.result().update(zinfo)
+            self._rename(zinfo, obj)
+            spool.seek(0)
+            self.write_raw(zinfo, spool)
+
+    def _reuse_object(self, previous, write, obj, callback):
+        """Copies an object from previous archive, if possible.
+
+        Only objects whose hashes are cached can be looked up without
+        being read. Any other object is written (and hashed) by write
+        in a single read.
+        """
+        hashes = obj.cached_hashes()
+        if hashes is not None:
+            sha256sum = hashes['sha256sum']
+            if sha256sum in previous and self._reusable(previous, sha256sum):
+                obj.load(callback)
+                if obj['sha256sum'] == sha256sum:  # file did not change
+                    self.copy_member(previous, sha256sum)
+                    return
+        write(obj, callback)
+
+    def _reusable(self, previous, sha256sum):
+        """Checks if member would be written with the same compression."""
+        expected = self.compress_type
+        if expected != zipfile.ZIP_STORED:
+            header = previous.header(sha256sum, MAX_COMPRESSOR_SIGNATURE_SIZE)
+            if detect_compressor_format(header) is not None:
+                expected = zipfile.ZIP_STORED
+        return previous.member(sha256sum).compress_type == expected
+
+    def copy_member(self, previous, sha256sum):
+        """Copies a member of another archive without decompressing it."""
+        member = previous.member(sha256sum)
+        zinfo = zipfile.ZipInfo(member.filename, member.date_time)
+        for attr in ('compress_type', 'CRC', 'file_size', 'compress_size',
+                     'external_attr', 'comment'):
+            setattr(zinfo, attr, getattr(member, attr))
+        with open(previous.filename, 'rb') as fp:
+            fp.seek(previous.data_offset(member))
+            self.write_raw(zinfo, fp)
+
+    def write_raw(self, zinfo, fp):
+        """Writes a member whose (already compressed) data is in fp.
+
+        zinfo must have CRC, sizes and compression set. Exactly
+        zinfo.compress_size bytes are read from fp. Members whose name
+        is already in archive are skipped.
+        """
+        with self._lock:
+            archive = self.archive
+            if zinfo.filename in archive.NameToInfo:
+                return
+            if self.seekable:
+                archive.fp.seek(archive.start_dir)
+            zinfo.header_offset = archive.fp.tell()
+            archive.fp.write(zinfo.FileHeader())
+            size = get_chunk_size()
+            remaining = zinfo.compress_size
+            while remaining:
+                data = fp.read(min(size, remaining))
+                if not data:
+                    raise ValueError(
+                        'Member "{}" data is truncated.'.format(
+                            zinfo.filename))
+                archive.fp.write(data)
+                remaining -= len(data)
+            self._register(zinfo)
+
+    @staticmethod
+    def _rename(zinfo, obj):
+        """Names member after object sha256sum and keeps its MD5."""
+        zinfo.filename = zinfo.orig_filename = obj['sha256sum']
+        zinfo.comment = obj.md5.encode()
+
+    def _register(self, zinfo):
+        # pylint: disable=protected-access
+        archive = self.archive
+        archive.filelist.append(zinfo)
+        archive.NameToInfo[zinfo.filename] = zinfo
+        archive.start_dir = archive.fp.tell()
+        archive._didModify = True
+
+
+class PackageArchive:
+    """Reads a package archive (.uhupkg).
+
+    Archive is only opened when first needed and objects are looked up
+    by sha256sum. Stored members are read from a memory map of the
+    archive file, so they are neither extracted nor read through the
+    zip module. Member hashes are verified, while read, on demand.
+    """
+
+    def __init__(self, filename):
+        self.filename = os.path.realpath(filename)
+        self._archive = None
+        self._mmap = None
+        self._payload = None
+        self._metadata = None
+        self._lock = threading.Lock()
+
+    @property
+    def archive(self):
+        with self._lock:
+            if self._archive is None:
+                try:
+                    self._archive = zipfile.ZipFile(self.filename)
+                except zipfile.BadZipFile:
+                    raise self._error('not a zip file')
+        return self._archive
+
+    @property
+    def payload(self):
+        """Metadata exactly as it was signed."""
+        if self._payload is None:
+            self._payload = self._read(METADATA).decode()
+        return self._payload
+
+    @property
+    def metadata(self):
+        if self._metadata is None:
+            try:
+                self._metadata = json.loads(self.payload)
+            except ValueError:
+                raise self._error('invalid metadata')
+        return self._metadata
+
+    @property
+    def signature(self):
+        return self._read(SIGNATURE).decode() or None
+
+    def _read(self, name):
+        try:
+            return self.archive.read(name)
+        except KeyError:
+            raise self._error('missing {}'.format(name))
+
+    def _error(self, reason):
+        return ValueError('Invalid package archive "{}": {}.'.format(
+            self.filename, reason))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Objects
+
+    def members(self):
+        """Returns the zip info of each object member."""
+        return [info for info in self.archive.infolist()
+                if info.filename not in (METADATA, SIGNATURE)]
+
+    def member(self, sha256sum):
+        """Returns the zip info of an object member."""
+        if sha256sum in (METADATA, SIGNATURE):
+            raise KeyError(sha256sum)
+        return self.archive.getinfo(sha256sum)
+
+    def __contains__(self, sha256sum):
+        try:
+            self.member(sha256sum)
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        """Yields the sha256sum of each object."""
+        for info in self.members():
+            yield info.filename
+
+    def __len__(self):
+        return len(self.members())
+
+    def objects(self):
+        """Returns metadata objects (of all installation sets)."""
+        return [obj for objs in self.metadata.get('objects', [])
+                for obj in objs]
+
+    def missing(self):
+        """Returns the sha256sum of metadata objects not in archive."""
+        return sorted({obj.get('sha256sum', '') for obj in self.objects()
+                       if obj.get('sha256sum', '') not in self})
+
+    # Reading
+
+    def _map(self):
+        with self._lock:
+            if self._mmap is None:
+                with open(self.filename, 'rb') as fp:
+                    self._mmap = mmap.mmap(
+                        fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def data_offset(self, zinfo):
+        """Returns where member data starts within archive file."""
+        start = zinfo.header_offset
+        header = self._map()[start:start + zipfile.sizeFileHeader]
+        if len(header) != zipfile.sizeFileHeader:
+            raise ValueError('Member "{}" is truncated.'.format(
+                zinfo.filename))
+        header = struct.unpack(zipfile.structFileHeader, header)
+        name_length, extra_length = header[-2:]
+        return start + zipfile.sizeFileHeader + name_length + extra_length
+
+    def _chunks(self, zinfo):
+        chunk_size = get_chunk_size()
+        if zinfo.compress_type == zipfile.ZIP_STORED:
+            data = self._map()
+            start = self.data_offset(zinfo)
+            end = start + zinfo.file_size
+            if end > len(data):
+                raise ValueError('Member "{}" is truncated.'.format(
+                    zinfo.filename))
+            for offset in range(start, end, chunk_size):
+                yield data[offset:min(offset + chunk_size, end)]
+            return
+        try:
+            with self.archive.open(zinfo) as fp:
+                yield from iter(lambda: fp.read(chunk_size), b'')
+        except (zipfile.BadZipFile, zlib.error) as err:
+            raise ValueError('Member "{}" is corrupted: {}'.format(
+                zinfo.filename, err))
+
+    def read(self, sha256sum, verify=False, callback=None):
+        """Yields object data, in chunks.
+
+        If verify, data is hashed while it is read and ValueError is
+        raised, after the last chunk, if it does not match sha256sum.
+        """
+        zinfo = self.member(sha256sum)
+        sha256 = hashlib.sha256() if verify else None
+        for chunk in self._chunks(zinfo):
+            if sha256 is not None:
+                sha256.update(chunk)
+            yield chunk
+            call(callback, 'object_progress', len(chunk))
+        if sha256 is not None and sha256.hexdigest() != sha256sum:
+            raise ValueError('Object "{}" is corrupted.'.format(sha256sum))
+
+    def header(self, sha256sum, size):
+        """Returns (up to) the first size bytes of an object."""
+        header = b''
+        chunks = self.read(sha256sum)
+        for chunk in chunks:
+            header += chunk
+            if len(header) >= size:
+                break
+        chunks.close()
+        return header[:size]
+
+    def md5(self, sha256sum, callback=None):
+        """Returns object MD5, reading it only if not kept in archive."""
+        comment = self.member(sha256sum).comment.decode(errors='replace')
+        if len(comment) == 32:
+            return comment
+        md5 = hashlib.md5()
+        for chunk in self.read(sha256sum, callback=callback):
+            md5.update(chunk)
+        return md5.hexdigest()
+
+    def verify(self, callback=None):
+        """Verifies archive objects. Returns a list of errors.
+
+        Every metadata object must be in archive with its size, and
+        every object must match the sha256sum it is named after.
+        """
+        errors = []
+        sizes = {obj.get('sha256sum', ''): obj.get('size')
+                 for obj in self.objects()}
+        for sha256sum, size in sorted(sizes.items()):
+            if sha256sum not in self:
+                errors.append('Object "{}" is missing.'.format(sha256sum))
+            elif self.member(sha256sum).file_size != size:
+                errors.append('Object "{}" size does not match.'.format(
+                    sha256sum))
+        for sha256sum in self:
+            try:
+                for _ in self.read(sha256sum, verify=True, callback=callback):
+                    pass
+            except ValueError as err:
+                errors.append(str(err))
+        return errors
+
+    def extract(self, sha256sum, directory, verify=True, callback=None):
+        """Extracts an object into directory, returning its filename.
+
+        Data is written to a temporary file, which only replaces the
+        object file once read (and verified). If anything fails,
+        nothing is left in directory.
+        """
+        self.member(sha256sum)
+        if SHA256SUM_REGEXP.fullmatch(sha256sum) is None:
+            raise ValueError(
+                'Object name "{}" is not a sha256sum.'.format(sha256sum))
+        handle, tmp_path = tempfile.mkstemp(dir=directory, prefix='.uhu-')
+        try:
+            with os.fdopen(handle, 'wb') as fp:
+                for chunk in self.read(sha256sum, verify, callback):
+                    fp.write(chunk)
+            filename = os.path.join(directory, sha256sum)
+            os.replace(tmp_path, filename)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return filename
+
+    def to_upload(self, directory, callback=None):
+        """Returns the objects to be uploaded from archive.
+
+        Stored members are uploaded from their range of the archive
+        file. Compressed members are extracted into directory first.
+        """
+        missing = self.missing()
+        if missing:
+            raise ValueError('Archive misses objects: {}.'.format(
+                ', '.join(missing)))
+        names = {obj['sha256sum']: os.path.basename(obj['filename'])
+                 for obj in reversed(self.objects())}
+        objects = []
+        for sha256sum in sorted(names):
+            zinfo = self.member(sha256sum)
+            obj = {
+                'filename': self.filename,
+                'size': zinfo.file_size,
+                'sha256sum': sha256sum,
+                'md5': self.md5(sha256sum, callback),
+                'name': names[sha256sum],
+            }
+            if zinfo.compress_type == zipfile.ZIP_STORED:
+                obj['offset'] = self.data_offset(zinfo)
+            else:
+                obj['filename'] = self.extract(
+                    sha256sum, directory, verify=False)
+            objects.append(obj)
+        return objects
+
+    def __str__(self):
+        # pylint: disable=import-outside-toplevel
+        from humanize.filesize import naturalsize
+        metadata = self.metadata
+        hardware = metadata.get('supported-hardware', 'any')
+        if isinstance(hardware, list):
+            hardware = ', '.join(hardware) or 'any'
+        lines = [
+            'Archive: {}'.format(self.filename),
+            'Product: {}'.format(metadata.get('product')),
+            'Version: {}'.format(metadata.get('version')),
+            'Supported hardware: {}'.format(hardware),
+            'Signed: {}'.format('yes' if self.signature else 'no'),
+            'Objects:',
+        ]
+        for info in self.members():
+            compression = 'stored'
+            if info.compress_type != zipfile.ZIP_STORED:
+                compression = 'deflated to {}'.format(
+                    naturalsize(info.compress_size, binary=True))
+            lines.append('    {} {} ({})'.format(
+                info.filename,
+                naturalsize(info.file_size, binary=True), compression))
+        return '\n'.join(lines)
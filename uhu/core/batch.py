@@ -0,0 +1,101 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+"""Batch signing and verification of package files and archives.
+
+Each file is handled by a worker process. Keys are parsed only once
+per worker (see uhu.utils.load_private_key), and every file gets an
+entry in the returned report, instead of stopping at the first error.
+"""
+
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pkgschema
+
+from .utils import load_package, sign_package_archive, verify_package_archive
+
+
+def _file_type(fn):
+    return 'archive' if zipfile.is_zipfile(fn) else 'package'
+
+
+def _package_metadata(fn):
+    metadata = load_package(fn).to_metadata()
+    try:
+        pkgschema.validate_metadata(metadata)
+    except pkgschema.ValidationError:
+        raise ValueError('Invalid package metadata.')
+    return metadata
+
+
+def sign_file(fn, private_key):
+    """Signs a package archive in place. Returns its report entry.
+
+    Package files have nowhere to keep a signature, so they are
+    reported as errors: they must be archived to be signed.
+    """
+    entry = {'file': fn, 'type': _file_type(fn), 'signature': None}
+    try:
+        if entry['type'] != 'archive':
+            raise ValueError(
+                'Only package archives can be signed. '
+                'Create one with "uhu package archive".')
+        entry['signature'] = sign_package_archive(fn, private_key)
+        entry['errors'] = []
+    except (OSError, ValueError) as err:
+        entry['errors'] = [str(err)]
+    entry['ok'] = not entry['errors']
+    return entry
+
+
+def verify_file(fn, key):
+    """Verifies a package file or archive. Returns its report entry.
+
+    Archives must be signed by key and their objects must match their
+    hashes. Package files (which are not signed) must have valid
+    metadata.
+    """
+    entry = {'file': fn, 'type': _file_type(fn)}
+    try:
+        if entry['type'] == 'archive':
+            entry['errors'] = verify_package_archive(fn, key)
+        else:
+            _package_metadata(fn)
+            entry['errors'] = []
+    except (OSError, ValueError) as err:
+        entry['errors'] = [str(err)]
+    entry['ok'] = not entry['errors']
+    return entry
+
+
+def _run(func, filenames, key, workers):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(filenames))
+    if workers <= 1:
+        return [func(fn, key) for fn in filenames]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, filenames, [key] * len(filenames)))
+
+
+def sign_many(filenames, private_key, workers=None):
+    """Signs many package archives in up to workers processes.
+
+    Returns a report entry for each file, in the given order.
+    """
+    if private_key is None:
+        raise ValueError('Cannot sign packages without a private key.')
+    return _run(sign_file, filenames, private_key, workers)
+
+
+def verify_many(filenames, key, workers=None):
+    """Verifies many package files or archives in up to workers processes.
+
+    key may be a public or a private key. Returns a report entry for
+    each file, in the given order.
+    """
+    if key is None:
+        raise ValueError('Cannot verify packages without a key.')
+    return _run(verify_file, filenames, key, workers)
@@ -1,40 +1,326 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import ctypes
+import lzma
+import os
 import shutil
-import subprocess
+import struct
+import zlib
+
+from ..utils import get_chunk_size, get_compression_check
+from .analysis import HeaderStreamConsumer
+
+
+# Upper bound for the data decompressed at once, so highly
+# compressed chunks do not need lots of memory to be counted
+MAX_OUTPUT_SIZE = 1024 * 1024  # 1 MiB
+
+# Deflate can not compress more than this ratio. Below it, the gzip
+# ISIZE field (uncompressed size modulo 2^32) can not be wrapped.
+GZIP_MAX_RATIO = 1032
+
+# lzop header flags
+LZOP_ADLER32_D = 0x001
+LZOP_ADLER32_C = 0x002
+LZOP_EXTRA_FIELD = 0x040
+LZOP_CRC32_D = 0x100
+LZOP_CRC32_C = 0x200
+LZOP_FILTER = 0x800
+
+
+class StreamDecoder:
+    """Validates a compressed stream and counts its uncompressed size.
+
+    Data is given in chunks to feed() and, at the end, close() returns
+    the uncompressed size. Both raise ValueError if stream is
+    corrupted or truncated. Decompressed data is discarded.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.streams = 0
+        self._decompressor = None
+
+    def feed(self, data):
+        try:
+            while data:
+                if self._decompressor is None:
+                    data = self._next_stream(data)
+                    if not data:
+                        break
+                    self._decompressor = self._new_decompressor()
+                data = self._decompress(data)
+                if self._decompressor.eof:
+                    self._decompressor = None
+                    self.streams += 1
+        except (zlib.error, lzma.LZMAError) as error:
+            raise ValueError(str(error))
+
+    def close(self):
+        if self._decompressor is not None or not self.streams:
+            raise ValueError('Compressed data is truncated.')
+        return self.size
+
+    def _next_stream(self, data):
+        """Returns data where next stream starts."""
+        if self.streams:
+            raise ValueError('Trailing garbage after compressed data.')
+        return data
+
+    def _new_decompressor(self):
+        raise NotImplementedError
+
+    def _decompress(self, data):
+        """Decompresses data, returning what comes after stream end."""
+        raise NotImplementedError
+
+
+class GzipDecoder(StreamDecoder):
+    """Gzip decoder. Supports multiple members (e.g. pigz output).
+
+    As gzip does, zeros after the last member (e.g. padding of block
+    aligned images) are ignored.
+    """
+
+    _padded = False
+
+    def _next_stream(self, data):
+        if not self.streams:
+            return data
+        stripped = data.lstrip(b'\0')
+        if len(stripped) < len(data):
+            self._padded = True
+        if stripped and self._padded:
+            raise ValueError('Trailing garbage after compressed data.')
+        return stripped
+
+    def _new_decompressor(self):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def _decompress(self, data):
+        decompressor = self._decompressor
+        while True:
+            output = decompressor.decompress(data, MAX_OUTPUT_SIZE)
+            self.size += len(output)
+            data = decompressor.unconsumed_tail
+            if not data and (
+                    decompressor.eof or len(output) < MAX_OUTPUT_SIZE):
+                break
+        return decompressor.unused_data
+
+
+class LZMAStreamDecoder(StreamDecoder):
+    """Base decoder for formats supported by lzma module."""
+
+    lzma_format = None
+
+    def _new_decompressor(self):
+        return lzma.LZMADecompressor(format=self.lzma_format)
+
+    def _decompress(self, data):
+        decompressor = self._decompressor
+        self.size += len(decompressor.decompress(data, MAX_OUTPUT_SIZE))
+        while not (decompressor.needs_input or decompressor.eof):
+            self.size += len(decompressor.decompress(b'', MAX_OUTPUT_SIZE))
+        return decompressor.unused_data if decompressor.eof else b''
+
+
+class XZDecoder(LZMAStreamDecoder):
+    """XZ decoder. Supports concatenated streams and stream padding."""
+
+    lzma_format = lzma.FORMAT_XZ
+
+    def _next_stream(self, data):
+        return data.lstrip(b'\0') if self.streams else data
+
+
+class LZMADecoder(LZMAStreamDecoder):
+    """Legacy LZMA (LZMA_Alone) decoder."""
+
+    lzma_format = lzma.FORMAT_ALONE
+
+
+def decode(fn, decoder):
+    """Reads a compressed file in a single pass through decoder."""
+    chunk_size = get_chunk_size()
+    with open(fn, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b''):
+            decoder.feed(chunk)
+    return decoder.close()
+
+
+def gzip_size(fn):
+    return decode(fn, GzipDecoder())
+
+
+def xz_size(fn):
+    return decode(fn, XZDecoder())
+
+
+def lzma_size(fn):
+    return decode(fn, LZMADecoder())
+
+
+def lzop_size(fn):
+    # pylint: disable=import-outside-toplevel
+    import libarchive
+    try:
+        with libarchive.file_reader(
+                fn, format_name='raw', filter_name='lzop') as archive:
+            for entry in archive:
+                return sum(len(block) for block in entry.get_blocks())
+    except libarchive.exception.ArchiveError as error:
+        raise ValueError(str(error))
+    raise ValueError('Compressed data is truncated.')
+
+
+# Trailers
+#
+# These functions read uncompressed size from headers, trailers and
+# indexes without decompressing data. They return None when it is not
+# possible to know the size this way.
+
+def gzip_trailer_size(fn):
+    """Returns gzip ISIZE field, if it can not have wrapped around.
+
+    For multi-member files, only the last member size is stored, so
+    this is as reliable as "gzip -l".
+    """
+    size = os.path.getsize(fn)
+    if size < 18 or size * GZIP_MAX_RATIO >= 2 ** 32:
+        return None
+    with open(fn, 'rb') as fp:
+        fp.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', fp.read(4))[0]
+
+
+def _read_multibyte_int(data, offset):
+    """Decodes a XZ variable length integer."""
+    value = 0
+    for index in range(9):
+        byte = data[offset + index]
+        value |= (byte & 0x7f) << (7 * index)
+        if not byte & 0x80:
+            return value, offset + index + 1
+    raise ValueError('Invalid XZ index.')
+
+
+def xz_index_size(fn):
+    """Sums uncompressed sizes found on each XZ stream index."""
+    size = 0
+    try:
+        with open(fn, 'rb') as fp:
+            end = fp.seek(0, os.SEEK_END)
+            while end > 0:
+                # stream padding
+                fp.seek(end - 4)
+                if fp.read(4) == b'\0\0\0\0':
+                    end -= 4
+                    continue
+                fp.seek(end - 12)
+                footer = fp.read(12)
+                if footer[10:] != b'YZ':
+                    return None
+                index_size = (struct.unpack('<I', footer[4:8])[0] + 1) * 4
+                index_start = end - 12 - index_size
+                fp.seek(index_start)
+                index = fp.read(index_size)
+                if index[0] != 0:
+                    return None
+                records, offset = _read_multibyte_int(index, 1)
+                blocks_size = 0
+                for _ in range(records):
+                    unpadded, offset = _read_multibyte_int(index, offset)
+                    uncompressed, offset = _read_multibyte_int(index, offset)
+                    blocks_size += (unpadded + 3) & ~3
+                    size += uncompressed
+                end = index_start - blocks_size - 12
+                fp.seek(max(end, 0))
+                if end < 0 or fp.read(6) != COMPRESSORS['xz']['signature']:
+                    return None
+    except (OSError, ValueError, IndexError, struct.error):
+        return None
+    return size
+
+
+def lzma_header_size(fn):
+    """Returns uncompressed size from LZMA header, if known."""
+    with open(fn, 'rb') as fp:
+        header = fp.read(13)
+    if len(header) < 13:
+        return None
+    size = struct.unpack('<Q', header[5:])[0]
+    if size == 2 ** 64 - 1:  # unknown size, stream has an end marker
+        return None
+    return size
+
+
+def lzop_blocks_size(fn):
+    """Sums uncompressed sizes found on each lzop block header."""
+    size = 0
+    try:
+        with open(fn, 'rb') as fp:
+            fp.seek(len(COMPRESSORS['lzop']['signature']))
+            version = struct.unpack('>H', fp.read(2))[0]
+            fp.seek(2, os.SEEK_CUR)  # library version
+            if version >= 0x0940:
+                fp.seek(2, os.SEEK_CUR)  # version needed to extract
+            fp.seek(2 if version >= 0x0940 else 1, os.SEEK_CUR)  # method
+            flags = struct.unpack('>I', fp.read(4))[0]
+            if flags & LZOP_FILTER:
+                fp.seek(4, os.SEEK_CUR)
+            fp.seek(12 if version >= 0x0940 else 8, os.SEEK_CUR)  # mode/mtime
+            name_size = fp.read(1)[0]
+            fp.seek(name_size + 4, os.SEEK_CUR)  # name and checksum
+            if flags & LZOP_EXTRA_FIELD:
+                extra_size = struct.unpack('>I', fp.read(4))[0]
+                fp.seek(extra_size + 4, os.SEEK_CUR)
+            while True:
+                uncompressed = struct.unpack('>I', fp.read(4))[0]
+                if uncompressed == 0:
+                    return size
+                compressed = struct.unpack('>I', fp.read(4))[0]
+                skip = compressed
+                skip += 4 * bool(flags & LZOP_ADLER32_D)
+                skip += 4 * bool(flags & LZOP_CRC32_D)
+                if compressed < uncompressed:
+                    skip += 4 * bool(flags & LZOP_ADLER32_C)
+                    skip += 4 * bool(flags & LZOP_CRC32_C)
+                fp.seek(skip, os.SEEK_CUR)
+                size += uncompressed
+    except (OSError, IndexError, struct.error):
+        return None
 
 
 COMPRESSORS = {
     # GZIP format: http://www.gzip.org/zlib/rfc-gzip.html#file-format
     'gzip': {
         'signature': b'\x1f\x8b',
-        # pigz does not follow symlinks by default so we use 'readlink' to
-        # workaround this limitation. The Yocto Project prefer pigz due its
-        # better performance and uses it as a gzip alternative thus we need to
-        # support both here.
-        'test': 'gzip -t $(readlink -f %s)',
-        'cmd': "gzip -l $(readlink -f %s) | tail -n 1 | awk '{ print $2}'"
+        'size': gzip_size,
+        'decoder': GzipDecoder,
+        'trailer': gzip_trailer_size,
     },
     # LZO format: http://www.lzop.org/download/lzop-1.03.tar.gz
     'lzop': {
         'signature': b'\x89LZO\x00\r\n\x1a\n',
-        'test': 'lzop -t %s',
-        'cmd': "lzop -l %s | tail -n 1 | awk '{ print $3}'"
+        'size': lzop_size,
+        'decoder': None,  # decompressed by libarchive
+        'trailer': lzop_blocks_size,
     },
     # XZ format: http://tukaani.org/xz/xz-file-format.txt
     'xz': {
         'signature': b'\xfd7zXZ\x00',
-        'test': 'xz -t %s',
-        'cmd': "xz -l %s --robot | tail -n 1 | awk '{ print $5}'"
+        'size': xz_size,
+        'decoder': XZDecoder,
+        'trailer': xz_index_size,
     },
     # LZMA format: http://tukaani.org/xz/xz-file-format.txt
     'lzma': {
         'signature': b'\x5d\x00\x00',
-        'test': 'xz -t --format=lzma %s',
-        # Since lzma compression doen't add uncompressed size
-        # information to the header to set the field to 0
-        'cmd': "ls %s | echo 0"
+        'size': lzma_size,
+        'decoder': LZMADecoder,
+        'trailer': lzma_header_size,
     },
 }
 
@@ -51,6 +337,11 @@ def get_compressor_format(fn):
     """
     with open(fn, 'rb') as fp:
         header = fp.read(MAX_COMPRESSOR_SIGNATURE_SIZE)
+    return detect_compressor_format(header)
+
+
+def detect_compressor_format(header):
+    """Returns the compression backend matching a file header."""
     for fmt, compressor in COMPRESSORS.items():
         signature = compressor['signature']
         if signature == header[:len(signature)]:
@@ -58,53 +349,129 @@ def get_compressor_format(fn):
     return None
 
 
+def get_libarchive_details():
+    """Returns libarchive version and the libraries it is linked to."""
+    # pylint: disable=import-outside-toplevel
+    import libarchive.ffi
+    func = getattr(libarchive.ffi.libarchive, 'archive_version_details', None)
+    if func is None:  # libarchive < 3.4
+        return ''
+    func.restype = ctypes.c_char_p
+    return func().decode()
+
+
 def is_compressor_supported(compressor):
-    """Checks if compressor utility exists.
+    """Checks if compressed files can be decompressed.
 
-    This is necessary so we can get the uncompressed size of an
-    object.
+    gzip, xz and lzma are decompressed by Python itself. lzop is
+    decompressed by libarchive, which needs liblzo2 or falls back to
+    lzop utility.
     """
-    return bool(shutil.which(compressor))
+    if compressor != 'lzop':
+        return compressor in COMPRESSORS
+    if shutil.which(compressor):
+        return True
+    return 'liblzo2' in get_libarchive_details()
 
 
 def is_valid_compressed_file(fn, compressor_name):
     """Checks if compressed file is a valid one."""
     compressor = COMPRESSORS.get(compressor_name)
-    test_cmd = compressor['test'] % fn
     try:
-        result = subprocess.check_call(test_cmd, shell=True)
-        if result == 0:
-            return True
-    except subprocess.CalledProcessError:
-        pass  # file is corrupted
-    return False
+        compressor['size'](fn)
+    except ValueError:
+        return False  # file is corrupted
+    return True
+
 
+def get_uncompressed_size(fn, compressor_name, check=None):
+    """Returns uncompressed size of a given compressed file.
 
-def get_uncompressed_size(fn, compressor_name):
-    """Returns uncompressed size of a given compressed file."""
+    File is decompressed (and so, validated) in a single pass unless
+    check is False (by default, see get_compression_check). In this
+    case, size is read from file trailer or index when available.
+    """
     if compressor_name is None:
         return  # It is not a compressed file
     compressor = COMPRESSORS.get(compressor_name)
     if compressor is None:
         err = '"{}" is not supported'
         raise ValueError(err.format(compressor_name))
+    if check is None:
+        check = get_compression_check()
+    if not check:
+        size = compressor['trailer'](fn)
+        if size is not None:
+            return size
     if not is_compressor_supported(compressor_name):
         err = '"{}" is not supported by your system.'
         raise SystemError(err.format(compressor_name))
-    if not is_valid_compressed_file(fn, compressor_name):
+    try:
+        return compressor['size'](fn)
+    except ValueError:
         err = '"{}" is a bad/corrupted {} file.'
         raise ValueError(err.format(fn, compressor_name))
-    cmd = compressor['cmd'] % fn
-    size = subprocess.check_output(cmd, shell=True)
-    return int(size.decode())
 
 
 def compression_to_metadata(filename):
     compressor = get_compressor_format(filename)
     size = get_uncompressed_size(filename, compressor)
+    return _size_to_metadata(size)
+
+
+def _size_to_metadata(size):
     if size is None:
         return {}
     return {
         'compressed': True,
         'required-uncompressed-size': size,
     }
+
+
+class CompressionConsumer(HeaderStreamConsumer):
+    """Builds compression metadata while an object is read.
+
+    Once the header identifies the compression format, data is given
+    to its StreamDecoder, so the object is validated and measured
+    without being read again. Formats without a decoder (lzop), or
+    when check is disabled, are handled by get_uncompressed_size.
+    """
+
+    header_size = MAX_COMPRESSOR_SIGNATURE_SIZE
+
+    def __init__(self, filename, check=None):
+        super().__init__()
+        self.filename = filename
+        self.check = get_compression_check() if check is None else check
+        self.format = None
+        self._decoder = None
+        self._error = None
+
+    def result(self):
+        self.flush()
+        if self._decoder is None:
+            return _size_to_metadata(get_uncompressed_size(
+                self.filename, self.format, self.check))
+        try:
+            if self._error is not None:
+                raise self._error
+            size = self._decoder.close()
+        except ValueError:
+            err = '"{}" is a bad/corrupted {} file.'
+            raise ValueError(err.format(self.filename, self.format))
+        return _size_to_metadata(size)
+
+    def start(self):
+        self.format = detect_compressor_format(self.header)
+        if self.format is not None and self.check:
+            decoder = COMPRESSORS[self.format]['decoder']
+            if decoder is not None:
+                self._decoder = decoder()
+
+    def consume(self, chunk):
+        if self._decoder is None or self._error is not None:
+            return
+        try:
+            self._decoder.feed(chunk)
+        except ValueError as error:
+            self._error = error
@@ -1,6 +1,9 @@
 # Copyright (C) 2021 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+from .analysis import HeaderConsumer
+
+
 ARCHIVERS = {
     # Bita format: https://github.com/oll3/bita
     'bita': {
@@ -14,11 +17,8 @@ MAX_ARCHIVER_SIGNATURE_SIZE = max(
 )
 
 
-def get_archiver_format(fn):
-    """Returns the delta archiver backend for a given file.
-    """
-    with open(fn, 'rb') as fp:
-        header = fp.read(MAX_ARCHIVER_SIGNATURE_SIZE)
+def detect_archiver_format(header):
+    """Returns the delta archiver backend matching a file header."""
     for fmt, archiver in ARCHIVERS.items():
         signature = archiver['signature']
         if signature == header[:len(signature)]:
@@ -26,8 +26,33 @@ def get_archiver_format(fn):
     return None
 
 
-def validate_delta(filename):
-    if get_archiver_format(filename) is None:
+def get_archiver_format(fn):
+    """Returns the delta archiver backend for a given file.
+    """
+    with open(fn, 'rb') as fp:
+        header = fp.read(MAX_ARCHIVER_SIGNATURE_SIZE)
+    return detect_archiver_format(header)
+
+
+def validate_delta(filename, header=None):
+    if header is None:
+        fmt = get_archiver_format(filename)
+    else:
+        fmt = detect_archiver_format(header)
+    if fmt is None:
         err = '"{}" doesn\'t match a known format type'
         raise ValueError(err.format(filename))
     return {}
+
+
+class ArchiverConsumer(HeaderConsumer):
+    """Validates a delta object while it is read."""
+
+    header_size = MAX_ARCHIVER_SIGNATURE_SIZE
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def result(self):
+        return validate_delta(self.filename, self.header)
@@ -1,16 +1,29 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import io
+import mmap
+import os
 import re
 import string
 import struct
 from copy import deepcopy
-import libarchive
+
+from ..utils import get_chunk_size
+from .analysis import Consumer
+
+try:
+    from re import _parser as sre_parse  # Python >= 3.11
+except ImportError:
+    import sre_parse  # pylint: disable=deprecated-module
 
 
 # Utilities
 
 PRINTABLE = string.printable.encode()
+PRINTABLE_MASK = bytes(int(char in PRINTABLE) for char in range(256))
+# Upper limit for the length of runs skipped as too short to match
+MAX_MIN_WIDTH = 256
 KNOWN_PATTERNS = ['linux-kernel', 'u-boot']
 CUSTOM_PATTERN = 'regexp'
 
@@ -31,20 +44,76 @@ def check(phrase, regexp):
         return results[0].decode()
 
 
+def min_width(regexp):
+    """Returns the length of the shortest text matched by regexp."""
+    try:
+        width = sre_parse.parse(regexp.pattern, regexp.flags).getwidth()[0]
+    except Exception:  # pylint: disable=broad-except
+        return 0
+    return min(width, MAX_MIN_WIDTH)
+
+
+class PatternScanner:
+    """Searches a pattern within the printable runs of a stream.
+
+    A printable run is a sequence of printable characters delimited
+    by non-printable ones. Data is given in chunks to feed(); runs
+    spanning chunk boundaries are kept until they are complete.
+
+    Instead of walking each character, chunks are translated into a
+    mask (1 for printable, 0 otherwise) where runs are found with
+    bytes.find(). Runs shorter than the shortest possible match are
+    skipped without being checked.
+    """
+
+    def __init__(self, pattern):
+        self.regexp = re.compile(pattern)
+        self.min_width = min_width(self.regexp)
+        self._needle = b'\x01' * max(self.min_width, 1)
+        self._tail = bytearray()
+
+    def feed(self, chunk):
+        """Scans chunk. Returns the first match found or None."""
+        mask = chunk.translate(PRINTABLE_MASK)
+        first = mask.find(b'\x00')
+        if first == -1:
+            self._tail += chunk
+            return None
+        last = mask.rfind(b'\x00')
+        self._tail += chunk[:first]
+        result = self._check(bytes(self._tail))
+        self._tail = bytearray(chunk[last + 1:])
+        if result:
+            return result
+        start = mask.find(self._needle, first, last)
+        while start != -1:
+            end = mask.find(b'\x00', start)
+            result = check(bytes(chunk[start:end]), self.regexp)
+            if result:
+                return result
+            start = mask.find(self._needle, end, last)
+        return None
+
+    def close(self):
+        """Scans the last run. Returns its match or None."""
+        result = check(bytes(self._tail), self.regexp)
+        self._tail = bytearray()
+        return result
+
+    def _check(self, run):
+        if len(run) < self.min_width:
+            return None
+        return check(run, self.regexp)
+
+
 def find(pattern, iterable):
     """Generic function to find some text in some iterable."""
-    regexp = re.compile(pattern)
-    phrase = b''
+    scanner = PatternScanner(pattern)
     for chunk in iterable:
-        for char in chunk:
-            if char in PRINTABLE:
-                phrase += bytes([char])
-            else:
-                result = check(phrase, regexp)
-                if result:
-                    return result
-                phrase = b''
-    return check(phrase, regexp)
+        result = scanner.feed(chunk)
+        if result:
+            return result
+    return scanner.close()
 
 
 # Linux Kernel utilities
@@ -83,28 +152,63 @@ def is_x86_z_image(fp):
     return get_x86_generic_image_info(fp) == X86_Z_IMAGE
 
 
+# Headers taken from:
+# https://github.com/torvalds/linux/blob/master/scripts/extract-vmlinux
+ARM_Z_IMAGE_HEADERS = [
+    b'\x1f\x8b\x08',  # gzip
+    b'\xfd7zXZ\x00',  # xz
+    b'CZh',           # bzip2
+    b'\x5d\x00\x00',  # lzma
+    b'\x89\x4c\x5a',  # lzo
+    b'\x02!L\x18',    # lz4
+    b'(\xb5/\xfd',    # zstd
+]
+
+
+def find_signatures(fp, signatures):
+    """Yields the offset of the first occurrence of each signature.
+
+    Offsets are yielded in file order. The file is memory mapped and
+    scanned only once, stopping when all signatures are found. Streams
+    not backed by a file (e.g. io.BytesIO) are read into memory.
+    """
+    try:
+        fileno = fp.fileno()
+    except io.UnsupportedOperation:
+        fp.seek(0)
+        yield from _find_signatures(fp.read(), signatures)
+        return
+    if os.fstat(fileno).st_size == 0:
+        return  # empty files can not be memory mapped
+    with mmap.mmap(fileno, 0, access=mmap.ACCESS_READ) as data:
+        yield from _find_signatures(data, signatures)
+
+
+def _find_signatures(data, signatures):
+    alternatives = b'|'.join(re.escape(signature) for signature in signatures)
+    # A lookahead is used so overlapping signatures are also found
+    regexp = re.compile(b'(?=(' + alternatives + b'))')
+    remaining = set(signatures)
+    for match in regexp.finditer(data):
+        signature = match.group(1)
+        if signature not in remaining:
+            continue
+        remaining.remove(signature)
+        yield match.start()
+        if not remaining:
+            break
+
+
 def get_arm_z_image_version(fp):
     """Returns Linux kernel version of an ARM zImage."""
+    # pylint: disable=import-outside-toplevel
+    import libarchive
     # In ARM uImage kernel is compressed within the image. To retrive
     # its version, we need find the compressed kernel, uncompress it,
     # and extract the version from the uncompressed data.
-
-    for header in [
-            # Headers taken from:
-            # https://github.com/torvalds/linux/blob/master/scripts/extract-vmlinux
-            b'\x1f\x8b\x08',  # gzip
-            b'\xfd7zXZ\x00',  # xz
-            b'CZh',           # bzip2
-            b'\x5d\x00\x00',  # lzma
-            b'\x89\x4c\x5a',  # lzo
-            b'\x02!L\x18',    # lz4
-            b'(\xb5/\xfd',    # zstd
-    ]:
-        fp.seek(0)
+    for offset in find_signatures(fp, ARM_Z_IMAGE_HEADERS):
+        fp.seek(offset)
         try:
-            # This could be improved to avoid to reading all file in memory
-            fp.seek(fp.read().index(header))
-
             with libarchive.stream_reader(
                     fp,
                     format_name='raw',
@@ -117,8 +221,6 @@ def get_arm_z_image_version(fp):
                 result = find(pattern, iterable)
                 if result:
                     return result
-        except ValueError:
-            continue
         except libarchive.exception.ArchiveError:
             continue
     return
@@ -176,11 +278,14 @@ def get_kernel_version(fp):
 
 # U-Boot
 
+UBOOT_PATTERN = br'U-Boot(?: SPL)? (\S+) \(.*\)'
+
+
 def get_uboot_version(fp):
     """Returns U-Boot object version."""
     fp.seek(0)
-    pattern = br'U-Boot(?: SPL)? (\S+) \(.*\)'
-    iterable = iter(lambda: fp.read(30), b'')
+    pattern = UBOOT_PATTERN
+    iterable = iter(lambda: fp.read(get_chunk_size()), b'')
     result = find(pattern, iterable)
     if result is not None:
         return result
@@ -210,6 +315,43 @@ def get_version(fn, type_, **kwargs):
             return get_object_version(fp, **kwargs)
 
 
+class VersionConsumer(Consumer):
+    """Retrieves an object version while it is read.
+
+    Only U-Boot and custom patterns are supported, since they just
+    scan the object data (from seek on) for a pattern.
+    """
+
+    ERRORS = {
+        'u-boot': 'Cannot retrive U-Boot version',
+        'regexp': 'Cannot retrive object version',
+    }
+
+    def __init__(self, type_, pattern=None, seek=0):
+        self.type = type_
+        if type_ == 'u-boot':
+            pattern = UBOOT_PATTERN
+        self.seek = seek
+        self.version = None
+        self._offset = 0
+        self._scanner = PatternScanner(pattern)
+
+    def feed(self, chunk):
+        if self.version:
+            return
+        start = max(self.seek - self._offset, 0)
+        self._offset += len(chunk)
+        if start < len(chunk):
+            self.version = self._scanner.feed(chunk[start:])
+
+    def result(self):
+        if not self.version:
+            self.version = self._scanner.close()
+        if self.version is None:
+            raise ValueError(self.ERRORS[self.type])
+        return self.version
+
+
 def normalize_install_if_different(values):
     """Converts metadata install-if-different key to install-condition."""
     values = deepcopy(values)
@@ -265,11 +407,12 @@ class InstallCondition:  # pylint: disable=too-few-public-methods
     CONTENT_DIVERGES = 'content-diverges'
     VERSION_DIVERGES = 'version-diverges'
 
-    def __init__(self, metadata):
+    def __init__(self, metadata, version=None):
         self.filename = metadata['filename']
         self.condition = metadata.pop('install-condition', None)
         self.metadata = metadata
         self.pattern = None
+        self.version = version
 
     def to_metadata(self):
         if self.condition == self.CONTENT_DIVERGES:
@@ -290,18 +433,23 @@ class InstallCondition:  # pylint: disable=too-few-public-methods
         raise ValueError('Unknown install-condition pattern type.')
 
     def _metadata_known_pattern(self):
+        version = self.version
+        if version is None:
+            version = get_version(self.filename, self.pattern)
         return self._format_metadata({
             'pattern': self.pattern,
-            'version': get_version(self.filename, self.pattern),
+            'version': version,
         })
 
     def _metadata_custom_pattern(self):
         regexp = self.metadata.pop('install-condition-pattern')
         seek = self.metadata.pop('install-condition-seek')
         buffer_size = self.metadata.pop('install-condition-buffer-size')
-        version = get_version(
-            self.filename, CUSTOM_PATTERN, pattern=regexp.encode(),
-            seek=seek, buffer_size=buffer_size)
+        version = self.version
+        if version is None:
+            version = get_version(
+                self.filename, CUSTOM_PATTERN, pattern=regexp.encode(),
+                seek=seek, buffer_size=buffer_size)
         return self._format_metadata({
             'version': version,
             'pattern': {
@@ -1,11 +1,15 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from itertools import chain
 from .object import Object
+from ._object import HASHES
 from ._options import Options
 
-from ..utils import call, list_to_str
+from ..utils import (
+    call, get_load_workers, list_to_str, SynchronizedCallback)
 
 
 class ObjectsManager:
@@ -45,12 +49,49 @@ class ObjectsManager:
             raise ValueError(error.format(self.MIN_N_SETS, self.MAX_N_SETS))
         return n_sets
 
-    def load(self, callback=None):
+    def load(self, callback=None, workers=None, loader=None):
         call(callback, 'start_objects_load')
-        for obj in self.all():
-            obj.load(callback=callback)
+        self._load(callback, workers, loader)
         call(callback, 'finish_objects_load')
 
+    def _load(self, callback=None, workers=None, loader=None):
+        """Loads all objects reading each distinct file only once.
+
+        Objects are grouped by file fingerprint, so the same file used
+        in many installation sets (or through links) is hashed once
+        and its values are shared with all other objects. Distinct
+        files are hashed in parallel by up to workers threads.
+
+        loader(obj, callback) replaces obj.load(callback) for the
+        objects which are actually read.
+        """
+        if loader is None:
+            loader = self._load_object
+        groups = OrderedDict()
+        for obj in self.all():
+            groups.setdefault(obj.fingerprint, []).append(obj)
+        if workers is None:
+            workers = get_load_workers()
+        workers = min(workers, len(groups))
+        if workers > 1:
+            callback = SynchronizedCallback(callback)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                loads = [executor.submit(loader, objs[0], callback)
+                         for objs in groups.values()]
+                for load in loads:
+                    load.result()
+        else:
+            for objs in groups.values():
+                loader(objs[0], callback)
+        for objs in groups.values():
+            for obj in objs[1:]:
+                obj.load_from(objs[0])
+        HASHES.save()
+
+    @staticmethod
+    def _load_object(obj, callback):
+        obj.load(callback)
+
     def _check_duplicate_object_entry(self, options):
         for obj in self.objects:
             metadata = [{'filename': entry.filename,
@@ -132,9 +173,11 @@ class ObjectsManager:
         """Checks if it is single mode."""
         return self.n_sets == 1
 
-    def to_metadata(self, callback=None):
+    def to_metadata(self, callback=None, load=True):
+        if load:
+            self._load(callback)
         sets = self._to_list_of_sets()
-        objects = [[obj.to_metadata(callback) for obj in set_]
+        objects = [[obj.to_metadata(load=False) for obj in set_]
                    for set_ in sets]
         return {self.metadata: objects}
 
@@ -1,8 +1,6 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
-from humanize.filesize import naturalsize
-
 from ._options import (
     AbsolutePathOption, BooleanOption, IntegerOption, StringOption)
 
@@ -32,6 +30,8 @@ class ChunkSizeOption(IntegerOption):
 
     @classmethod
     def humanize(cls, value):
+        # pylint: disable=import-outside-toplevel
+        from humanize.filesize import naturalsize
         return naturalsize(value, binary=True)
 
 
@@ -1,7 +1,6 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
-from uhu.updatehub.api import push_package
 from uhu.utils import call
 
 from .hardware import SupportedHardwareManager
@@ -24,14 +23,14 @@ class Package:
             self.supported_hardware = SupportedHardwareManager(dump=dump)
         self.uid = None
 
-    def to_metadata(self, callback=None):
+    def to_metadata(self, callback=None, load=True):
         """Serialize package as metadata."""
         metadata = {
             'product': self.product,
             'version': self.version,
         }
         metadata.update(self.supported_hardware.to_metadata())
-        metadata.update(self.objects.to_metadata(callback))
+        metadata.update(self.objects.to_metadata(callback, load))
         return metadata
 
     def to_template(self, with_version=True):
@@ -44,6 +43,8 @@ class Package:
 
     def push(self, callback=None):
         """Uploads package to UpdateHub server."""
+        # pylint: disable=import-outside-toplevel
+        from uhu.updatehub.api import push_package
         call(callback, 'start_objects_load')
         metadata = self.to_metadata(callback)
         call(callback, 'finish_objects_load')
@@ -3,14 +3,13 @@
 
 import json
 import os
-import zipfile
+import tempfile
 from collections import OrderedDict
 
-import pkgschema
-
 from ..config import config
-from ..utils import sign_dict
+from ..utils import call, sign_metadata, sign_payload, verify_payload
 
+from .archive import ArchiveWriter, PackageArchive
 from .package import Package
 
 
@@ -34,15 +33,27 @@ def _generate_archive_name(package, output):
     return '{0.product}-{0.version}.uhupkg'.format(package)
 
 
-def dump_package_archive(package, output=None, force=False):
+# pylint: disable=too-many-arguments
+def dump_package_archive(package, output=None, force=False,
+                         compression='stored', level=None, workers=None,
+                         callback=None, incremental=False):
     """Saves package as an archive. Returns genereted archive filename.
 
-    Generated archive is a gz compressed tar file with current package
-    metadata and all objects files.
+    Generated archive is a zip file with current package metadata, its
+    signature and all objects files.
 
     All objects are renamed to its hash and moved to the archive
     root. Objects are included without duplication and links are
-    resolved.
+    resolved. Each object is read only once, to be both hashed and
+    archived.
+
+    output may also be a writable file object (e.g. a pipe), which is
+    then returned. Otherwise, archive is written into a temporary file
+    which replaces output only when archive is complete.
+
+    If incremental, an existing output is rebuilt: objects it already
+    has are copied from it as they are (without being compressed
+    again) and only new objects are read from their files.
     """
     # Checks minimum package requirements
     if package.version is None:
@@ -51,32 +62,108 @@ def dump_package_archive(package, output=None, force=False):
         raise ValueError('Cannot generate archive without product UID.')
     if not package.objects.all():
         raise ValueError('Cannot generate archive without objects.')
+
+    # Writes archive straight into a file object
+    if hasattr(output, 'write'):
+        if incremental:
+            raise ValueError('Cannot rebuild an archive from a stream.')
+        with ArchiveWriter(output, compression, level) as writer:
+            _write_package_archive(package, writer, workers, callback)
+        return output
+
+    # Checks archive output
+    output = _generate_archive_name(package, output)
+    exists = os.path.exists(output)
+    if exists and not (force or incremental):
+        raise FileExistsError('Archive "{}" already exists.'.format(output))
+    previous = PackageArchive(output) if incremental and exists else None
+
+    # Writes archive
+    partial = '{}.part'.format(output)
+    try:
+        with ArchiveWriter(partial, compression, level) as writer:
+            _write_package_archive(
+                package, writer, workers, callback, previous)
+        if previous is not None:
+            previous.close()  # before output is replaced
+        os.replace(partial, output)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    finally:
+        if previous is not None:
+            previous.close()
+    return output
+
+
+def _write_package_archive(package, writer, workers, callback,
+                           previous=None):
+    # pylint: disable=import-outside-toplevel
+    import pkgschema
+    writer.add_objects(package.objects, callback, workers, previous)
     # Checks metadata complience
-    metadata = package.to_metadata()
+    metadata = package.to_metadata(load=False)
     try:
         pkgschema.validate_metadata(metadata)
     except pkgschema.ValidationError:
         raise ValueError('Cannot generate archive with invalid metadata.')
+    payload, signature = sign_metadata(
+        metadata, config.get_private_key_path())
+    writer.add_metadata(payload, signature)
 
-    # Checks archive output
-    output = _generate_archive_name(package, output)
-    if os.path.exists(output) and not force:
-        raise FileExistsError('Archive "{}" already exists.'.format(output))
 
-    # Writes archive
-    cache = set()
-    signature = sign_dict(metadata, config.get_private_key_path())
-    metadata = json.dumps(metadata, sort_keys=True)
-    with zipfile.ZipFile(output, mode='w') as archive:
-        if signature is None:
-            archive.writestr('signature', "")
+def push_package_archive(fn, callback=None):
+    """Pushes a package archive to server. Returns package UID.
+
+    Archive metadata and signature are sent as they are, and objects
+    are uploaded straight from the archive, without being hashed or
+    extracted (unless they are compressed within the archive).
+    """
+    # pylint: disable=import-outside-toplevel
+    from ..updatehub.api import push_package
+    with PackageArchive(fn) as archive, \
+            tempfile.TemporaryDirectory() as directory:
+        call(callback, 'start_objects_load')
+        objects = archive.to_upload(directory, callback)
+        call(callback, 'finish_objects_load')
+        signed = (archive.payload, archive.signature)
+        return push_package(archive.metadata, objects, callback, signed)
+
+
+def sign_package_archive(fn, private_key):
+    """Signs a package archive again. Returns its new signature.
+
+    Archive metadata is signed as it is, and objects are copied
+    without being decompressed into the new archive, which replaces
+    the original one once complete.
+    """
+    partial = '{}.part'.format(fn)
+    try:
+        with PackageArchive(fn) as archive:
+            signature = sign_payload(archive.payload, private_key)
+            with ArchiveWriter(partial) as writer:
+                for sha256sum in archive:
+                    writer.copy_member(archive, sha256sum)
+                writer.add_metadata(archive.payload, signature)
+        os.replace(partial, fn)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return signature
+
+
+def verify_package_archive(fn, key, callback=None):
+    """Verifies a package archive signature and objects.
+
+    Returns a list of errors (empty when archive is valid).
+    """
+    with PackageArchive(fn) as archive:
+        if archive.signature is None:
+            errors = ['Archive is not signed.']
+        elif not verify_payload(archive.payload, archive.signature, key):
+            errors = ['Archive signature does not match its metadata.']
         else:
-            archive.writestr('signature', signature)
-        archive.writestr('metadata', metadata)
-        for obj in package.objects.all():
-            sha256sum = obj['sha256sum']
-            if sha256sum in cache:
-                continue
-            cache.add(sha256sum)
-            archive.write(os.path.realpath(obj.filename), sha256sum)
-    return output
+            errors = []
+        return errors + archive.verify(callback)
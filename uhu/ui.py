@@ -3,45 +3,128 @@
 
 import math
 import sys
+import time
+from collections import OrderedDict
 
-from progress.spinner import Spinner
-from progress.bar import Bar
+
+# Minimum interval (in seconds) between progress redraws
+FRAME_INTERVAL = 0.1
+
+SPINNER = '-\\|/'
+BAR_WIDTH = 30
+OBJECT_BAR_WIDTH = 20
+
+
+def format_bar(done, total, width):
+    filled = width if not total else min(width * done // total, width)
+    return '[{}{}]'.format('#' * filled, ' ' * (width - filled))
+
+
+def format_size(n_bytes):
+    # pylint: disable=import-outside-toplevel
+    from humanize.filesize import naturalsize
+    return naturalsize(n_bytes)
+
+
+def format_percent(done, total):
+    return 100 if not total else min(100 * done // total, 100)
 
 
 class BaseCallback:
+    """Progress of package loading and upload, in bytes.
+
+    Reported bytes are only accumulated, and the progress is drawn at
+    most once every FRAME_INTERVAL seconds, however often (and from
+    however many objects) progress is reported.
+    """
 
     def __init__(self):
         self.uploading = False
         self.max = None
+        self.current = 0
+        self.saved = 0
+        self.objects = OrderedDict()  # uid: [current, size, name]
+        self._start = None
+        self._next_frame = 0
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self._start if self._start else 0
+
+    @property
+    def rate(self):
+        """Returns throughput in bytes per second."""
+        elapsed = self.elapsed
+        return self.current / elapsed if elapsed else 0
+
+    def object_progress(self, n_bytes, uid=None):
+        """Records n_bytes of object uid as loaded or uploaded.
+
+        n_bytes is negative when an upload sent again takes back the
+        progress of the failed attempt.
+        """
+        self.current += n_bytes
+        progress = self.objects.get(uid)
+        if progress is not None:
+            progress[0] += n_bytes
+        self._update()
+
+    def start_object_upload(self, uid, size, name=None):
+        """Starts tracking object uid, shown as name (or uid)."""
+        self.objects[uid] = [0, size, name or uid]
+        self._update(force=True)
+
+    def finish_object_upload(self, uid):
+        self.objects.pop(uid, None)
+        self._update(force=True)
 
-    def object_read(self, n_steps=1):
-        """Calls self._object_read for n_steps needed."""
-        for _ in range(n_steps):
-            self._object_read()
+    def start_objects_load(self):
+        self._reset()
+        self.start_objects_load_callback()
 
-    def _object_read(self):
-        if self.uploading:
-            self.object_read_upload_callback()
-        else:
-            self.object_read_load_callback()
+    def finish_objects_load(self):
+        self.finish_objects_load_callback()
 
     def start_package_upload(self, objects):
+        self._reset()
         self.uploading = True
-        self.max = sum(obj['chunks'] for obj in objects)
+        self.max = sum(obj.get('size') or 0 for obj in objects)
         self.start_package_upload_callback()
 
+    def skip_duplicated_objects(self, saved):
+        """Records the bytes not uploaded due to duplicated objects."""
+        self.saved = saved
+
     def finish_package_upload(self):
         self.uploading = False
         self.finish_package_upload_callback()
 
-    def push_finish(self, uid):  # pylint: disable=no-self-use
+    def push_finish(self, uid):
+        if self.saved:
+            print('Duplicated objects were uploaded once ({} saved)'.format(
+                format_size(self.saved)))
         print('Finished! Your package UID is {}'.format(uid))
 
-    def object_read_load_callback(self):
-        """Must be called when reading object during loading process."""
+    def _reset(self):
+        self.current = 0
+        self.objects.clear()
+        self._start = time.monotonic()
+        self._next_frame = 0
+
+    def _update(self, force=False):
+        now = time.monotonic()
+        if force or now >= self._next_frame:
+            self._next_frame = now + FRAME_INTERVAL
+            self.draw()
 
-    def object_read_upload_callback(self):
-        """Must be called when reading object during upload process."""
+    def draw(self):
+        """Draws current progress. Called at most once per frame."""
+
+    def start_objects_load_callback(self):
+        """Must be called when starting objects loading process."""
+
+    def finish_objects_load_callback(self):
+        """Must be called when finished objects loading process."""
 
     def start_package_upload_callback(self):
         """Must be called when starting package upload process."""
@@ -51,62 +134,111 @@ class BaseCallback:
 
 
 class TTYCallback(BaseCallback):
+    """Draws a spinner while loading and progress bars while uploading.
 
-    def __init__(self):
-        super().__init__()
-        self.progress = None
-
-    def start_objects_load(self):
-        self.progress = Spinner('Loading objects: ')
+    While several objects are uploaded at the same time, each one gets
+    its own bar below the package one.
+    """
 
-    def object_read_load_callback(self):
-        self.progress.next()
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = sys.stdout if stream is None else stream
+        self._frame = 0
+        self._lines = 0
+
+    def _write(self, lines):
+        # Goes back to the first line drawn and overwrites all of them
+        output = '\r' + '\033[1A' * (self._lines - 1) if self._lines else ''
+        output += '\n'.join('\033[2K' + line for line in lines)
+        # Clears lines left from a taller frame
+        extra = self._lines - len(lines)
+        if extra > 0:
+            output += '\n\033[2K' * extra + '\033[1A' * extra
+        self.stream.write(output)
+        self.stream.flush()
+        self._lines = len(lines)
+
+    def _load_lines(self):
+        self._frame += 1
+        spinner = SPINNER[self._frame % len(SPINNER)]
+        return ['Loading objects: {} {} ({}/s)'.format(
+            spinner, format_size(self.current), format_size(self.rate))]
+
+    def _upload_lines(self):
+        line = 'Uploading objects: {} {}% {}/{} {}/s'.format(
+            format_bar(self.current, self.max, BAR_WIDTH),
+            format_percent(self.current, self.max),
+            format_size(self.current), format_size(self.max),
+            format_size(self.rate))
+        if self.rate and self.max > self.current:
+            line += ' ETA: {}s'.format(
+                math.ceil((self.max - self.current) / self.rate))
+        lines = [line]
+        if len(self.objects) > 1:
+            for current, size, name in self.objects.values():
+                lines.append('  {} {}% {}'.format(
+                    format_bar(current, size, OBJECT_BAR_WIDTH),
+                    format_percent(current, size), name))
+        return lines
+
+    def draw(self):
+        if self.uploading:
+            self._write(self._upload_lines())
+        else:
+            self._write(self._load_lines())
 
-    def object_read_upload_callback(self):
-        self.progress.next()
+    def start_objects_load_callback(self):
+        self._lines = 0
+        self.draw()
 
-    def finish_objects_load(self):
-        self.progress.finish()
-        print('\rLoading objects: ok')
-        print('Starting uploading objects...', end='', flush=True)
+    def finish_objects_load_callback(self):
+        self._write(['Loading objects: ok'])
+        self.stream.write('\nStarting uploading objects...')
+        self.stream.flush()
+        self._lines = 1
 
     def start_package_upload_callback(self):
-        suffix = '%(percent)d%% ETA: %(eta)ds'
-        self.progress = Bar('Uploading objects:', max=self.max, suffix=suffix)
+        self.draw()
 
     def finish_package_upload_callback(self):
-        print('\033[1K\rUploading objects: ok')
+        self.objects.clear()
+        self._write(['Uploading objects: ok ({} at {}/s)'.format(
+            format_size(self.current), format_size(self.rate))])
+        self.stream.write('\n')
+        self._lines = 0
 
 
 class NoTTYCallback(BaseCallback):
+    """Prints upload progress in steps of 5%."""
 
     def __init__(self):
         super().__init__()
-        self.current = 0
         self.coeficient = 5
         self.next_step = 0
 
-    def start_objects_load(self):  # pylint: disable=no-self-use
-        print('Loading objects: ', end='', flush=True)
-
-    def object_read_upload_callback(self):
-        self.current += 1
-        progress = math.floor((self.current / self.max) * 100)
+    def draw(self):
+        if not self.uploading or not self.max:
+            return
+        progress = format_percent(self.current, self.max)
         if progress >= self.next_step:
-            steps = progress // self.coeficient
-            until = steps * self.coeficient
+            until = progress // self.coeficient * self.coeficient
             for step in range(self.next_step, until, self.coeficient):
                 print('{}% '.format(step), end='', flush=True)
             self.next_step = until
 
-    def finish_objects_load(self):  # pylint: disable=no-self-use
+    def start_objects_load_callback(self):  # pylint: disable=no-self-use
+        print('Loading objects: ', end='', flush=True)
+
+    def finish_objects_load_callback(self):  # pylint: disable=no-self-use
         print('ok', flush=True)
 
     def start_package_upload_callback(self):
+        self.next_step = 0
         print('Uploading objects:', flush=True)
 
     def finish_package_upload_callback(self):
-        print('100%', flush=True)
+        self.draw()
+        print('100% ({}/s)'.format(format_size(self.rate)), flush=True)
 
 
 def get_callback():
@@ -10,6 +10,7 @@ import requests
 from .. import get_version
 from ..config import config
 
+from ._session import get_session
 from .auth import UHV1Signature
 
 
@@ -95,12 +96,15 @@ class Request:
     def send(self):
         self._sign()
         headers = self._prepare_headers()
-        response = requests.request(
+        requests_kwargs = dict(self._requests_kwargs)
+        if 'timeout' not in requests_kwargs:
+            timeouts = config.get_timeouts()
+            requests_kwargs['timeout'] = (timeouts.connect, timeouts.read)
+        response = get_session().request(
             self.method,
             self.url,
             headers=headers,
             data=self.payload,
-            timeout=30,
-            **self._requests_kwargs
+            **requests_kwargs
         )
         return response
@@ -0,0 +1,93 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from ..utils import get_retry_attempts, get_retry_backoff
+
+
+# Server responses that may succeed if the request is sent again
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Server responses telling a request was refused without being handled.
+# Non idempotent requests are sent again only after these, if they come
+# with Retry-After: a 502 or 504 may come after the server handled it.
+REFUSED_STATUSES = (429, 503)
+
+DEFAULT_MAX_BACKOFF = 60  # seconds
+
+
+def parse_retry_after(response):
+    """Returns Retry-After header value in seconds or None."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        date = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    delay = (date - datetime.now(timezone.utc)).total_seconds()
+    return max(delay, 0)
+
+
+class RetryPolicy:
+    """Decides if and when a failed request must be sent again.
+
+    The delay between attempts grows exponentially and is randomized
+    (full jitter), so clients failing at the same time do not retry
+    at the same time. A Retry-After header sent by the server takes
+    precedence over the computed delay.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, attempts=None, backoff=None,
+                 max_backoff=DEFAULT_MAX_BACKOFF, statuses=RETRY_STATUSES):
+        self.attempts = get_retry_attempts() if attempts is None else attempts
+        self.backoff = get_retry_backoff() if backoff is None else backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def can_retry(self, attempt, response=None, idempotent=True):
+        """Checks if a request may be sent after the given attempt.
+
+        If response is given, it must also have a retriable status. For
+        non idempotent requests, it must also tell when to retry.
+        """
+        if attempt >= self.attempts:
+            return False
+        if response is None:
+            return True
+        if not idempotent:
+            return (response.status_code in REFUSED_STATUSES and
+                    parse_retry_after(response) is not None)
+        return response.status_code in self.statuses
+
+    def delay(self, attempt, response=None):
+        """Returns how many seconds to wait after the given attempt."""
+        if response is not None:
+            retry_after = parse_retry_after(response)
+            if retry_after is not None:
+                return retry_after
+        ceiling = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+    def wait(self, attempt, response=None, deadline=None):
+        """Waits before the next attempt.
+
+        If waiting would go beyond deadline (a time.monotonic() value),
+        returns False immediately instead.
+        """
+        delay = self.delay(attempt, response)
+        if deadline is not None and time.monotonic() + delay > deadline:
+            return False
+        time.sleep(delay)
+        return True
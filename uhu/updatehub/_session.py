@@ -0,0 +1,47 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..utils import get_http_pool_size
+
+
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def new_session(pool_size=None):
+    """Creates a HTTP session with a connection pool for each host."""
+    if pool_size is None:
+        pool_size = get_http_pool_size()
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session():
+    """Returns the HTTP session shared by all UpdateHub requests.
+
+    Since connections are kept alive within the session pools, API
+    calls and object uploads to the same host reuse their TCP and TLS
+    connections instead of doing a new handshake for each request.
+    """
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = new_session()
+        return _SESSION
+
+
+def close_session():
+    """Closes all pooled connections of the shared session."""
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is not None:
+            _SESSION.close()
+            _SESSION = None
@@ -0,0 +1,88 @@
+# Copyright (C) 2026 O.S. Systems Software LTDA.
+# SPDX-License-Identifier: GPL-2.0
+
+"""Asyncio interface to UpdateHub server.
+
+Coroutines here are equivalent to the functions of uhu.updatehub.api.
+Each request is sent by the blocking client in the event loop default
+executor, so requests are signed, retried and timed out exactly the
+same way, and object files are read and streamed without blocking the
+loop. Up to UHU_UPLOAD_WORKERS requests are sent at the same time
+within each event loop.
+
+Callbacks are called from executor threads.
+"""
+
+import asyncio
+import functools
+import weakref
+
+from uhu.utils import get_upload_workers, SynchronizedCallback
+
+from . import api
+from .api import UpdateHubError
+
+
+# Bounds concurrent requests of each event loop
+_SEMAPHORES = weakref.WeakKeyDictionary()
+
+
+def _get_semaphore(loop):
+    semaphore = _SEMAPHORES.get(loop)
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(get_upload_workers())
+        _SEMAPHORES[loop] = semaphore
+    return semaphore
+
+
+async def _run(func, *args, bounded=True):
+    """Runs a blocking API function in the loop executor.
+
+    Unless bounded is false (for calls not sending requests), it waits
+    for a free request slot first.
+    """
+    loop = asyncio.get_event_loop()
+    call = functools.partial(func, *args)
+    if not bounded:
+        return await loop.run_in_executor(None, call)
+    async with _get_semaphore(loop):
+        return await loop.run_in_executor(None, call)
+
+
+async def push_package(metadata, objects, callback=None, signed=None):
+    """Uploads a package, its objects and finishes it on server."""
+    package_uid = await upload_metadata(metadata, signed)
+    await upload_objects(package_uid, objects, callback)
+    try:
+        await finish_package(package_uid, callback)
+    except UpdateHubError:
+        await _run(api.forget_known_objects, objects, bounded=False)
+        raise
+    return package_uid
+
+
+async def upload_metadata(metadata, signed=None):
+    """Uploads package metadata. Returns package UID."""
+    return await _run(api.upload_metadata, metadata, signed)
+
+
+async def upload_object(obj, package_uid, callback=None):
+    """Uploads a package object to UpdateHub server."""
+    return await _run(api.upload_object, obj, package_uid, callback)
+
+
+async def upload_objects(package_uid, objects, callback=None):
+    """Uploads objects to UpdateHub server, concurrently."""
+    callback = SynchronizedCallback(callback)
+    objects = await _run(api.start_upload, objects, callback, bounded=False)
+    results = await asyncio.gather(*[
+        upload_object(obj, package_uid, callback) for obj in objects])
+    await _run(api.finish_upload, results, callback, bounded=False)
+
+
+async def finish_package(package_uid, callback=None):
+    await _run(api.finish_package, package_uid, callback)
+
+
+async def get_package_status(package_uid):
+    return await _run(api.get_package_status, package_uid)
@@ -3,38 +3,191 @@
 
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from urllib.parse import urlparse, urlunparse
 
 from pkgschema import validate_metadata, ValidationError
 
+from uhu.cache import Cache
 from uhu.config import config
-from uhu.utils import call, get_server_url, get_chunk_size, sign_dict
+from uhu.utils import (
+    call, get_server_url, get_chunk_size, get_known_objects_ttl,
+    get_upload_segment_size, get_upload_workers, sign_metadata,
+    ObjectCallback, SynchronizedCallback)
 from . import http
 
 
+UPLOADS = Cache('uploads')
+
+# Objects the server has confirmed to store, by server URL and sha256
+KNOWN_OBJECTS = Cache('objects')
+
+# Token buckets shared by all uploads, by rate and burst
+UPLOAD_BUCKETS = {}
+
+
 # Utilities
 
+def get_upload_limiters():
+    """Returns the token buckets an object upload must go through.
+
+    The bucket of the total upload rate is shared by all uploads,
+    while a new bucket is created for the per object rate.
+    """
+    limits = config.get_upload_rate_limits()
+    limiters = []
+    if limits.total:
+        key = (limits.total, limits.burst)
+        bucket = UPLOAD_BUCKETS.get(key)
+        if bucket is None:
+            bucket = UPLOAD_BUCKETS.setdefault(key, http.TokenBucket(*key))
+        limiters.append(bucket)
+    if limits.per_object:
+        limiters.append(http.TokenBucket(limits.per_object, limits.burst))
+    return limiters
+
+
 class ObjectReader:  # pylint: disable=too-few-public-methods
-    """Read-only object class. Used when uploading with requests."""
+    """Read-only object class. Used when uploading with requests.
 
-    def __init__(self, filename, callback=None):
+    If offset and length are given, only this range of the file is
+    read. Reading is aborted if the upload is slower than min_rate
+    bytes per second. Each chunk is held back until all limiters
+    (token buckets, see get_upload_limiters) allow it to be sent.
+
+    When the request is sent again, the progress reported by the
+    previous attempt is taken back.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, filename, callback=None, offset=0, length=None,
+                 min_rate=None, limiters=None):
         self.filename = os.path.realpath(filename)
         self.callback = callback
+        self.offset = offset
+        if length is None:
+            length = os.path.getsize(self.filename) - offset
+        self.length = length
+        if min_rate is None:
+            min_rate = config.get_min_upload_rate()
+        self.min_rate = min_rate
+        if limiters is None:
+            limiters = get_upload_limiters()
+        self.limiters = limiters
+        self._reported = 0
 
     def __len__(self):
-        return os.path.getsize(self.filename)
+        return self.length
 
     def __iter__(self):
         """Yields every single chunk."""
+        if self._reported:
+            call(self.callback, 'object_progress', -self._reported)
+            self._reported = 0
         chunk_size = get_chunk_size()
+        remaining = self.length
+        watchdog = http.ThroughputWatchdog(self.min_rate)
         with open(self.filename, 'br') as fp:
-            for chunk in iter(lambda: fp.read(chunk_size), b''):
+            fp.seek(self.offset)
+            while remaining > 0:
+                chunk = fp.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                for limiter in self.limiters:
+                    watchdog.skip(limiter.consume(len(chunk)))
                 yield chunk
-                call(self.callback, 'object_read')
-
-
-def dummy_object_upload(filename, url, callback=None):
-    data = ObjectReader(filename, callback)
+                watchdog.update(len(chunk))
+                self._reported += len(chunk)
+                call(self.callback, 'object_progress', len(chunk))
+
+
+def _strip_query(url):
+    """Removes the (signature of a) TempURL query from url."""
+    return urlunparse(urlparse(url)._replace(query='', fragment=''))
+
+
+class UploadJournal:
+    """Keeps track of the acknowledged segments of an object upload.
+
+    The journal is kept in uhu cache, so an interrupted upload can be
+    resumed by a later push. It is discarded if the object file, the
+    segment size or the paths segments are uploaded to change (as
+    acknowledged segments do not exist in other paths).
+    """
+
+    def __init__(self, url, filename, segment_size, segments):
+        self.key = _strip_query(url)
+        stat = os.stat(filename)
+        self.identity = [stat.st_dev, stat.st_ino, stat.st_size,
+                         stat.st_mtime_ns, segment_size,
+                         [_strip_query(url) for url in segments['urls']],
+                         _strip_query(segments['manifest'])]
+        entry = UPLOADS.get(self.key)
+        if entry is None or entry.get('identity') != self.identity:
+            entry = {'identity': self.identity, 'segments': {}}
+        self.segments = dict(entry['segments'])
+
+    def __contains__(self, index):
+        return str(index) in self.segments
+
+    def add(self, index, etag):
+        """Records segment index as acknowledged by the server."""
+        self.segments[str(index)] = etag
+        UPLOADS.set(self.key, {
+            'identity': self.identity,
+            'segments': self.segments,
+        })
+        UPLOADS.save()
+
+    def discard(self):
+        """Removes journal once the upload is complete."""
+        UPLOADS.remove(self.key)
+        UPLOADS.save()
+
+
+def _known_object_key(obj):
+    return '{} {}'.format(get_server_url(), obj['sha256sum'])
+
+
+def is_known_object(obj):
+    """Checks if the server has recently confirmed to store obj."""
+    ttl = get_known_objects_ttl()
+    if not ttl or 'sha256sum' not in obj:
+        return False
+    key = _known_object_key(obj)
+    confirmed = KNOWN_OBJECTS.get(key)
+    if confirmed is None:
+        return False
+    if not 0 <= time.time() - confirmed < ttl:
+        KNOWN_OBJECTS.remove(key)
+        return False
+    return True
+
+
+def add_known_object(obj):
+    """Records that the server has confirmed to store obj."""
+    if get_known_objects_ttl() and 'sha256sum' in obj:
+        KNOWN_OBJECTS.set(_known_object_key(obj), time.time())
+
+
+def forget_known_object(obj):
+    """Makes obj to be checked again by the next upload."""
+    if 'sha256sum' in obj:
+        KNOWN_OBJECTS.remove(_known_object_key(obj))
+
+
+def forget_known_objects(objects):
+    """Makes objects to be checked again by the next push."""
+    for obj in objects:
+        forget_known_object(obj)
+    KNOWN_OBJECTS.save()
+
+
+def dummy_object_upload(filename, url, callback=None, offset=0, size=None):
+    data = ObjectReader(filename, callback, offset, size)
     try:
         http.put(url, data=data, sign=False)
         return ObjectUploadResult.SUCCESS
@@ -42,8 +195,83 @@ def dummy_object_upload(filename, url, callback=None):
         return ObjectUploadResult.FAIL
 
 
-def swift_object_upload(*args, **kw):
-    return dummy_object_upload(*args, **kw)
+def count_segments(size):
+    """Returns in how many segments an object of size is uploaded."""
+    if not size:
+        return 1
+    return -(-size // get_upload_segment_size())
+
+
+def _swift_manifest(segments, size):
+    """Returns the X-Object-Manifest value for a segmented upload.
+
+    Swift object paths are /<version>/<account>/<container>/<object>.
+    There must be a URL for each segment, all of them below the same
+    <container>/<prefix>/, which is what the manifest points to.
+    Returns None if the object can not be uploaded in segments.
+    """
+    urls = segments.get('urls') or []
+    if not segments.get('manifest') or len(urls) < 2:
+        return None
+    if len(urls) != count_segments(size):
+        return None  # segments do not match UHU_UPLOAD_SEGMENT_SIZE
+    manifests = set()
+    for url in urls:
+        parts = urlparse(url).path.split('/', 4)
+        if len(parts) < 5 or not all(parts[1:]) or '/' not in parts[4]:
+            return None
+        manifests.add('{}/{}/'.format(parts[3], parts[4].rsplit('/', 1)[0]))
+    if len(manifests) != 1:
+        return None
+    return manifests.pop()
+
+
+# pylint: disable=too-many-arguments
+def swift_object_upload(filename, url, callback=None, offset=0, size=None,
+                        segments=None):
+    """Uploads an object to Swift.
+
+    Each TempURL is signed for a single path, so an object is uploaded
+    as a Dynamic Large Object only if the server has handed out a URL
+    for each segment (segments['urls']) and one allowing the manifest
+    to be written (segments['manifest']). Otherwise it is uploaded to
+    url in a single request. If a segmented upload fails, a later push
+    sends only the segments not yet acknowledged by the server.
+
+    The object may be a range of filename (e.g. an archive member),
+    starting at offset.
+    """
+    if size is None:
+        size = os.path.getsize(filename) - offset
+    segments = segments or {}
+    manifest = _swift_manifest(segments, size)
+    if manifest is None:
+        return dummy_object_upload(filename, url, callback, offset, size)
+
+    segment_size = get_upload_segment_size()
+    journal = UploadJournal(url, filename, segment_size, segments)
+    limiters = get_upload_limiters()  # per object rate spans all segments
+    for index, segment_url in enumerate(segments['urls']):
+        length = min(segment_size, size - index * segment_size)
+        if index in journal:
+            call(callback, 'object_progress', length)
+            continue
+        data = ObjectReader(filename, callback, offset + index * segment_size,
+                            length, limiters=limiters)
+        try:
+            response = http.put(segment_url, data=data, sign=False)
+        except http.HTTPError:
+            return ObjectUploadResult.FAIL
+        journal.add(index, response.headers.get('Etag'))
+
+    # The manifest ETag is not the content md5, it must not be checked
+    try:
+        http.put(segments['manifest'], data=b'', sign=False,
+                 headers={'X-Object-Manifest': manifest})
+    except http.HTTPError:
+        return ObjectUploadResult.FAIL
+    journal.discard()
+    return ObjectUploadResult.SUCCESS
 
 
 def s3_object_upload(*args, **kw):
@@ -69,21 +297,32 @@ class UpdateHubError(Exception):
 
 # Push Package
 
-def push_package(metadata, objects, callback=None):
-    package_uid = upload_metadata(metadata)
+def push_package(metadata, objects, callback=None, signed=None):
+    package_uid = upload_metadata(metadata, signed)
     upload_objects(package_uid, objects, callback)
-    finish_package(package_uid, callback)
+    try:
+        finish_package(package_uid, callback)
+    except UpdateHubError:
+        # Server may no longer store some object it had confirmed
+        forget_known_objects(objects)
+        raise
     return package_uid
 
 
-def upload_metadata(metadata):
+def upload_metadata(metadata, signed=None):
+    """Uploads package metadata. Returns package UID.
+
+    signed is a (payload, signature) pair of metadata already signed
+    elsewhere (e.g. read from a package archive), sent as is.
+    """
     try:
         validate_metadata(metadata)
     except ValidationError:
         raise UpdateHubError('You have an invalid package metadata.')
     url = get_server_url('/packages')
-    signature = sign_dict(metadata, config.get_private_key_path())
-    payload = json.dumps(metadata, sort_keys=True)
+    if signed is None:
+        signed = sign_metadata(metadata, config.get_private_key_path())
+    payload, signature = signed
     headers = {'UH-SIGNATURE': signature}
     try:
         response = http.post(
@@ -96,11 +335,29 @@ def upload_metadata(metadata):
 
 
 def upload_object(obj, package_uid, callback=None):
-    """Uploads a package object to UpdateHub server."""
+    """Uploads a package object to UpdateHub server.
+
+    Objects the server confirms to store become known (see
+    is_known_object), while objects failing to upload are forgotten.
+    """
+    result = _upload_object(obj, package_uid, callback)
+    if result == ObjectUploadResult.FAIL:
+        forget_known_object(obj)
+    else:
+        add_known_object(obj)
+    return result
+
+
+def _upload_object(obj, package_uid, callback):
     # First, check if we should upload the object
     url = get_server_url('/packages/{}/objects/{}'.format(
         package_uid, obj['sha256sum']))
-    body = json.dumps({'etag': obj['md5']})
+    body = {'etag': obj['md5']}
+    segments = count_segments(obj.get('size'))
+    if segments > 1:
+        # Storages supporting it may hand out a URL for each segment
+        body['segments'] = segments
+    body = json.dumps(body)
     try:
         response = http.post(url, body, json=True)
     except http.HTTPError:
@@ -108,7 +365,7 @@ def upload_object(obj, package_uid, callback=None):
 
     # Object already uploaded, return EXISTS.
     if response.status_code == 200:
-        call(callback, 'object_read', obj['chunks'])
+        call(callback, 'object_progress', obj.get('size') or 0)
         return ObjectUploadResult.EXISTS
 
     # Object not uploaded, try to uploaded it.
@@ -118,12 +375,91 @@ def upload_object(obj, package_uid, callback=None):
         url = body['url']
     except (ValueError, KeyError):
         return ObjectUploadResult.FAIL
-    return uploader(obj['filename'], url, callback)
-
-
-def upload_objects(package_uid, objects, callback=None):
+    options = {}
+    if body['storage'] == 'swift' and body.get('segments'):
+        options['segments'] = body['segments']
+    # Objects are tracked by checksum, as names may be repeated.
+    uid = obj['sha256sum']
+    call(callback, 'start_object_upload', uid, obj.get('size'),
+         obj.get('name'))
+    try:
+        result = uploader(obj['filename'], url, ObjectCallback(callback, uid),
+                          obj.get('offset', 0), obj.get('size'), **options)
+    finally:
+        call(callback, 'finish_object_upload', uid)
+    return result
+
+
+def plan_upload(objects):
+    """Collapses objects sharing the same content (sha256sum).
+
+    Returns the objects to upload, each blob only once, and how many
+    bytes were saved by not uploading the duplicated ones.
+    """
+    unique, saved = [], 0
+    seen = set()
+    for obj in objects:
+        sha256sum = obj.get('sha256sum')
+        if sha256sum is None:
+            unique.append(obj)
+        elif sha256sum in seen:
+            saved += obj.get('size') or 0
+        else:
+            seen.add(sha256sum)
+            unique.append(obj)
+    return unique, saved
+
+
+def upload_objects(package_uid, objects, callback=None, workers=None):
+    """Uploads objects to UpdateHub server.
+
+    Objects sharing the same content are uploaded once (see
+    plan_upload). Objects the server has recently confirmed to store (see
+    is_known_object) are skipped up front, without any request. Up to
+    workers of the remaining objects are checked and uploaded at the
+    same time. Largest objects are started first, so a big object
+    does not end up being uploaded alone after all the others.
+    """
+    objects = start_upload(objects, callback)
+    if workers is None:
+        workers = get_upload_workers()
+    workers = min(workers, len(objects))
+    if workers > 1:
+        sync_callback = SynchronizedCallback(callback)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            uploads = [
+                executor.submit(upload_object, obj, package_uid, sync_callback)
+                for obj in objects]
+            results = [upload.result() for upload in uploads]
+    else:
+        results = [upload_object(obj, package_uid, callback)
+                   for obj in objects]
+    finish_upload(results, callback)
+
+
+def start_upload(objects, callback=None):
+    """Returns the objects upload_object must be called for.
+
+    Duplicated and known objects are left out (and reported to
+    callback as read). Largest objects come first.
+    """
+    objects, saved = plan_upload(objects)
+    if saved:
+        call(callback, 'skip_duplicated_objects', saved)
     call(callback, 'start_package_upload', objects)
-    results = [upload_object(obj, package_uid, callback) for obj in objects]
+    unknown = []
+    for obj in objects:
+        if is_known_object(obj):
+            call(callback, 'object_progress', obj.get('size') or 0)
+        else:
+            unknown.append(obj)
+    return sorted(
+        unknown, key=lambda obj: obj.get('size') or 0, reverse=True)
+
+
+def finish_upload(results, callback=None):
+    """Ends an upload given the results of upload_object calls."""
+    KNOWN_OBJECTS.save()
     call(callback, 'finish_package_upload')
     if ObjectUploadResult.FAIL in results:
         raise UpdateHubError(
@@ -1,45 +1,198 @@
 # Copyright (C) 2017 O.S. Systems Software LTDA.
 # SPDX-License-Identifier: GPL-2.0
 
+import threading
+import time
+
 import requests
+from urllib3.exceptions import ConnectTimeoutError
 
+from ..config import config
 from ..utils import get_custom_ca_certs_file
 from ._request import Request, HTTPError
+from ._retry import RetryPolicy
+from ._session import get_session
 
 
 UNKNOWN_ERROR = 'A unexpected request error ocurred. Try again later.'
 
-
-def request(method, url, *args, sign=True, **kwargs):
+# Methods that can be safely sent again even if server got them
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+
+# Period (in seconds) used to measure uploads throughput
+WATCHDOG_WINDOW = 30
+
+
+class TransientHTTPError(HTTPError):
+    """A request error that may not happen if request is sent again."""
+
+
+class StalledTransferError(Exception):
+    """Raised by a request body when data is being sent too slowly."""
+
+
+class ThroughputWatchdog:  # pylint: disable=too-few-public-methods
+    """Aborts transfers slower than min_rate bytes per second.
+
+    Throughput is measured over periods of window seconds, so a short
+    stall does not abort a transfer. A transfer that stops completely
+    is aborted by the read timeout instead.
+    """
+
+    def __init__(self, min_rate, window=None):
+        self.min_rate = min_rate
+        self.window = WATCHDOG_WINDOW if window is None else window
+        self._start = time.monotonic()
+        self._transferred = 0
+
+    def update(self, n_bytes):
+        """Registers n_bytes as transferred."""
+        if not self.min_rate:
+            return
+        self._transferred += n_bytes
+        elapsed = time.monotonic() - self._start
+        if elapsed < self.window:
+            return
+        if self._transferred < self.min_rate * elapsed:
+            err = 'Transfer is slower than {:.0f} bytes/s.'
+            raise StalledTransferError(err.format(self.min_rate))
+        self._start = time.monotonic()
+        self._transferred = 0
+
+    def skip(self, seconds):
+        """Excludes seconds (e.g. spent throttled) from measurement."""
+        self._start += seconds
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """Limits transfers to rate bytes per second.
+
+    Up to burst bytes (one second of transfer by default) may be sent
+    at once. A bucket is thread-safe, so concurrent transfers can share
+    it. Transfers reserve their bytes in turns, waiting for the bucket
+    to refill outside the lock.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = rate if not burst else burst
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, n_bytes):
+        """Waits until n_bytes may be sent. Returns seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= n_bytes
+            delay = -self._tokens / self.rate
+        if delay <= 0:
+            return 0
+        time.sleep(delay)
+        return delay
+
+
+def request(method, url, *args, sign=True, retry=None, **kwargs):
+    """Sends a request, retrying it on transient failures.
+
+    Since signed requests include a timestamp, a new signed request is
+    created for each attempt. No attempt is started after the total
+    timeout, and connect and read timeouts of each attempt are cut to
+    the time left. Requests not idempotent are sent again only if the server
+    can not have handled them (see RetryPolicy.can_retry and _send).
+    """
     custom_ca_certs_file = get_custom_ca_certs_file()
 
     if custom_ca_certs_file is not None and 'verify' not in kwargs:
         kwargs['verify'] = custom_ca_certs_file
 
+    timeouts = config.get_timeouts()
+    timeout = kwargs.pop('timeout', (timeouts.connect, timeouts.read))
+    deadline = None
+    if timeouts.total is not None:
+        deadline = time.monotonic() + timeouts.total
+
+    if retry is None:
+        retry = RetryPolicy()
+    idempotent = is_idempotent(method)
+    attempt = 1
+    while True:
+        kwargs['timeout'] = _bound_timeout(timeout, deadline)
+        try:
+            response = _send(method, url, *args, sign=sign, **kwargs)
+        except TransientHTTPError:
+            if not (retry.can_retry(attempt) and
+                    retry.wait(attempt, deadline=deadline)):
+                raise
+        else:
+            if not (retry.can_retry(attempt, response, idempotent) and
+                    retry.wait(attempt, response, deadline)):
+                break
+        attempt += 1
+
+    if response.status_code == 401:
+        raise HTTPError('Unautorized. Did you set your credentials?')
+    if not response.ok:
+        raise HTTPError(format_server_error(response))
+    return response
+
+
+def _bound_timeout(timeout, deadline):
+    """Cuts timeout (a number or a (connect, read) pair) to deadline."""
+    if deadline is None:
+        return timeout
+    # requests refuses zero timeouts
+    left = max(deadline - time.monotonic(), 0.001)
+    if isinstance(timeout, tuple):
+        return tuple(left if value is None else min(value, left)
+                     for value in timeout)
+    return left if timeout is None else min(timeout, left)
+
+
+def is_idempotent(method):
+    return method.upper() in IDEMPOTENT_METHODS
+
+
+def _is_connect_error(error):
+    """Checks if a connection error happened before sending anything."""
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def _send(method, url, *args, sign=True, **kwargs):
     try:
         if sign:
-            response = Request(url, method, *args, **kwargs).send()
-        else:
-            response = requests.request(
-                method, url, *args, timeout=30, **kwargs)
+            return Request(url, method, *args, **kwargs).send()
+        return get_session().request(method, url, *args, **kwargs)
     except HTTPError as error:
         raise error
+    except StalledTransferError as error:
+        raise TransientHTTPError('{} Try again later.'.format(error))
     except (requests.exceptions.MissingSchema,
             requests.exceptions.InvalidSchema,
             requests.exceptions.URLRequired,
             requests.exceptions.InvalidURL):
         raise HTTPError('You have provided an invalid server URL.')
+    except requests.exceptions.SSLError:
+        raise HTTPError('Server is not available. Try again later.')
     except requests.ConnectTimeout:
-        raise HTTPError('Connection timed out. Try again later.')
-    except requests.ConnectionError:
+        raise TransientHTTPError('Connection timed out. Try again later.')
+    except requests.ConnectionError as error:
+        # Connection may be lost after server got the whole request
+        if is_idempotent(method) or _is_connect_error(error):
+            raise TransientHTTPError(
+                'Server is not available. Try again later.')
         raise HTTPError('Server is not available. Try again later.')
+    except requests.ReadTimeout:
+        if is_idempotent(method):
+            raise TransientHTTPError(UNKNOWN_ERROR)
+        raise HTTPError(UNKNOWN_ERROR)
     except requests.RequestException:
         raise HTTPError(UNKNOWN_ERROR)
-    if response.status_code == 401:
-        raise HTTPError('Unautorized. Did you set your credentials?')
-    if not response.ok:
-        raise HTTPError(format_server_error(response))
-    return response
 
 
 def get(url, *args, **kwargs):
@@ -4,10 +4,7 @@
 import base64
 import json
 import os
-
-from Cryptodome.Hash import SHA256
-from Cryptodome.PublicKey import RSA
-from Cryptodome.Signature import PKCS1_v1_5
+import threading
 
 
 # Environment variables
@@ -19,6 +16,23 @@ ACCESS_ID_VAR = 'UHU_ACCESS_ID'
 ACCESS_SECRET_VAR = 'UHU_ACCESS_SECRET'
 PRIVATE_KEY_FN = 'UHU_PRIVATE_KEY'
 CUSTOM_CA_CERTS_VAR = 'UHU_CUSTOM_CA_CERTS'
+CACHE_DIR_VAR = 'UHU_CACHE_DIR'
+NO_CACHE_VAR = 'UHU_NO_CACHE'
+LOAD_WORKERS_VAR = 'UHU_LOAD_WORKERS'
+UPLOAD_WORKERS_VAR = 'UHU_UPLOAD_WORKERS'
+HTTP_POOL_SIZE_VAR = 'UHU_HTTP_POOL_SIZE'
+UPLOAD_SEGMENT_SIZE_VAR = 'UHU_UPLOAD_SEGMENT_SIZE'
+RETRY_ATTEMPTS_VAR = 'UHU_RETRY_ATTEMPTS'
+RETRY_BACKOFF_VAR = 'UHU_RETRY_BACKOFF'
+CONNECT_TIMEOUT_VAR = 'UHU_CONNECT_TIMEOUT'
+READ_TIMEOUT_VAR = 'UHU_READ_TIMEOUT'
+TOTAL_TIMEOUT_VAR = 'UHU_TOTAL_TIMEOUT'
+MIN_UPLOAD_RATE_VAR = 'UHU_MIN_UPLOAD_RATE'
+UPLOAD_RATE_VAR = 'UHU_UPLOAD_RATE'
+OBJECT_UPLOAD_RATE_VAR = 'UHU_OBJECT_UPLOAD_RATE'
+UPLOAD_BURST_VAR = 'UHU_UPLOAD_BURST'
+NO_COMPRESSION_CHECK_VAR = 'UHU_NO_COMPRESSION_CHECK'
+KNOWN_OBJECTS_TTL_VAR = 'UHU_KNOWN_OBJECTS_TTL'
 
 
 # Default values
@@ -26,12 +40,80 @@ DEFAULT_CHUNK_SIZE = 1024 * 128  # 128 KiB
 DEFAULT_GLOBAL_CONFIG_FILE = os.path.expanduser('~/.config/.uhu')
 DEFAULT_LOCAL_CONFIG_FILE = '.uhu'
 DEFAULT_SERVER_URL = 'http://0.0.0.0'  # TODO: replace by the right URL
+DEFAULT_CACHE_DIR = os.path.expanduser('~/.cache/uhu')
+DEFAULT_UPLOAD_WORKERS = 4
+DEFAULT_HTTP_POOL_SIZE = 10
+DEFAULT_UPLOAD_SEGMENT_SIZE = 1024 * 1024 * 64  # 64 MiB
+DEFAULT_RETRY_ATTEMPTS = 5
+DEFAULT_RETRY_BACKOFF = 1  # seconds
+DEFAULT_CONNECT_TIMEOUT = 10  # seconds
+DEFAULT_READ_TIMEOUT = 30  # seconds
+DEFAULT_TOTAL_TIMEOUT = None  # no deadline
+DEFAULT_MIN_UPLOAD_RATE = 1024  # bytes per second
+DEFAULT_UPLOAD_RATE = None  # unlimited
+DEFAULT_OBJECT_UPLOAD_RATE = None  # unlimited
+DEFAULT_UPLOAD_BURST = None  # one second of transfer
+DEFAULT_KNOWN_OBJECTS_TTL = 60 * 60 * 24 * 7  # seconds
 
 
 def get_chunk_size():
     return int(os.environ.get(CHUNK_SIZE_VAR, DEFAULT_CHUNK_SIZE))
 
 
+def get_load_workers():
+    """Returns how many objects may be loaded at the same time."""
+    default = os.cpu_count() or 1
+    return max(int(os.environ.get(LOAD_WORKERS_VAR, default)), 1)
+
+
+def get_upload_workers():
+    """Returns how many objects may be uploaded at the same time."""
+    workers = os.environ.get(UPLOAD_WORKERS_VAR, DEFAULT_UPLOAD_WORKERS)
+    return max(int(workers), 1)
+
+
+def get_http_pool_size():
+    """Returns how many connections are kept alive for each host."""
+    size = os.environ.get(HTTP_POOL_SIZE_VAR, DEFAULT_HTTP_POOL_SIZE)
+    return max(int(size), 1)
+
+
+def get_upload_segment_size():
+    """Returns the size of each segment of a segmented upload."""
+    size = os.environ.get(UPLOAD_SEGMENT_SIZE_VAR, DEFAULT_UPLOAD_SEGMENT_SIZE)
+    return int(size)
+
+
+def get_retry_attempts():
+    """Returns how many times a request is tried before failing."""
+    attempts = os.environ.get(RETRY_ATTEMPTS_VAR, DEFAULT_RETRY_ATTEMPTS)
+    return max(int(attempts), 1)
+
+
+def get_retry_backoff():
+    """Returns the base delay (in seconds) between request retries."""
+    return float(os.environ.get(RETRY_BACKOFF_VAR, DEFAULT_RETRY_BACKOFF))
+
+
+def get_known_objects_ttl():
+    """Returns for how long (in seconds) server objects are trusted.
+
+    Objects the server has confirmed to store are not checked again
+    until their entry expires. Zero disables this cache.
+    """
+    ttl = os.environ.get(KNOWN_OBJECTS_TTL_VAR, DEFAULT_KNOWN_OBJECTS_TTL)
+    return max(float(ttl), 0)
+
+
+def get_compression_check():
+    """Returns if compressed objects must be fully decompressed.
+
+    When disabled, uncompressed sizes are read from compression
+    trailers or indexes whenever possible.
+    """
+    return not os.environ.get(NO_COMPRESSION_CHECK_VAR)
+
+
 def get_server_url(path=None):
     url = os.environ.get(SERVER_URL_VAR, DEFAULT_SERVER_URL).strip('/')
     if path is not None:
@@ -61,6 +143,13 @@ def get_custom_ca_certs_file():
     return os.environ.get(CUSTOM_CA_CERTS_VAR, None)
 
 
+def get_cache_dir():
+    """Returns uhu cache directory or None if caching is disabled."""
+    if os.environ.get(NO_CACHE_VAR):
+        return None
+    return os.environ.get(CACHE_DIR_VAR, DEFAULT_CACHE_DIR)
+
+
 def remove_local_config():
     os.remove(get_local_config_file())
 
@@ -70,6 +159,44 @@ def call(obj, name, *args, **kw):
     func(*args, **kw)
 
 
+class SynchronizedCallback:  # pylint: disable=too-few-public-methods
+    """Serializes calls to a callback shared between threads.
+
+    Callbacks (like the progress bars in uhu.ui) are not thread-safe,
+    so every method call is done while holding a lock.
+    """
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        func = getattr(self._callback, name)
+
+        def synchronized(*args, **kw):
+            with self._lock:
+                return func(*args, **kw)
+        return synchronized
+
+
+class ObjectCallback:  # pylint: disable=too-few-public-methods
+    """Reports the progress of a single object to a callback.
+
+    Progress is given the object uid (so a callback can show each
+    object on its own). Other calls are forwarded as they are.
+    """
+
+    def __init__(self, callback, uid):
+        self._callback = callback
+        self._uid = uid
+
+    def __getattr__(self, name):
+        return getattr(self._callback, name)
+
+    def object_progress(self, n_bytes):
+        call(self._callback, 'object_progress', n_bytes, self._uid)
+
+
 def indent(value, n_indents, all_lines=False):
     """Indent a multline string to right by n_indents.
 
@@ -103,21 +230,73 @@ def list_to_str(title, lst):
     return '\n'.join(lines)
 
 
-def sign_dict(dict_, private_key):
-    """Serializes a dict to JSON and sign it using RSA."""
+# Parsed private keys, by path, with the stat they were read with
+PRIVATE_KEYS = {}
+
+
+def load_private_key(private_key):
+    """Returns the RSA key of a private key file (or None if no file).
+
+    Parsed keys are kept in memory until their file changes.
+    """
+    # Cryptodome is imported only when needed, keeping startup fast
+    # pylint: disable=import-outside-toplevel
+    from Cryptodome.PublicKey import RSA
+    if private_key is None:
+        return None
     try:
+        stat = os.stat(private_key)
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        cached = PRIVATE_KEYS.get(private_key)
+        if cached is not None and cached[0] == identity:
+            return cached[1]
         with open(private_key) as fp:
             key = RSA.importKey(fp.read())
-    except TypeError:
-        return
     except (FileNotFoundError, ValueError, IndexError):
         raise ValueError('Invalid private key file.')
+    PRIVATE_KEYS[private_key] = (identity, key)
+    return key
 
-    signer = PKCS1_v1_5.new(key)
 
-    # encodes message
-    message = SHA256.new(json.dumps(dict_, sort_keys=True).encode())
+def sign_metadata(metadata, private_key):
+    """Serializes metadata to canonical JSON and signs it using RSA.
 
-    # sign
-    signature = signer.sign(message)
+    Returns the JSON payload and its signature (None if there is no
+    private key). Payload must be sent as is, since it is exactly what
+    was signed.
+    """
+    payload = json.dumps(metadata, sort_keys=True)
+    return payload, sign_payload(payload, private_key)
+
+
+def sign_payload(payload, private_key):
+    """Signs a (JSON) payload using RSA. Returns None without key."""
+    # pylint: disable=import-outside-toplevel
+    from Cryptodome.Hash import SHA256
+    from Cryptodome.Signature import PKCS1_v1_5
+    key = load_private_key(private_key)
+    if key is None:
+        return None
+    signature = PKCS1_v1_5.new(key).sign(SHA256.new(payload.encode()))
     return base64.b64encode(signature).decode()
+
+
+def verify_payload(payload, signature, key):
+    """Checks a payload signature using a (public or private) RSA key."""
+    # pylint: disable=import-outside-toplevel
+    from Cryptodome.Hash import SHA256
+    from Cryptodome.Signature import PKCS1_v1_5
+    key = load_private_key(key)
+    if key is None:
+        raise ValueError('Cannot verify signature without a key.')
+    try:
+        signature = base64.b64decode(signature, validate=True)
+    except ValueError:
+        return False
+    verifier = PKCS1_v1_5.new(key.publickey())
+    return verifier.verify(SHA256.new(payload.encode()), signature)
+
+
+def sign_dict(dict_, private_key):
+    """Serializes a dict to JSON and sign it using RSA."""
+    return sign_metadata(dict_, private_key)[1]